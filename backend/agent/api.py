@@ -12,6 +12,7 @@ from agentpress.thread_manager import ThreadManager
 from services.supabase import DBConnection
 from services import redis
 from agent.run import run_agent
+from agentpress.response_processor import CancellationToken
 from utils.auth_utils import get_current_user_id, get_user_id_from_stream_auth, verify_thread_access
 from utils.logger import logger
 
@@ -226,6 +227,9 @@ async def start_agent(thread_id: str, user_id: str = Depends(get_current_user_id
     
     project_id = thread_result.data[0]['project_id']
     
+    # The frontend adds user messages directly to the messages table
+    await thread_manager.message_cache.invalidate(thread_id)
+    
     # Check if there is already an active agent run for this project
     active_run_id = await check_for_active_project_agent_run(client, project_id)
     
@@ -457,6 +461,9 @@ async def run_agent_background(agent_run_id: str, thread_id: str, instance_id: s
     stop_signal_received = False
     stop_checker = None
     
+    # Lets a stop signal cancel running tools and the LLM stream, not just this loop
+    cancellation_token = CancellationToken()
+    
     async def check_for_stop_signal():
         nonlocal stop_signal_received
         if not pubsub:
@@ -472,6 +479,7 @@ async def run_agent_background(agent_run_id: str, thread_id: str, instance_id: s
                         if message["data"] == stop_signal or message["data"] == stop_signal.encode('utf-8'):
                             logger.info(f"Received stop signal for agent run: {agent_run_id} (instance: {instance_id})")
                             stop_signal_received = True
+                            cancellation_token.cancel("stop_signal")
                             break
                 except Exception as e:
                     logger.warning(f"Error checking for stop signals: {str(e)}")
@@ -510,7 +518,8 @@ async def run_agent_background(agent_run_id: str, thread_id: str, instance_id: s
         # Run the agent
         logger.debug(f"Initializing agent generator for thread: {thread_id} (instance: {instance_id})")
         agent_gen = run_agent(thread_id, stream=True, 
-                      thread_manager=thread_manager, project_id=project_id)
+                      thread_manager=thread_manager, project_id=project_id,
+                      cancellation_token=cancellation_token)
         
         # Collect all responses to save to database
         all_responses = []
@@ -519,6 +528,8 @@ async def run_agent_background(agent_run_id: str, thread_id: str, instance_id: s
             # Check if stop signal received
             if stop_signal_received:
                 logger.info(f"Agent run stopped due to stop signal: {agent_run_id} (instance: {instance_id})")
+                # Close the generator chain now rather than whenever it is garbage collected
+                await agent_gen.aclose()
                 break
                 
             # Store response in memory
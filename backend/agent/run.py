@@ -5,21 +5,23 @@ from typing import Optional
 from dotenv import load_dotenv
 
 from agentpress.thread_manager import ThreadManager
-from agentpress.response_processor import ProcessorConfig
+from agentpress.response_processor import ProcessorConfig, CancellationToken
+from agentpress.tool_executors import get_tool_thread_pool
 from agent.tools.sb_browse_tool import SandboxBrowseTool
 from agent.tools.sb_shell_tool import SandboxShellTool
 from agent.tools.sb_website_tool import SandboxWebsiteTool
 from agent.tools.sb_files_tool import SandboxFilesTool
+from agent.tools.tool_output_tool import ToolOutputTool
 from agent.prompt import get_system_prompt
-from agent.tools.utils.daytona_sandbox import daytona, create_sandbox
+from agent.tools.utils.daytona_sandbox import daytona, create_sandbox, sandbox_handles
 from daytona_api_client.models.workspace_state import WorkspaceState
 load_dotenv()
 
-async def run_agent(thread_id: str, project_id: str, stream: bool = True, thread_manager: Optional[ThreadManager] = None, native_max_auto_continues: int = 25):
+async def run_agent(thread_id: str, project_id: str, stream: bool = True, thread_manager: Optional[ThreadManager] = None, native_max_auto_continues: int = 25, cancellation_token: Optional[CancellationToken] = None):
     """Run the development agent with specified configuration."""
     
-    if not thread_manager:
-        thread_manager = ThreadManager()
+    # Tools are bound to this run's sandbox, so register them on a per-run view
+    thread_manager = thread_manager.fork() if thread_manager else ThreadManager()
     
     client = await thread_manager.db.client
     ## probably want to move to api.py
@@ -27,13 +29,17 @@ async def run_agent(thread_id: str, project_id: str, stream: bool = True, thread
     if project.data[0]['sandbox_id']:
         sandbox_id = project.data[0]['sandbox_id']
         sandbox_pass = project.data[0]['sandbox_pass']
-        sandbox = daytona.get_current_sandbox(sandbox_id)
+        # Shared with the run's sandbox tools and other runs on this project;
+        # fetched fresh, as a cached handle's state may predate an auto-stop
+        sandbox = (await get_tool_thread_pool().run(sandbox_handles.get, {"sandbox_id": sandbox_id, "fresh": True})).sandbox
         if sandbox.instance.state == WorkspaceState.ARCHIVED or sandbox.instance.state == WorkspaceState.STOPPED:
             try:
                 daytona.start(sandbox)
             except Exception as e:
                 print(f"Error starting sandbox: {e}")
                 raise e
+            finally:
+                sandbox_handles.invalidate(sandbox_id)
     else:
         sandbox_pass = str(uuid4())
         sandbox = create_sandbox(sandbox_pass)
@@ -48,7 +54,8 @@ async def run_agent(thread_id: str, project_id: str, stream: bool = True, thread
     thread_manager.add_tool(SandboxBrowseTool, sandbox_id=sandbox_id, password=sandbox_pass)
     thread_manager.add_tool(SandboxWebsiteTool, sandbox_id=sandbox_id, password=sandbox_pass)
     thread_manager.add_tool(SandboxShellTool, sandbox_id=sandbox_id, password=sandbox_pass)
-    thread_manager.add_tool(SandboxFilesTool, sandbox_id=sandbox_id, password=sandbox_pass)
+    files_tool = thread_manager.add_tool(SandboxFilesTool, sandbox_id=sandbox_id, password=sandbox_pass)
+    thread_manager.add_tool(ToolOutputTool, thread_id=thread_id)
 
     system_message = { "role": "system", "content": get_system_prompt() }
 
@@ -61,9 +68,11 @@ async def run_agent(thread_id: str, project_id: str, stream: bool = True, thread
     #groq/deepseek-r1-distill-llama-70b
     #bedrock/anthropic.claude-3-7-sonnet-20250219-v1:0
 
-    files_tool = SandboxFilesTool(sandbox_id=sandbox_id, password=sandbox_pass)
-
-    files_state = await files_tool.get_workspace_state()
+    # The workspace state is needed up front, so create the registered files tool now
+    # (other tools are created on first call). Its constructor and the listing call
+    # the synchronous sandbox SDK; keep them off the event loop
+    files_tool = await get_tool_thread_pool().run(files_tool.get, {})
+    files_state = await get_tool_thread_pool().run(files_tool.get_workspace_state, {})
 
     state_message = {
         "role": "user",
@@ -90,10 +99,17 @@ Current development environment workspace state:
             native_tool_calling=True,
             execute_tools=True,
             execute_on_stream=True,
-            tool_execution_strategy="parallel",
-            xml_adding_strategy="user_message"
+            tool_execution_strategy="auto",
+            max_parallel_tools=8,
+            tool_timeout=300,
+            xml_adding_strategy="user_message",
+            coalesce_content=True,
+            tool_output_max_chars=20000,
+            tool_output_preview_chars=2000,
+            tool_result_encoding="compact"
         ),
-        native_max_auto_continues=native_max_auto_continues
+        native_max_auto_continues=native_max_auto_continues,
+        cancellation_token=cancellation_token
     )
         
     if isinstance(response, dict) and "status" in response and response["status"] == "error":
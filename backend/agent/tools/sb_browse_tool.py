@@ -1,10 +1,14 @@
 import traceback
 import requests
+from typing import AsyncGenerator, Union
 
 from agentpress.tool import ToolResult, openapi_schema, xml_schema
 from agent.tools.utils.daytona_sandbox import SandboxToolsBase
 from utils.logger import logger
 
+# Seconds to wait for the sandbox browser API before giving up on an action
+BROWSER_ACTION_TIMEOUT = 300
+
 
 # TODO: might want to be more granular with the tool names:
 
@@ -57,20 +61,23 @@ class SandboxBrowseTool(SandboxToolsBase):
         <execute-browser-action>
         a simple action to do on the browser based on current state
         </execute-browser-action>
-        '''
+        ''',
+        writes=["browser"],
+        max_concurrency=1
     )
-    async def execute_browser_action(self, task_description: str) -> ToolResult:
+    async def execute_browser_action(self, task_description: str) -> AsyncGenerator[Union[str, ToolResult], None]:
         """Execute a browser task in the sandbox environment using browser-use
         
         Args:
             task_description (str): The task to execute
             
-        Returns:
-            dict: Result of the execution
+        Yields:
+            Progress messages, then the result of the execution
         """
         print(f"\033[95mExecuting browser action: {task_description}\033[0m")
         try:
-            
+            # The sandbox browser API only returns once the task is done
+            yield f"Running browser action: {task_description}"
             
             logger.info(f"Making API call to {self.api_url}/run-task with task: {task_description}")
             
@@ -78,18 +85,18 @@ class SandboxBrowseTool(SandboxToolsBase):
             response = requests.post(
                 f"{self.api_url}/run-task",
                 json={"task_description": task_description},
-                timeout=None
+                timeout=BROWSER_ACTION_TIMEOUT
             )
             
             if response.status_code == 200:
                 logger.info("API call completed successfully")
                 print(response.json())
-                return self.success_response(response.json())
+                yield self.success_response(response.json())
             else:
                 logger.error(f"API call failed with status code {response.status_code}: {response.text}")
-                return self.fail_response(f"API call failed with status code {response.status_code}: {response.text}")
+                yield self.fail_response(f"API call failed with status code {response.status_code}: {response.text}")
 
         except Exception as e:
             logger.error(f"Error executing browser action: {e}")
             print(traceback.format_exc())
-            return self.fail_response(f"Error executing browser action: {e}")
+            yield self.fail_response(f"Error executing browser action: {e}")
@@ -1,6 +1,6 @@
 from daytona_sdk.process import SessionExecuteRequest
 
-from agentpress.tool import ToolResult, openapi_schema, xml_schema
+from agentpress.tool import ToolResult, openapi_schema, xml_schema, cacheable
 from agent.tools.utils.daytona_sandbox import SandboxToolsBase
 from agent.tools.utils.exclusions import EXCLUDED_FILES, EXCLUDED_DIRS, EXCLUDED_EXT, should_exclude_file
 import os
@@ -99,7 +99,8 @@ class SandboxFilesTool(SandboxToolsBase):
         <create-file file_path="path/to/file" permissions="644">
         File contents go here
         </create-file>
-        '''
+        ''',
+        writes=["file:{file_path}"]
     )
     async def create_file(self, file_path: str, file_contents: str, permissions: str = "644") -> ToolResult:
         file_path = self.clean_path(file_path)
@@ -158,7 +159,8 @@ class SandboxFilesTool(SandboxToolsBase):
             <old_str>text to replace</old_str>
             <new_str>replacement text</new_str>
         </str-replace>
-        '''
+        ''',
+        writes=["file:{file_path}"]
     )
     async def str_replace(self, file_path: str, old_str: str, new_str: str) -> ToolResult:
         try:
@@ -230,7 +232,8 @@ class SandboxFilesTool(SandboxToolsBase):
         <full-file-rewrite file_path="path/to/file" permissions="644">
         New file contents go here, replacing all existing content
         </full-file-rewrite>
-        '''
+        ''',
+        writes=["file:{file_path}"]
     )
     async def full_file_rewrite(self, file_path: str, file_contents: str, permissions: str = "644") -> ToolResult:
         try:
@@ -271,7 +274,8 @@ class SandboxFilesTool(SandboxToolsBase):
         example='''
         <delete-file file_path="path/to/file">
         </delete-file>
-        '''
+        ''',
+        writes=["file:{file_path}"]
     )
     async def delete_file(self, file_path: str) -> ToolResult:
         try:
@@ -315,8 +319,10 @@ class SandboxFilesTool(SandboxToolsBase):
         example='''
         <search-files path="path/to/search" pattern="text-of-interest">
         </search-files>
-        '''
+        ''',
+        reads=["file:{path}*"]
     )
+    @cacheable(ttl=30)
     async def search_files(self, path: str, pattern: str) -> ToolResult:
         try:
             path = self.clean_path(path)
@@ -385,7 +391,8 @@ class SandboxFilesTool(SandboxToolsBase):
             <pattern>old_text</pattern>
             <new_value>new_text</new_value>
         </replace-in-files>
-        '''
+        ''',
+        writes=["file:{files}"]
     )
     async def replace_in_files(self, files: list[str], pattern: str, new_value: str) -> ToolResult:
         try:
@@ -1,6 +1,20 @@
+import time
+import shlex
+import asyncio
+from uuid import uuid4
+from typing import AsyncGenerator, Union
+
+from daytona_sdk.process import SessionExecuteRequest
+
 from agentpress.tool import ToolResult, openapi_schema, xml_schema
 from agent.tools.utils.daytona_sandbox import SandboxToolsBase
 
+# Seconds a command may run before it is reported as timed out
+COMMAND_TIMEOUT = 60
+
+# Seconds between polls for new command output
+COMMAND_POLL_INTERVAL = 1.0
+
 # TODO: might want to be more granular with the tool names:
 # shell_exec - Execute commands in a specified shell session. Use for running code, installing packages, or managing files.
 # shell_view - View the content of a specified shell session. Use for checking command execution results or monitoring output.
@@ -43,25 +57,52 @@ class SandboxShellTool(SandboxToolsBase):
         <execute-command>
         npm install package-name
         </execute-command>
-        '''
+        ''',
+        writes=["file:*"]
     )
-    async def execute_command(self, command: str, folder: str = None) -> ToolResult:
+    async def execute_command(self, command: str, folder: str = None) -> AsyncGenerator[Union[str, ToolResult], None]:
+        # Runs in its own session so output can be streamed while the command runs
+        folder = folder or self.workspace_path
+        session_id = f"command-{uuid4().hex[:8]}"
         try:
-            folder = folder or self.workspace_path
-            response = self.sandbox.process.exec(command, cwd=folder, timeout=60)
+            self.sandbox.process.create_session(session_id)
+            response = self.sandbox.process.execute_session_command(session_id, SessionExecuteRequest(
+                command=f"cd {shlex.quote(folder)} && {command}",
+                var_async=True
+            ))
+            
+            output = ""
+            deadline = time.monotonic() + COMMAND_TIMEOUT
+            while True:
+                exit_code = self.sandbox.process.get_session_command(session_id, response.cmd_id).exit_code
+                logs = self.sandbox.process.get_session_command_logs(session_id, response.cmd_id) or ""
+                if len(logs) > len(output):
+                    yield logs[len(output):]
+                    output = logs
+                if exit_code is not None:
+                    break
+                if time.monotonic() > deadline:
+                    yield self.fail_response(f"Command timed out after {COMMAND_TIMEOUT} seconds: {output}")
+                    return
+                await asyncio.sleep(COMMAND_POLL_INTERVAL)
             
-            if response.exit_code == 0:
-                return self.success_response({
-                    "output": response.result,
+            if exit_code == 0:
+                yield self.success_response({
+                    "output": output,
                     "error": "",
-                    "exit_code": response.exit_code,
+                    "exit_code": exit_code,
                     "cwd": folder
                 })
             else:
-                return self.fail_response(f"Command failed with exit code {response.exit_code}: {response.result}")
+                yield self.fail_response(f"Command failed with exit code {exit_code}: {output}")
                 
         except Exception as e:
-            return self.fail_response(f"Error executing command: {str(e)}")
+            yield self.fail_response(f"Error executing command: {str(e)}")
+        finally:
+            try:
+                self.sandbox.process.delete_session(session_id)
+            except Exception:
+                pass
 
 
 
@@ -71,5 +112,5 @@ async def test_shell_tool():
         password="vvv"
     )
     print("1)", "*"*10)  
-    res = await shell_tool.execute_command("ls -l")
+    res = [chunk async for chunk in shell_tool.execute_command("ls -l")][-1]
     print(res)
@@ -54,7 +54,8 @@ class SandboxWebsiteTool(SandboxToolsBase):
         </body>
         </html>
         </update-website-file>
-        '''
+        ''',
+        writes=["file:site/{file_path}"]
     )
     async def update_website_file(self, file_path: str, content: str, create_dirs: bool = True) -> ToolResult:
         print(f"\033[33mUpdating website file: {file_path}\033[0m")
@@ -90,7 +91,7 @@ class SandboxWebsiteTool(SandboxToolsBase):
             return self.success_response({
                 "message": f"File updated successfully at {file_path}",
                 "path": file_path,
-                "site_url": self.sandbox.get_preview_link(8080)
+                "site_url": self.sandbox_handle.preview_link(8080)
             })
 
         except Exception as e:
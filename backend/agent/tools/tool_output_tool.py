@@ -0,0 +1,80 @@
+from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema, offload_output
+from agentpress.tool_output_store import ToolOutputStore
+
+# Default and maximum number of characters returned per read
+DEFAULT_READ_LENGTH = 10000
+MAX_READ_LENGTH = 50000
+
+
+class ToolOutputTool(Tool):
+    """Tool for reading tool outputs that were too large to keep in the thread.
+
+    Oversized outputs are replaced in the conversation by a preview naming an
+    output_id; this tool pages in the full output.
+    """
+
+    def __init__(self, thread_id: str, store: ToolOutputStore = None):
+        super().__init__()
+        self.thread_id = thread_id
+        self.store = store or ToolOutputStore()
+
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "read_tool_output",
+            "description": "Read part of a tool output that was too large to show in full. Use the output_id given in the truncated output, and the offset at which to continue reading.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "output_id": {
+                        "type": "string",
+                        "description": "Handle of the stored output, as given in the truncated output"
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "Character offset to start reading at",
+                        "default": 0
+                    },
+                    "length": {
+                        "type": "integer",
+                        "description": f"Number of characters to read (at most {MAX_READ_LENGTH})",
+                        "default": DEFAULT_READ_LENGTH
+                    }
+                },
+                "required": ["output_id"]
+            }
+        }
+    }, reads=["tool_output:{output_id}"])
+    @xml_schema(
+        tag_name="read-tool-output",
+        mappings=[
+            {"param_name": "output_id", "node_type": "attribute", "path": "."},
+            {"param_name": "offset", "node_type": "attribute", "path": ".", "required": False},
+            {"param_name": "length", "node_type": "attribute", "path": ".", "required": False}
+        ],
+        example='''
+        <read-tool-output output_id="3f1c2a9e-0d4b-4c1e-9a57-2b8f6e7d1c30" offset="10000" length="10000"></read-tool-output>
+        ''',
+        reads=["tool_output:{output_id}"]
+    )
+    # Pages must reach the LLM as read, not be stored out of band again
+    @offload_output(False)
+    async def read_tool_output(self, output_id: str, offset: int = 0, length: int = DEFAULT_READ_LENGTH) -> ToolResult:
+        """Read part of a stored tool output.
+
+        Args:
+            output_id: Handle of the stored output
+            offset: Character offset to start reading at
+            length: Number of characters to read
+        """
+        if offset < 0 or length < 1:
+            return self.fail_response("offset must be non-negative and length positive")
+
+        try:
+            page = await self.store.read(self.thread_id, output_id, offset, min(length, MAX_READ_LENGTH))
+        except Exception as e:
+            return self.fail_response(f"Error reading tool output: {str(e)}")
+
+        if page is None:
+            return self.fail_response(f"No stored tool output with output_id {output_id}")
+        return self.success_response(page)
@@ -1,11 +1,14 @@
 import os
+import posixpath
 import requests
 from time import sleep
 
 from daytona_sdk import Daytona, DaytonaConfig, CreateSandboxParams, SessionExecuteRequest
+from daytona_api_client.models.workspace_state import WorkspaceState
 from dotenv import load_dotenv
 
 from agentpress.tool import Tool
+from agent.tools.utils.sandbox_cache import SandboxHandleCache, get_sandbox_handle_ttl
 from utils.logger import logger
 
 load_dotenv()
@@ -35,6 +38,14 @@ else:
 daytona = Daytona(config)
 logger.debug("Daytona client initialized")
 
+# Sandbox handles shared by all tools and runs; stopped or archived sandboxes
+# are about to be started, so they aren't cached
+sandbox_handles = SandboxHandleCache(
+    daytona.get_current_sandbox,
+    ttl=get_sandbox_handle_ttl(),
+    is_running=lambda sandbox: sandbox.instance.state not in (WorkspaceState.ARCHIVED, WorkspaceState.STOPPED)
+)
+
 
 sandbox_browser_api = b'''
 import traceback
@@ -316,35 +327,43 @@ def create_sandbox(password: str):
         raise Exception("API call failed after maximum attempts")
     
     logger.info(f"Sandbox environment successfully initialized")
+    sandbox_handles.put(sandbox)
     return sandbox
 
 
 class SandboxToolsBase(Tool):
     """Tool for executing tasks in a Daytona sandbox with browser-use capabilities."""
     
+    # The Daytona SDK and the sandbox HTTP APIs are synchronous
+    blocking = True
+    
+    workspace_path = "/workspace"
+    
     def __init__(self, sandbox_id: str, password: str):
         super().__init__()
         self.sandbox = None
         self.daytona = daytona
-        self.workspace_path = "/workspace"
 
         self.sandbox_id = sandbox_id
+        # Cached tool results are shared and invalidated per sandbox
+        self.cache_scope = f"sandbox:{sandbox_id}"
         logger.info(f"Initializing SandboxToolsBase with sandbox ID: {sandbox_id}")
         
         try:
             logger.debug(f"Retrieving sandbox with ID: {sandbox_id}")
-            self.sandbox = self.daytona.get_current_sandbox(self.sandbox_id)
+            self.sandbox_handle = sandbox_handles.get(self.sandbox_id)
+            self.sandbox = self.sandbox_handle.sandbox
             logger.info(f"Successfully retrieved sandbox: {self.sandbox.id}")
         except Exception as e:
             logger.error(f"Error retrieving sandbox: {str(e)}", exc_info=True)
             raise e
 
-        self.api_url = self.sandbox.get_preview_link(8000)
+        self.api_url = self.sandbox_handle.preview_link(8000)
         logger.debug(f"Sandbox API URL: {self.api_url}")
         
         # Get and log preview links
-        vnc_url = self.sandbox.get_preview_link(6080)
-        website_url = self.sandbox.get_preview_link(8080)
+        vnc_url = self.sandbox_handle.preview_link(6080)
+        website_url = self.sandbox_handle.preview_link(8080)
         
         logger.info(f"Sandbox VNC URL: {vnc_url}")
         logger.info(f"Sandbox Website URL: {website_url}")
@@ -354,7 +373,14 @@ class SandboxToolsBase(Tool):
         print(website_url)
         print("***\033[0m")
 
-    def clean_path(self, path: str) -> str:
-        cleaned_path = path.replace(self.workspace_path, "").lstrip("/")
+    @classmethod
+    def clean_path(cls, path: str) -> str:
+        cleaned_path = path.replace(cls.workspace_path, "").lstrip("/")
         logger.debug(f"Cleaned path: {path} -> {cleaned_path}")
         return cleaned_path
+
+    @classmethod
+    def normalize_resource_value(cls, value: str) -> str:
+        # Resource keys are workspace-relative paths, so "/workspace/a.txt" and "./a.txt" match
+        normalized = posixpath.normpath(cls.clean_path(value))
+        return "" if normalized == "." else normalized
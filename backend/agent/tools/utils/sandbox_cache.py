@@ -0,0 +1,170 @@
+"""
+Process-wide cache of sandbox handles and preview links.
+
+Every sandbox tool needs the sandbox handle and its preview links, and each
+lookup is a Daytona API call. Handles are cached per sandbox_id for a TTL so
+all tools of a run, and runs on the same project, share one handle; a sandbox
+whose state changes (e.g. it was stopped or archived and is being started)
+must be invalidated so the next lookup fetches it again. A cached handle's
+state is a snapshot: a sandbox may auto-stop while its handle is cached, so
+callers deciding whether to start a sandbox fetch it fresh instead.
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from utils.logger import logger
+
+DEFAULT_SANDBOX_HANDLE_TTL = 300.0
+
+
+class SandboxHandle:
+    """A fetched sandbox with its preview links, resolved once per port.
+
+    Attributes:
+        sandbox: The sandbox object returned by the Daytona SDK
+    """
+
+    def __init__(self, sandbox: Any):
+        self.sandbox = sandbox
+        self._preview_links: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def preview_link(self, port: int) -> str:
+        """Get the preview URL of a sandbox port, fetching it on first use."""
+        link = self._preview_links.get(port)
+        if link is None:
+            with self._lock:
+                link = self._preview_links.get(port)
+                if link is None:
+                    link = self._preview_links[port] = self.sandbox.get_preview_link(port)
+        return link
+
+
+class SandboxHandleCache:
+    """TTL cache of sandbox handles keyed by sandbox_id.
+
+    Attributes:
+        ttl (float): Seconds a fetched handle stays valid
+        hits (int): Lookups answered from the cache
+        misses (int): Lookups that fetched the sandbox
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Any],
+        ttl: float = DEFAULT_SANDBOX_HANDLE_TTL,
+        is_running: Optional[Callable[[Any], bool]] = None
+    ):
+        """Initialize an empty cache.
+
+        Args:
+            fetch: Function fetching a sandbox by id (e.g. daytona.get_current_sandbox)
+            ttl: Seconds a fetched handle stays valid
+            is_running: Optional check of a fetched sandbox's state; sandboxes that
+                aren't running are about to change state and are not cached
+        """
+        self.fetch = fetch
+        self.ttl = ttl
+        self.is_running = is_running
+        self._entries: Dict[str, Tuple[float, SandboxHandle]] = {}
+        self._lock = threading.Lock()
+        self._fetch_locks: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _cached(self, sandbox_id: str) -> Optional[SandboxHandle]:
+        with self._lock:
+            entry = self._entries.get(sandbox_id)
+            if entry is None:
+                return None
+            expires_at, handle = entry
+            if expires_at <= time.monotonic():
+                del self._entries[sandbox_id]
+                return None
+            self.hits += 1
+            return handle
+
+    def get(self, sandbox_id: str, fresh: bool = False) -> SandboxHandle:
+        """Get the handle of a sandbox, fetching it if not cached or expired.
+
+        Concurrent lookups of the same sandbox share a single fetch.
+
+        Args:
+            sandbox_id: ID of the sandbox
+            fresh: Fetch the sandbox even if it is cached, e.g. to check its
+                current state; the fetched handle replaces the cached one
+
+        Returns:
+            SandboxHandle of the sandbox
+        """
+        if not fresh:
+            handle = self._cached(sandbox_id)
+            if handle is not None:
+                return handle
+
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(sandbox_id, threading.Lock())
+        with fetch_lock:
+            try:
+                handle = None if fresh else self._cached(sandbox_id)
+                if handle is not None:
+                    return handle
+                with self._lock:
+                    self.misses += 1
+                logger.debug(f"Fetching sandbox {sandbox_id}")
+                sandbox = self.fetch(sandbox_id)
+                handle = SandboxHandle(sandbox)
+                with self._lock:
+                    if self.is_running is None or self.is_running(sandbox):
+                        self._entries[sandbox_id] = (time.monotonic() + self.ttl, handle)
+                    else:
+                        self._entries.pop(sandbox_id, None)
+                return handle
+            finally:
+                # Lookups already waiting hold the lock and find the cached handle;
+                # later ones start from the cache, so the lock can go
+                with self._lock:
+                    if self._fetch_locks.get(sandbox_id) is fetch_lock:
+                        del self._fetch_locks[sandbox_id]
+
+    def put(self, sandbox: Any) -> SandboxHandle:
+        """Cache a sandbox obtained otherwise (e.g. just created).
+
+        Args:
+            sandbox: The sandbox object
+
+        Returns:
+            SandboxHandle of the sandbox
+        """
+        handle = SandboxHandle(sandbox)
+        with self._lock:
+            self._entries[sandbox.id] = (time.monotonic() + self.ttl, handle)
+        return handle
+
+    def invalidate(self, sandbox_id: str):
+        """Drop the cached handle of a sandbox after its state changed."""
+        with self._lock:
+            if self._entries.pop(sandbox_id, None) is not None:
+                logger.debug(f"Invalidated cached handle of sandbox {sandbox_id}")
+
+    def stats(self) -> Dict[str, int]:
+        """Get cache counters.
+
+        Returns:
+            Dict with entries, fetches in progress, hits and misses
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "fetching": len(self._fetch_locks),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def get_sandbox_handle_ttl() -> float:
+    """Get the handle TTL from the SANDBOX_HANDLE_TTL environment variable."""
+    return float(os.getenv("SANDBOX_HANDLE_TTL", DEFAULT_SANDBOX_HANDLE_TTL))
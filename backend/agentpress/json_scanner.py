@@ -0,0 +1,110 @@
+"""
+Incremental JSON completeness detection for streamed tool call arguments.
+
+Native tool calls arrive as many small argument fragments. Instead of calling
+json.loads on the accumulated string after every fragment, the
+IncrementalJSONScanner tracks structural state (nesting depth, string and
+escape state) so each fragment is examined once and the arguments can be
+parsed exactly once, when the top-level value closes.
+"""
+
+import re
+
+# Characters that change structural state outside and inside JSON strings
+_STRUCTURAL_CHARS = re.compile(r'[{}\[\]"]')
+_STRING_CHARS = re.compile(r'["\\]')
+
+
+class IncrementalJSONScanner:
+    """Tracks whether a streamed JSON object or array is syntactically closed.
+
+    The scanner does not keep the text itself; callers accumulate fragments as
+    they already do and only parse once `complete` becomes True.
+
+    Attributes:
+        complete (bool): Whether the top-level object or array has been closed
+        invalid (bool): Whether the input cannot be a single JSON container
+            (unbalanced closers, or non-whitespace after the top-level value)
+    """
+
+    def __init__(self):
+        """Initialize an empty scanner."""
+        self.complete = False
+        self.invalid = False
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, fragment: str) -> bool:
+        """Consume the next fragment of the streamed JSON text.
+
+        Args:
+            fragment: Newly received argument text
+
+        Returns:
+            True if the top-level value is complete after this fragment
+        """
+        if not fragment or self.invalid:
+            return self.complete
+
+        if self.complete:
+            # Anything but whitespace after the closing bracket makes the value unparseable
+            if fragment.strip():
+                self.invalid = True
+                self.complete = False
+            return self.complete
+
+        pos = 0
+        length = len(fragment)
+
+        if not self._started:
+            stripped = fragment.lstrip()
+            if not stripped:
+                return False
+            if stripped[0] not in "{[":
+                # Scalars can't be detected structurally; leave them to a final parse
+                self.invalid = True
+                return False
+            self._started = True
+            pos = length - len(stripped)
+
+        while pos < length:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                match = _STRING_CHARS.search(fragment, pos)
+                if match is None:
+                    break
+                if match.group() == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                pos = match.end()
+                continue
+
+            match = _STRUCTURAL_CHARS.search(fragment, pos)
+            if match is None:
+                break
+            char = match.group()
+            pos = match.end()
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth < 0:
+                    self.invalid = True
+                    return False
+                if self._depth == 0:
+                    self.complete = True
+                    if fragment[pos:].strip():
+                        self.invalid = True
+                        self.complete = False
+                    return self.complete
+
+        return self.complete
@@ -0,0 +1,164 @@
+"""
+Write-behind persistence of thread messages.
+
+Adding a message used to await its own insert, so a turn with an assistant
+message and several tool results made that many serial database round trips
+before anything else could happen. MessageWriter queues the rows of each thread
+and inserts them with multi-row inserts instead, when a thread has max_batch
+rows queued, max_delay seconds after the first of them was queued, or when a
+caller needs them persisted and calls flush() (a barrier).
+
+Rows of a thread are inserted in the order they were queued: a thread's batches
+are inserted one at a time, each holding every row queued before it was taken.
+An insert that fails isn't retried. It is logged, and its error is raised by
+the thread's next flush(), so a failed write surfaces before anyone relies on
+the history. Queues are dropped as soon as they are idle; errors not claimed by
+a flush are kept for the max_errors most recently failing threads.
+"""
+
+import os
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+
+from utils.logger import logger
+
+DEFAULT_MAX_BATCH = 50
+DEFAULT_MAX_DELAY = 0.05
+DEFAULT_MAX_ERRORS = 1024
+
+
+class _ThreadQueue:
+    """Rows of a thread waiting to be inserted."""
+
+    def __init__(self):
+        self.rows: List[Dict[str, Any]] = []
+        # Held while a batch is inserted, so batches are inserted in order
+        self.lock = asyncio.Lock()
+        self.timer: Optional[asyncio.Task] = None
+
+
+class MessageWriter:
+    """Per-thread write-behind queues of message rows.
+
+    Attributes:
+        max_batch (int): Rows of a thread that trigger an insert
+        max_delay (float): Seconds a queued row waits at most before its insert starts
+        inserts (int): Insert calls made
+        rows_written (int): Rows inserted
+    """
+
+    def __init__(
+        self,
+        insert: Callable[[str, List[Dict[str, Any]]], Awaitable[Any]],
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        max_errors: int = DEFAULT_MAX_ERRORS
+    ):
+        """Initialize the writer.
+
+        Args:
+            insert: Coroutine function inserting the rows of a thread in one call
+            max_batch: Rows of a thread that trigger an insert
+            max_delay: Seconds a queued row waits at most before its insert starts
+            max_errors: Threads whose failed insert is kept until their next flush
+        """
+        self.insert = insert
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self.max_errors = max_errors
+        self._queues: Dict[str, _ThreadQueue] = {}
+        # First insert error of each thread since its last flush
+        self._errors: "OrderedDict[str, Exception]" = OrderedDict()
+        self.inserts = 0
+        self.rows_written = 0
+
+    async def write(self, thread_id: str, row: Dict[str, Any]):
+        """Queue a row for insertion.
+
+        Returns once the row is queued, or once a full batch was inserted.
+
+        Args:
+            thread_id: ID of the thread the row belongs to
+            row: The row to insert
+        """
+        queue = self._queues.get(thread_id)
+        if queue is None:
+            queue = self._queues[thread_id] = _ThreadQueue()
+        queue.rows.append(row)
+
+        if len(queue.rows) >= self.max_batch:
+            await self._insert_batch(thread_id, queue)
+            self._drop_if_idle(thread_id, queue)
+        elif queue.timer is None:
+            queue.timer = asyncio.create_task(self._insert_later(thread_id, queue))
+
+    async def _insert_later(self, thread_id: str, queue: _ThreadQueue):
+        await asyncio.sleep(self.max_delay)
+        queue.timer = None
+        await self._insert_batch(thread_id, queue)
+        self._drop_if_idle(thread_id, queue)
+
+    def _drop_if_idle(self, thread_id: str, queue: _ThreadQueue):
+        """Forget a queue with nothing queued or being inserted."""
+        if not queue.rows and queue.timer is None and not queue.lock.locked() and self._queues.get(thread_id) is queue:
+            del self._queues[thread_id]
+
+    async def _insert_batch(self, thread_id: str, queue: _ThreadQueue):
+        """Insert the rows queued so far, after any batch being inserted."""
+        async with queue.lock:
+            rows, queue.rows = queue.rows, []
+            if not rows:
+                return
+            if queue.timer is not None and queue.timer is not asyncio.current_task():
+                queue.timer.cancel()
+                queue.timer = None
+            try:
+                # Shielded so a cancelled caller doesn't abandon the batch mid-insert
+                await asyncio.shield(self.insert(thread_id, rows))
+                self.inserts += 1
+                self.rows_written += len(rows)
+            except Exception as e:
+                logger.error(f"Failed to write {len(rows)} messages to thread {thread_id}: {str(e)}", exc_info=True)
+                self._errors.setdefault(thread_id, e)
+                while len(self._errors) > self.max_errors:
+                    self._errors.popitem(last=False)
+
+    async def flush(self, thread_id: str):
+        """Wait until every row queued for a thread is inserted.
+
+        Args:
+            thread_id: ID of the thread
+
+        Raises:
+            Exception: The error of an insert of the thread that failed since the last flush
+        """
+        queue = self._queues.get(thread_id)
+        if queue is not None:
+            await self._insert_batch(thread_id, queue)
+            self._drop_if_idle(thread_id, queue)
+
+        error = self._errors.pop(thread_id, None)
+        if error is not None:
+            raise error
+
+    def stats(self) -> Dict[str, int]:
+        """Get writer counters.
+
+        Returns:
+            Dict with queued rows, queues, inserts and rows_written
+        """
+        queued = sum(len(queue.rows) for queue in self._queues.values())
+        return {
+            "queued": queued,
+            "queues": len(self._queues),
+            "inserts": self.inserts,
+            "rows_written": self.rows_written
+        }
+
+
+def create_message_writer(insert: Callable[[str, List[Dict[str, Any]]], Awaitable[Any]]) -> MessageWriter:
+    """Create a writer configured by MESSAGE_WRITE_BATCH_SIZE and MESSAGE_WRITE_MAX_DELAY."""
+    max_batch = int(os.getenv("MESSAGE_WRITE_BATCH_SIZE", DEFAULT_MAX_BATCH))
+    max_delay = float(os.getenv("MESSAGE_WRITE_MAX_DELAY", DEFAULT_MAX_DELAY))
+    return MessageWriter(insert, max_batch, max_delay)
@@ -10,20 +10,36 @@ This module handles processing of LLM responses including:
 
 import json
 import asyncio
+import inspect
 import re
 import uuid
+from collections import deque
+from functools import partial
 from typing import List, Dict, Any, Optional, Tuple, AsyncGenerator, Callable, Union, Literal
 from dataclasses import dataclass, field
 
 from agentpress.tool import Tool, ToolResult
 from agentpress.tool_registry import ToolRegistry
+from agentpress.tool_scheduler import ToolCallScheduler, ToolConcurrencyLimiter
+from agentpress.tool_cache import ToolResultCache
+from agentpress.tool_executors import get_tool_thread_pool, get_tool_process_pool, collect_tool_stream
+from agentpress.tool_output_store import ToolOutputStore
+from agentpress.tool_result_encoding import encode_compact, format_compact
+from agentpress.json_scanner import IncrementalJSONScanner
+from agentpress.xml_parsing import XMLTagAutomaton, XMLToolCallScanner, XMLExtractionPlan
 from utils.logger import logger
 
 # Type alias for XML result adding strategy
 XmlAddingStrategy = Literal["user_message", "assistant_message", "inline_edit"]
 
 # Type alias for tool execution strategy
-ToolExecutionStrategy = Literal["sequential", "parallel"]
+ToolExecutionStrategy = Literal["sequential", "parallel", "auto"]
+
+# Type alias for how tool results are encoded in the thread
+ToolResultEncoding = Literal["verbose", "compact"]
+
+# Matches the tag name at the start of an XML tool call chunk
+XML_TAG_NAME_PATTERN = re.compile(r'<([^\s>]+)')
 
 @dataclass
 class ToolExecutionContext:
@@ -34,6 +50,70 @@ class ToolExecutionContext:
     function_name: Optional[str] = None
     xml_tag_name: Optional[str] = None
     error: Optional[Exception] = None
+    queue_depth: int = 0  # Calls waiting for a concurrency slot ahead of this one
+    queued: bool = False  # Registered with the limiter, but not yet waiting in acquire()
+    wait_time: float = 0.0  # Seconds spent waiting for a concurrency slot
+    progress: Optional["ToolProgressBuffer"] = None  # Receives progress chunks of streaming tools
+
+class ToolProgressBuffer:
+    """Progress chunks of streaming tools, held until the response stream yields them.
+    
+    Tools add chunks as they run; the streaming loop waits on the buffer alongside
+    the LLM stream and running tools, and drains it before collecting results so
+    a tool's progress is always delivered before its result.
+    """
+    
+    def __init__(self):
+        """Initialize an empty buffer."""
+        self._chunks: deque = deque()
+        self._event = asyncio.Event()
+    
+    def put(self, context: ToolExecutionContext, chunk: Any):
+        """Add a progress chunk of the tool call described by context."""
+        self._chunks.append((context, chunk))
+        self._event.set()
+    
+    async def wait(self):
+        """Wait until at least one chunk is buffered."""
+        await self._event.wait()
+    
+    def drain(self) -> List[Tuple[ToolExecutionContext, Any]]:
+        """Remove and return all buffered chunks, oldest first."""
+        chunks = list(self._chunks)
+        self._chunks.clear()
+        self._event.clear()
+        return chunks
+
+class CancellationToken:
+    """Cooperative cancellation signal for an agent run.
+    
+    Created by whoever controls the run (e.g. the API on a stop request) and
+    passed through ThreadManager.run_thread into the ResponseProcessor, which
+    cancels in-flight tools and closes the LLM stream as soon as it fires.
+    
+    Attributes:
+        reason (str, optional): Why the run was cancelled
+    """
+    
+    def __init__(self):
+        """Initialize an uncancelled token."""
+        self._event = asyncio.Event()
+        self.reason: Optional[str] = None
+    
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancellation has been requested."""
+        return self._event.is_set()
+    
+    def cancel(self, reason: str = "cancelled"):
+        """Request cancellation; later calls keep the first reason."""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+    
+    async def wait(self):
+        """Wait until cancellation is requested."""
+        await self._event.wait()
 
 @dataclass
 class ProcessorConfig:
@@ -48,9 +128,16 @@ class ProcessorConfig:
         native_tool_calling: Enable OpenAI-style function calling format
         execute_tools: Whether to automatically execute detected tool calls
         execute_on_stream: For streaming, execute tools as they appear vs. at the end
-        tool_execution_strategy: How to execute multiple tools ("sequential" or "parallel")
+        tool_execution_strategy: How to execute multiple tools ("sequential", "parallel", or "auto"
+            to run calls concurrently unless their declared resources conflict)
         xml_adding_strategy: How to add XML tool results to the conversation
         max_xml_tool_calls: Maximum number of XML tool calls to process (0 = no limit)
+        tool_output_max_chars: Tool outputs longer than this are stored out of band and
+            only a preview is added to the thread (0 = always add the full output)
+        tool_output_preview_chars: Size of the preview of an out-of-band output
+        tool_result_encoding: How tool results are added to the thread ("verbose" for the
+            ToolResult repr, or "compact" for the output alone with minified JSON)
+        tool_result_key_abbreviations: With compact encoding, shorter names for result keys
     """
 
     xml_tool_calling: bool = True  
@@ -62,6 +149,27 @@ class ProcessorConfig:
     xml_adding_strategy: XmlAddingStrategy = "assistant_message"
     max_xml_tool_calls: int = 0  # 0 means no limit
     
+    # Maximum tools running at once (0 = no limit), and per function name or XML tag name
+    max_parallel_tools: int = 0
+    tool_concurrency_limits: Dict[str, int] = field(default_factory=dict)
+    
+    # Seconds before a tool call is abandoned (0 = no timeout), and per function name or XML tag name
+    tool_timeout: float = 0
+    tool_timeouts: Dict[str, float] = field(default_factory=dict)
+    
+    # Merge adjacent streamed content deltas into fewer, larger content events
+    coalesce_content: bool = False
+    coalesce_max_chars: int = 512
+    coalesce_max_latency: float = 0.02  # seconds
+    
+    # Outputs above the limit go to the tool output store, leaving a head/tail preview in the thread
+    tool_output_max_chars: int = 0
+    tool_output_preview_chars: int = 2000
+    
+    # Encoding of tool results in the thread, resent to the LLM on every turn
+    tool_result_encoding: ToolResultEncoding = "verbose"
+    tool_result_key_abbreviations: Dict[str, str] = field(default_factory=dict)
+    
     def __post_init__(self):
         """Validate configuration after initialization."""
         if self.xml_tool_calling is False and self.native_tool_calling is False and self.execute_tools:
@@ -72,25 +180,64 @@ class ProcessorConfig:
         
         if self.max_xml_tool_calls < 0:
             raise ValueError("max_xml_tool_calls must be a non-negative integer (0 = no limit)")
+        
+        if self.max_parallel_tools < 0 or any(limit < 1 for limit in self.tool_concurrency_limits.values()):
+            raise ValueError("max_parallel_tools must be non-negative (0 = no limit) and tool_concurrency_limits positive")
+        
+        if self.tool_timeout < 0 or any(timeout <= 0 for timeout in self.tool_timeouts.values()):
+            raise ValueError("tool_timeout must be non-negative (0 = no timeout) and tool_timeouts positive")
+        
+        if self.coalesce_max_chars < 1 or self.coalesce_max_latency < 0:
+            raise ValueError("coalesce_max_chars must be positive and coalesce_max_latency non-negative")
+        
+        if self.tool_output_max_chars < 0 or self.tool_output_preview_chars < 0:
+            raise ValueError("tool_output_max_chars and tool_output_preview_chars must be non-negative")
+        
+        if self.tool_output_max_chars and self.tool_output_preview_chars >= self.tool_output_max_chars:
+            raise ValueError("tool_output_preview_chars must be smaller than tool_output_max_chars")
+        
+        if self.tool_result_encoding not in ["verbose", "compact"]:
+            raise ValueError("tool_result_encoding must be 'verbose' or 'compact'")
 
 class ResponseProcessor:
     """Processes LLM responses, extracting and executing tool calls."""
     
-    def __init__(self, tool_registry: ToolRegistry, add_message_callback: Callable):
+    def __init__(
+        self,
+        tool_registry: ToolRegistry,
+        add_message_callback: Callable,
+        tool_output_store: Optional[ToolOutputStore] = None
+    ):
         """Initialize the ResponseProcessor.
         
         Args:
             tool_registry: Registry of available tools
             add_message_callback: Callback function to add messages to the thread
+            tool_output_store: Optional store for outputs above ProcessorConfig.tool_output_max_chars
         """
         self.tool_registry = tool_registry
         self.add_message = add_message_callback
+        self.tool_output_store = tool_output_store
+        
+        # Results of @cacheable tools, shared across responses and scoped per tool cache_scope
+        self.tool_cache = ToolResultCache()
+        
+        # Process-wide pool running blocking tools off the event loop
+        self.tool_thread_pool = get_tool_thread_pool()
+        
+        # Process-wide pool running CPU-bound tools; workers start on first use
+        self.tool_process_pool = get_tool_process_pool()
+        
+        # Automaton over the registered XML tags, rebuilt only when the registry changes
+        self._xml_automaton: Optional[XMLTagAutomaton] = None
+        self._xml_automaton_version: Optional[int] = None
         
     async def process_streaming_response(
         self,
         llm_response: AsyncGenerator,
         thread_id: str,
         config: ProcessorConfig = ProcessorConfig(),
+        cancellation_token: Optional[CancellationToken] = None,
     ) -> AsyncGenerator:
         """Process a streaming LLM response, handling tool calls and execution.
         
@@ -98,15 +245,117 @@ class ResponseProcessor:
             llm_response: Streaming response from the LLM
             thread_id: ID of the conversation thread
             config: Configuration for parsing and execution
+            cancellation_token: Optional token; when cancelled, running tools are
+                cancelled, the LLM stream is closed and a "cancelled" finish is yielded
             
         Yields:
             Formatted chunks of the response including content and tool results
         """
+        events = self._process_streaming_events(llm_response, thread_id, config, cancellation_token)
+        if config.coalesce_content:
+            events = self._coalesce_content_events(
+                events,
+                max_chars=config.coalesce_max_chars,
+                max_latency=config.coalesce_max_latency
+            )
+        
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+
+    async def _coalesce_content_events(
+        self,
+        events: AsyncGenerator,
+        max_chars: int,
+        max_latency: float
+    ) -> AsyncGenerator:
+        """Merge adjacent plain content events into single frames.
+        
+        Buffered text is flushed once it reaches max_chars, when no further event
+        arrives within max_latency seconds of the first buffered delta, and always
+        immediately before any other event (tool calls, tool status/results, finish).
+        
+        Args:
+            events: Event stream produced by the response processor
+            max_chars: Flush once this many characters are buffered
+            max_latency: Maximum time in seconds a delta may wait in the buffer
+            
+        Yields:
+            The same events, with runs of content deltas merged
+        """
+        buffer: List[str] = []
+        buffered_chars = 0
+        flush_deadline = 0.0
+        loop = asyncio.get_running_loop()
+        next_event_task = None
+        
+        try:
+            while True:
+                if next_event_task is None:
+                    next_event_task = asyncio.create_task(events.__anext__())
+                
+                if buffer:
+                    # Wait no longer than the oldest buffered delta is allowed to wait
+                    timeout = max(0.0, flush_deadline - loop.time())
+                    await asyncio.wait({next_event_task}, timeout=timeout)
+                    if not next_event_task.done():
+                        yield {"type": "content", "content": "".join(buffer)}
+                        buffer, buffered_chars = [], 0
+                        continue
+                
+                try:
+                    event = await next_event_task
+                except StopAsyncIteration:
+                    break
+                finally:
+                    next_event_task = None
+                
+                # Only plain text deltas are merged; native tool call frames pass through
+                if event.get("type") == "content" and set(event) == {"type", "content"}:
+                    if not buffer:
+                        flush_deadline = loop.time() + max_latency
+                    buffer.append(event["content"])
+                    buffered_chars += len(event["content"])
+                    if buffered_chars >= max_chars:
+                        yield {"type": "content", "content": "".join(buffer)}
+                        buffer, buffered_chars = [], 0
+                    continue
+                
+                if buffer:
+                    yield {"type": "content", "content": "".join(buffer)}
+                    buffer, buffered_chars = [], 0
+                yield event
+            
+            if buffer:
+                yield {"type": "content", "content": "".join(buffer)}
+        
+        finally:
+            if next_event_task is not None and not next_event_task.done():
+                # Let the cancelled read finish before closing the generator it is running
+                next_event_task.cancel()
+                await asyncio.gather(next_event_task, return_exceptions=True)
+            await events.aclose()
+
+    async def _process_streaming_events(
+        self,
+        llm_response: AsyncGenerator,
+        thread_id: str,
+        config: ProcessorConfig,
+        cancellation_token: Optional[CancellationToken] = None
+    ) -> AsyncGenerator:
+        """Produce one event per streamed delta, tool status change and tool result."""
         accumulated_content = ""
         tool_calls_buffer = {}  # For tracking partial tool calls in streaming mode
         
-        # For XML parsing
-        current_xml_content = ""
+        # Per tool call index: completeness scanner over the streamed arguments,
+        # and the arguments parsed once the scanner reports them complete
+        tool_args_scanners: Dict[int, IncrementalJSONScanner] = {}
+        parsed_tool_args: Dict[int, Any] = {}
+        
+        # For XML parsing - the scanner keeps its position between content deltas
+        xml_scanner = self._create_xml_scanner()
         xml_chunks_buffer = []
         
         # For tracking tool results during streaming to add later
@@ -115,6 +364,16 @@ class ResponseProcessor:
         # For tracking pending tool executions
         pending_tool_executions = []
         
+        # Bounds the tools running at once for this response
+        tool_limiter = self._create_concurrency_limiter(config)
+        
+        # With the "auto" strategy, tools started on stream wait for earlier conflicting ones
+        tool_scheduler = ToolCallScheduler(self.tool_registry, self._execute_tool) if config.tool_execution_strategy == "auto" else None
+        
+        # Progress chunks of streaming tools started on stream, forwarded as tool_progress events
+        tool_progress = ToolProgressBuffer()
+        progress_wait_task = None
+        
         # Tool index counter for tracking all tool executions
         tool_index = 0
         
@@ -131,9 +390,53 @@ class ResponseProcessor:
         if config.max_xml_tool_calls > 0:
             logger.info(f"XML tool call limit enabled: {config.max_xml_tool_calls}")
         
+        # The LLM stream and running tools are multiplexed, so tool results are
+        # delivered as soon as each tool finishes rather than on the next chunk
+        llm_iterator = llm_response.__aiter__()
+        next_chunk_task = None
+        
+        # Cancellation is one more thing to wait for alongside the stream and tools
+        cancel_wait_task = asyncio.create_task(cancellation_token.wait()) if cancellation_token else None
+        
         try:
-            async for chunk in llm_response:
-                # Default content to yield
+            while True:
+                if next_chunk_task is None:
+                    next_chunk_task = asyncio.create_task(self._next_stream_chunk(llm_iterator))
+                
+                if progress_wait_task is None:
+                    progress_wait_task = asyncio.create_task(tool_progress.wait())
+                
+                # Wait for the next LLM chunk, tool progress or any running tool, whichever comes first
+                wait_tasks = {next_chunk_task, progress_wait_task}
+                wait_tasks.update(execution["task"] for execution in pending_tool_executions)
+                if cancel_wait_task is not None:
+                    wait_tasks.add(cancel_wait_task)
+                await asyncio.wait(wait_tasks, return_when=asyncio.FIRST_COMPLETED)
+                
+                # Yield progress of running tools, then status and result of every tool that has finished
+                for context, chunk in tool_progress.drain():
+                    yield self._yield_tool_progress(context, chunk)
+                if progress_wait_task.done():
+                    progress_wait_task = None
+                for event in self._collect_completed_executions(pending_tool_executions, tool_results_buffer):
+                    yield event
+                
+                if cancellation_token is not None and cancellation_token.cancelled:
+                    logger.info(f"Stream cancelled ({cancellation_token.reason}) for thread {thread_id}")
+                    finish_reason = "cancelled"
+                    break
+                
+                if not next_chunk_task.done():
+                    continue
+                
+                try:
+                    chunk = next_chunk_task.result()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    next_chunk_task = None
+                
+                delta = None
                 
                 # Check for finish_reason
                 if hasattr(chunk, 'choices') and chunk.choices and hasattr(chunk.choices[0], 'finish_reason') and chunk.choices[0].finish_reason:
@@ -147,7 +450,6 @@ class ResponseProcessor:
                     if delta and hasattr(delta, 'content') and delta.content:
                         chunk_content = delta.content
                         accumulated_content += chunk_content
-                        current_xml_content += chunk_content
                         
                         # Always yield the content chunk first
                         yield {"type": "content", "content": chunk_content}
@@ -159,11 +461,9 @@ class ResponseProcessor:
                                 # Skip XML tool call parsing if we've reached the limit
                                 continue
                             
-                            # Extract complete XML chunks
-                            xml_chunks = self._extract_xml_chunks(current_xml_content)
+                            # Feed only the new content; complete XML chunks are returned once closed
+                            xml_chunks = xml_scanner.feed(chunk_content)
                             for xml_chunk in xml_chunks:
-                                # Remove the chunk from current buffer to avoid re-processing
-                                current_xml_content = current_xml_content.replace(xml_chunk, "", 1)
                                 xml_chunks_buffer.append(xml_chunk)
                                 
                                 # Parse and extract the tool call
@@ -180,11 +480,11 @@ class ResponseProcessor:
                                     
                                     # Execute tool if needed, but in background
                                     if config.execute_tools and config.execute_on_stream:
-                                        # Yield tool execution start message
-                                        yield self._yield_tool_started(context)
-                                        
                                         # Start tool execution as a background task
-                                        execution_task = asyncio.create_task(self._execute_tool(tool_call))
+                                        execution_task = self._start_tool_execution(tool_call, context, tool_scheduler, tool_limiter, config, tool_progress)
+                                        
+                                        # Yield tool execution start message (with the queue depth it was started at)
+                                        yield self._yield_tool_started(context)
                                         
                                         # Store the task for later retrieval 
                                         pending_tool_executions.append({
@@ -246,6 +546,7 @@ class ResponseProcessor:
                         
                         # Initialize or update tool call in buffer
                         if idx not in tool_calls_buffer:
+                            tool_args_scanners[idx] = IncrementalJSONScanner()
                             tool_calls_buffer[idx] = {
                                 'id': tool_call.id if hasattr(tool_call, 'id') and tool_call.id else str(uuid.uuid4()),
                                 'type': 'function',
@@ -262,23 +563,27 @@ class ResponseProcessor:
                             current_tool['function']['name'] = tool_call.function.name
                         if hasattr(tool_call.function, 'arguments') and tool_call.function.arguments:
                             current_tool['function']['arguments'] += tool_call.function.arguments
+                            # Only the new fragment is scanned, not the accumulated arguments
+                            tool_args_scanners[idx].feed(tool_call.function.arguments)
                         
-                        # Check if we have a complete tool call
+                        # Check if we have a complete tool call - arguments are parsed exactly once
                         has_complete_tool_call = False
-                        if (current_tool['id'] and 
-                            current_tool['function']['name'] and 
-                            current_tool['function']['arguments']):
+                        if (idx not in parsed_tool_args and
+                            tool_args_scanners[idx].complete and
+                            current_tool['id'] and 
+                            current_tool['function']['name']):
                             try:
-                                json.loads(current_tool['function']['arguments'])
+                                parsed_tool_args[idx] = json.loads(current_tool['function']['arguments'])
                                 has_complete_tool_call = True
                             except json.JSONDecodeError:
-                                pass
+                                logger.warning(f"Tool call {idx} arguments closed but failed to parse")
+                                tool_args_scanners[idx].invalid = True
                         
                         if has_complete_tool_call and config.execute_tools and config.execute_on_stream:
                             # Execute this tool call
                             tool_call_data = {
                                 "function_name": current_tool['function']['name'],
-                                "arguments": json.loads(current_tool['function']['arguments']),
+                                "arguments": parsed_tool_args[idx],
                                 "id": current_tool['id']
                             }
                             
@@ -288,11 +593,11 @@ class ResponseProcessor:
                                 tool_index=tool_index
                             )
                             
-                            # Yield tool execution start message
-                            yield self._yield_tool_started(context)
-                            
                             # Start tool execution as a background task
-                            execution_task = asyncio.create_task(self._execute_tool(tool_call_data))
+                            execution_task = self._start_tool_execution(tool_call_data, context, tool_scheduler, tool_limiter, config, tool_progress)
+                            
+                            # Yield tool execution start message (with the queue depth it was started at)
+                            yield self._yield_tool_started(context)
                             
                             # Store the task for later retrieval 
                             pending_tool_executions.append({
@@ -309,113 +614,31 @@ class ResponseProcessor:
                 if finish_reason == "xml_tool_limit_reached":
                     logger.info("Stopping stream due to XML tool call limit")
                     break
+
+            # On cancellation, stop the provider stream and every running tool right away
+            if finish_reason == "cancelled":
+                await self._close_llm_stream(llm_response, next_chunk_task)
+                next_chunk_task = None
+                await self._cancel_tool_executions(pending_tool_executions)
             
-                # Check for completed tool executions
-                completed_executions = []
-                for i, execution in enumerate(pending_tool_executions):
-                    if execution["task"].done():
-                        try:
-                            # Get the result
-                            result = execution["task"].result()
-                            tool_call = execution["tool_call"]
-                            tool_index = execution.get("tool_index", -1)
-                            
-                            # Store result for later database updates
-                            tool_results_buffer.append((tool_call, result))
-                            
-                            # Get or create the context
-                            if "context" in execution:
-                                context = execution["context"]
-                                context.result = result
-                            else:
-                                context = self._create_tool_context(tool_call, tool_index)
-                                context.result = result
-                            
-                            # Yield tool status message first
-                            yield self._yield_tool_completed(context)
-                            
-                            # Yield tool execution result
-                            yield self._yield_tool_result(context)
-                            
-                            # Mark for removal
-                            completed_executions.append(i)
-                            
-                        except Exception as e:
-                            logger.error(f"Error getting tool execution result: {str(e)}")
-                            tool_call = execution["tool_call"]
-                            tool_index = execution.get("tool_index", -1)
-                            
-                            # Get or create the context
-                            if "context" in execution:
-                                context = execution["context"]
-                                context.error = e
-                            else:
-                                context = self._create_tool_context(tool_call, tool_index)
-                                context.error = e
-                            
-                            # Yield error status for the tool
-                            yield self._yield_tool_error(context)
-                            
-                            # Mark for removal
-                            completed_executions.append(i)
-                
-                # Remove completed executions from pending list (in reverse to maintain indices)
-                for i in sorted(completed_executions, reverse=True):
-                    pending_tool_executions.pop(i)
-            
-            # After streaming completes or is stopped due to limit, wait for any remaining tool executions
+            # After streaming completes or is stopped due to limit, deliver each remaining
+            # tool execution as soon as it completes
             if pending_tool_executions:
                 logger.info(f"Waiting for {len(pending_tool_executions)} pending tool executions to complete")
-                
-                # Wait for all pending tasks to complete
-                pending_tasks = [execution["task"] for execution in pending_tool_executions]
-                done, _ = await asyncio.wait(pending_tasks)
-                
-                # Process results
-                for execution in pending_tool_executions:
-                    try:
-                        if execution["task"].done():
-                            result = execution["task"].result()
-                            tool_call = execution["tool_call"]
-                            tool_index = execution.get("tool_index", -1)
-                            
-                            # Store result for later
-                            tool_results_buffer.append((tool_call, result))
-                            
-                            # Get or create the context
-                            if "context" in execution:
-                                context = execution["context"]
-                                context.result = result
-                            else:
-                                context = self._create_tool_context(tool_call, tool_index)
-                                context.result = result
-                            
-                            # Yield tool status message first
-                            yield self._yield_tool_completed(context)
-                            
-                            # Yield tool execution result
-                            yield self._yield_tool_result(context)
-                    except Exception as e:
-                        logger.error(f"Error processing remaining tool execution: {str(e)}")
-                        # Yield error status for the tool
-                        if "tool_call" in execution:
-                            tool_call = execution["tool_call"]
-                            tool_index = execution.get("tool_index", -1)
-                            # Get or create the context
-                            if "context" in execution:
-                                context = execution["context"]
-                                context.error = e
-                            else:
-                                context = self._create_tool_context(tool_call, tool_index)
-                                context.error = e
-                            formatted_result = self._format_xml_tool_result(tool_call, result)
-                            yield {
-                                "type": "tool_result",
-                                "function_name": context.function_name,
-                                "xml_tag_name": context.xml_tag_name,
-                                "result": formatted_result,
-                                "tool_index": tool_index
-                            }
+            
+            while pending_tool_executions:
+                if progress_wait_task is None:
+                    progress_wait_task = asyncio.create_task(tool_progress.wait())
+                await asyncio.wait(
+                    [progress_wait_task] + [execution["task"] for execution in pending_tool_executions],
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for context, chunk in tool_progress.drain():
+                    yield self._yield_tool_progress(context, chunk)
+                if progress_wait_task.done():
+                    progress_wait_task = None
+                for event in self._collect_completed_executions(pending_tool_executions, tool_results_buffer):
+                    yield event
             
             # If stream was stopped due to XML limit, report custom finish reason
             if finish_reason == "xml_tool_limit_reached":
@@ -436,7 +659,12 @@ class ResponseProcessor:
                             if (tool_call['id'] and 
                                 tool_call['function']['name'] and 
                                 tool_call['function']['arguments']):
-                                args = json.loads(tool_call['function']['arguments'])
+                                # Reuse the arguments parsed during streaming; parse here only
+                                # if the scanner never saw them close (e.g. a top-level scalar)
+                                if idx in parsed_tool_args:
+                                    args = parsed_tool_args[idx]
+                                else:
+                                    args = json.loads(tool_call['function']['arguments'])
                                 complete_native_tool_calls.append({
                                     "id": tool_call['id'],
                                     "type": "function",
@@ -448,6 +676,14 @@ class ResponseProcessor:
                         except json.JSONDecodeError:
                             continue
                 
+                # A cancelled run keeps only the tool calls that produced a result,
+                # so every persisted call has a matching tool message
+                if finish_reason == "cancelled":
+                    completed_ids = {tool_call.get("id") for tool_call, _ in tool_results_buffer}
+                    complete_native_tool_calls = [
+                        tool_call for tool_call in complete_native_tool_calls if tool_call["id"] in completed_ids
+                    ]
+                
                 # Add assistant message with accumulated content
                 message_data = {
                     "role": "assistant",
@@ -468,7 +704,8 @@ class ResponseProcessor:
                         thread_id, 
                         tool_call, 
                         result, 
-                        config.xml_adding_strategy
+                        config.xml_adding_strategy,
+                        config
                     )
                     
                     # Create context for tool result
@@ -483,7 +720,7 @@ class ResponseProcessor:
                 
                 # Execute any remaining tool calls if not done during streaming
                 # Only process if we haven't reached the XML limit
-                if config.execute_tools and not config.execute_on_stream and (config.max_xml_tool_calls == 0 or xml_tool_call_count < config.max_xml_tool_calls):
+                if config.execute_tools and not config.execute_on_stream and finish_reason != "cancelled" and (config.max_xml_tool_calls == 0 or xml_tool_call_count < config.max_xml_tool_calls):
                     tool_calls_to_execute = []
                     
                     # Process native tool calls
@@ -496,11 +733,8 @@ class ResponseProcessor:
                             })
                     
                     # Process XML tool calls - only if we haven't hit the limit
+                    # (the scanner has already emitted every complete XML chunk into xml_chunks_buffer)
                     if config.xml_tool_calling and (config.max_xml_tool_calls == 0 or xml_tool_call_count < config.max_xml_tool_calls):
-                        # Extract any remaining complete XML chunks
-                        xml_chunks = self._extract_xml_chunks(current_xml_content)
-                        xml_chunks_buffer.extend(xml_chunks)
-                        
                         # Only process up to the limit
                         remaining_xml_calls = config.max_xml_tool_calls - xml_tool_call_count if config.max_xml_tool_calls > 0 else len(xml_chunks_buffer)
                         xml_chunks_to_process = xml_chunks_buffer[:remaining_xml_calls] if remaining_xml_calls > 0 else []
@@ -515,7 +749,9 @@ class ResponseProcessor:
                     if tool_calls_to_execute:
                         tool_results = await self._execute_tools(
                             tool_calls_to_execute,
-                            config.tool_execution_strategy
+                            config.tool_execution_strategy,
+                            tool_limiter,
+                            config
                         )
                         
                         for tool_call, result in tool_results:
@@ -524,7 +760,8 @@ class ResponseProcessor:
                                 thread_id, 
                                 tool_call, 
                                 result, 
-                                config.xml_adding_strategy
+                                config.xml_adding_strategy,
+                                config
                             )
                             
                             # Create context for tool result
@@ -543,16 +780,116 @@ class ResponseProcessor:
                         "type": "finish",
                         "finish_reason": finish_reason
                     }
+            
+            elif finish_reason == "cancelled":
+                yield {
+                    "type": "finish",
+                    "finish_reason": "cancelled"
+                }
         
         except Exception as e:
             logger.error(f"Error processing stream: {str(e)}", exc_info=True)
             yield {"type": "error", "message": str(e)}
+        
+        finally:
+            # Don't leave a read on the LLM stream dangling if we stopped early
+            if next_chunk_task is not None and not next_chunk_task.done():
+                next_chunk_task.cancel()
+            if cancel_wait_task is not None:
+                cancel_wait_task.cancel()
+            if progress_wait_task is not None:
+                progress_wait_task.cancel()
+            
+            # Nobody will collect the results of tools still running if we stopped early
+            for execution in pending_tool_executions:
+                execution["task"].cancel()
+
+    @staticmethod
+    async def _next_stream_chunk(llm_iterator) -> Any:
+        """Await the next chunk from the LLM stream (raises StopAsyncIteration at the end)."""
+        return await llm_iterator.__anext__()
+
+    async def _close_llm_stream(self, llm_response: AsyncGenerator, next_chunk_task: Optional[asyncio.Task]):
+        """Stop reading from the LLM stream and close it so the provider stops generating."""
+        if next_chunk_task is not None and not next_chunk_task.done():
+            next_chunk_task.cancel()
+            await asyncio.gather(next_chunk_task, return_exceptions=True)
+        
+        aclose = getattr(llm_response, "aclose", None)
+        if aclose is None:
+            return
+        try:
+            await aclose()
+            logger.debug("Closed LLM response stream")
+        except Exception as e:
+            logger.warning(f"Error closing LLM response stream: {str(e)}")
+
+    async def _cancel_tool_executions(self, pending_tool_executions: List[Dict[str, Any]]):
+        """Cancel running tool executions and wait for them to unwind."""
+        if not pending_tool_executions:
+            return
+        
+        logger.info(f"Cancelling {len(pending_tool_executions)} running tool executions")
+        tasks = [execution["task"] for execution in pending_tool_executions]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        pending_tool_executions.clear()
+
+    def _collect_completed_executions(
+        self,
+        pending_tool_executions: List[Dict[str, Any]],
+        tool_results_buffer: List[Tuple[Dict[str, Any], ToolResult]]
+    ) -> List[Dict[str, Any]]:
+        """Remove finished executions from the pending list and build their stream events.
+        
+        Args:
+            pending_tool_executions: Executions started during streaming (modified in place)
+            tool_results_buffer: Collected (tool_call, result) pairs to persist later (appended to)
+            
+        Returns:
+            Status and result events for every execution that has finished
+        """
+        events = []
+        still_pending = []
+        
+        for execution in pending_tool_executions:
+            if not execution["task"].done():
+                still_pending.append(execution)
+                continue
+            
+            tool_call = execution["tool_call"]
+            context = execution.get("context") or self._create_tool_context(tool_call, execution.get("tool_index", -1))
+            
+            if execution["task"].cancelled():
+                context.error = Exception("Tool execution was cancelled")
+                events.append(self._yield_tool_error(context))
+                continue
+            
+            try:
+                result = execution["task"].result()
+                context.result = result
+                
+                # Store result for later database updates
+                tool_results_buffer.append((tool_call, result))
+                
+                # Tool status message first, then the result itself
+                events.append(self._yield_tool_completed(context))
+                events.append(self._yield_tool_result(context))
+            except Exception as e:
+                logger.error(f"Error getting tool execution result: {str(e)}")
+                context.error = e
+                events.append(self._yield_tool_error(context))
+        
+        pending_tool_executions[:] = still_pending
+        return events
 
     async def process_non_streaming_response(
         self,
         llm_response: Any,
         thread_id: str,
         config: ProcessorConfig = ProcessorConfig(),
+        cancellation_token: Optional[CancellationToken] = None,
     ) -> AsyncGenerator:
         """Process a non-streaming LLM response, handling tool calls and execution.
         
@@ -560,6 +897,8 @@ class ResponseProcessor:
             llm_response: Response from the LLM
             thread_id: ID of the conversation thread
             config: Configuration for parsing and execution
+            cancellation_token: Optional token; when cancelled, running tools are
+                cancelled and a "cancelled" finish is yielded
             
         Yields:
             Formatted response including content and tool results
@@ -605,15 +944,16 @@ class ResponseProcessor:
                         native_tool_calls = []
                         for tool_call in response_message.tool_calls:
                             if hasattr(tool_call, 'function'):
+                                tool_call_id = tool_call.id if hasattr(tool_call, 'id') else str(uuid.uuid4())
                                 tool_calls.append({
                                     "function_name": tool_call.function.name,
                                     "arguments": json.loads(tool_call.function.arguments) if isinstance(tool_call.function.arguments, str) else tool_call.function.arguments,
-                                    "id": tool_call.id if hasattr(tool_call, 'id') else str(uuid.uuid4())
+                                    "id": tool_call_id
                                 })
                                 
                                 # Also save in native format for message creation
                                 native_tool_calls.append({
-                                    "id": tool_call.id if hasattr(tool_call, 'id') else str(uuid.uuid4()),
+                                    "id": tool_call_id,
                                     "type": "function",
                                     "function": {
                                         "name": tool_call.function.name,
@@ -621,11 +961,49 @@ class ResponseProcessor:
                                     }
                                 })
             
-            # Add assistant message FIRST
+            native_tool_calls = native_tool_calls if config.native_tool_calling and 'native_tool_calls' in locals() else None
+            
+            # Yield content first
+            yield {"type": "content", "content": content}
+            
+            # Execute tools if needed; the assistant message is added after them,
+            # once it's known which native tool calls will have a result
+            tool_results = []
+            cancelled = False
+            if config.execute_tools and tool_calls:
+                # Log tool execution strategy
+                logger.info(f"Executing {len(tool_calls)} tools with strategy: {config.tool_execution_strategy}")
+                
+                # Execute tools with the specified strategy, unless the run is cancelled first
+                execution_task = asyncio.create_task(self._execute_tools(
+                    tool_calls, 
+                    config.tool_execution_strategy,
+                    self._create_concurrency_limiter(config),
+                    config
+                ))
+                if cancellation_token is not None:
+                    cancel_wait_task = asyncio.create_task(cancellation_token.wait())
+                    await asyncio.wait({execution_task, cancel_wait_task}, return_when=asyncio.FIRST_COMPLETED)
+                    cancel_wait_task.cancel()
+                    if not execution_task.done():
+                        logger.info(f"Tool execution cancelled ({cancellation_token.reason}) for thread {thread_id}")
+                        execution_task.cancel()
+                        await asyncio.gather(execution_task, return_exceptions=True)
+                        cancelled = True
+                if not cancelled:
+                    tool_results = await execution_task
+            
+            # A cancelled run keeps only the tool calls that produced a result,
+            # so every persisted call has a matching tool message
+            if cancelled and native_tool_calls:
+                completed_ids = {tool_call.get("id") for tool_call, _ in tool_results}
+                native_tool_calls = [tool_call for tool_call in native_tool_calls if tool_call["id"] in completed_ids]
+            
+            # Add the assistant message BEFORE its tool results
             message_data = {
                 "role": "assistant",
                 "content": content,
-                "tool_calls": native_tool_calls if config.native_tool_calling and 'native_tool_calls' in locals() else None
+                "tool_calls": native_tool_calls or None
             }
             await self.add_message(
                 thread_id=thread_id, 
@@ -634,39 +1012,30 @@ class ResponseProcessor:
                 is_llm_message=True
             )
             
-            # Yield content first
-            yield {"type": "content", "content": content}
+            if cancelled:
+                yield {"type": "finish", "finish_reason": "cancelled"}
+                return
             
-            # Execute tools if needed - AFTER assistant message has been added
-            if config.execute_tools and tool_calls:
-                # Log tool execution strategy
-                logger.info(f"Executing {len(tool_calls)} tools with strategy: {config.tool_execution_strategy}")
-                
-                # Execute tools with the specified strategy
-                tool_results = await self._execute_tools(
-                    tool_calls, 
-                    config.tool_execution_strategy
+            for tool_call, result in tool_results:
+                # Add result based on tool type
+                await self._add_tool_result(
+                    thread_id, 
+                    tool_call, 
+                    result, 
+                    config.xml_adding_strategy,
+                    config
                 )
                 
-                for tool_call, result in tool_results:
-                    # Add result based on tool type
-                    await self._add_tool_result(
-                        thread_id, 
-                        tool_call, 
-                        result, 
-                        config.xml_adding_strategy
-                    )
-                    
-                    # Create context for tool result
-                    context = self._create_tool_context(tool_call, tool_index)
-                    context.result = result
-                    
-                    # Yield tool execution result
-                    yield self._yield_tool_result(context)
-                    
-                    # Increment tool index for next tool
-                    tool_index += 1
-            
+                # Create context for tool result
+                context = self._create_tool_context(tool_call, tool_index)
+                context.result = result
+                
+                # Yield tool execution result
+                yield self._yield_tool_result(context)
+                
+                # Increment tool index for next tool
+                tool_index += 1
+        
             # If we hit the XML tool call limit, report it
             if finish_reason == "xml_tool_limit_reached":
                 yield {
@@ -686,148 +1055,33 @@ class ResponseProcessor:
             yield {"type": "error", "message": str(e)}
 
     # XML parsing methods
-    def _extract_tag_content(self, xml_chunk: str, tag_name: str) -> Tuple[Optional[str], Optional[str]]:
-        """Extract content between opening and closing tags, handling nested tags."""
-        start_tag = f'<{tag_name}'
-        end_tag = f'</{tag_name}>'
+    def _create_xml_scanner(self) -> XMLToolCallScanner:
+        """Create a resumable scanner over the currently registered XML tags.
         
-        try:
-            # Find start tag position
-            start_pos = xml_chunk.find(start_tag)
-            if start_pos == -1:
-                return None, xml_chunk
-                
-            # Find end of opening tag
-            tag_end = xml_chunk.find('>', start_pos)
-            if tag_end == -1:
-                return None, xml_chunk
-                
-            # Find matching closing tag
-            content_start = tag_end + 1
-            nesting_level = 1
-            pos = content_start
-            
-            while nesting_level > 0 and pos < len(xml_chunk):
-                next_start = xml_chunk.find(start_tag, pos)
-                next_end = xml_chunk.find(end_tag, pos)
-                
-                if next_end == -1:
-                    return None, xml_chunk
-                    
-                if next_start != -1 and next_start < next_end:
-                    nesting_level += 1
-                    pos = next_start + len(start_tag)
-                else:
-                    nesting_level -= 1
-                    if nesting_level == 0:
-                        content = xml_chunk[content_start:next_end]
-                        remaining = xml_chunk[next_end + len(end_tag):]
-                        return content, remaining
-                    else:
-                        pos = next_end + len(end_tag)
-            
-            return None, xml_chunk
-            
-        except Exception as e:
-            logger.error(f"Error extracting tag content: {e}")
-            return None, xml_chunk
-
-    def _extract_attribute(self, opening_tag: str, attr_name: str) -> Optional[str]:
-        """Extract attribute value from opening tag."""
-        try:
-            # Handle both single and double quotes with raw strings
-            patterns = [
-                fr'{attr_name}="([^"]*)"',  # Double quotes
-                fr"{attr_name}='([^']*)'",  # Single quotes
-                fr'{attr_name}=([^\s/>;]+)'  # No quotes - fixed escape sequence
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, opening_tag)
-                if match:
-                    value = match.group(1)
-                    # Unescape common XML entities
-                    value = value.replace('&quot;', '"').replace('&apos;', "'")
-                    value = value.replace('&lt;', '<').replace('&gt;', '>')
-                    value = value.replace('&amp;', '&')
-                    return value
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error extracting attribute: {e}")
-            return None
+        The underlying automaton is shared between scanners and only rebuilt
+        when the registry version changes.
+        """
+        if self._xml_automaton is None or self._xml_automaton_version != self.tool_registry.version:
+            tag_names = self.tool_registry.xml_tools.keys()
+            logger.debug(f"Building XML tag automaton for {len(tag_names)} tags")
+            self._xml_automaton = XMLTagAutomaton(tag_names)
+            self._xml_automaton_version = self.tool_registry.version
+        return XMLToolCallScanner(self._xml_automaton)
 
     def _extract_xml_chunks(self, content: str) -> List[str]:
-        """Extract complete XML chunks using start and end pattern matching."""
-        chunks = []
-        pos = 0
-        
+        """Extract complete XML chunks from a full piece of content in a single pass."""
         try:
-            while pos < len(content):
-                # Find the next tool tag
-                next_tag_start = -1
-                current_tag = None
-                
-                # Find the earliest occurrence of any registered tag
-                for tag_name in self.tool_registry.xml_tools.keys():
-                    start_pattern = f'<{tag_name}'
-                    tag_pos = content.find(start_pattern, pos)
-                    
-                    if tag_pos != -1 and (next_tag_start == -1 or tag_pos < next_tag_start):
-                        next_tag_start = tag_pos
-                        current_tag = tag_name
-                
-                if next_tag_start == -1 or not current_tag:
-                    break
-                
-                # Find the matching end tag
-                end_pattern = f'</{current_tag}>'
-                tag_stack = []
-                chunk_start = next_tag_start
-                current_pos = next_tag_start
-                
-                while current_pos < len(content):
-                    # Look for next start or end tag of the same type
-                    next_start = content.find(f'<{current_tag}', current_pos + 1)
-                    next_end = content.find(end_pattern, current_pos)
-                    
-                    if next_end == -1:  # No closing tag found
-                        break
-                    
-                    if next_start != -1 and next_start < next_end:
-                        # Found nested start tag
-                        tag_stack.append(next_start)
-                        current_pos = next_start + 1
-                    else:
-                        # Found end tag
-                        if not tag_stack:  # This is our matching end tag
-                            chunk_end = next_end + len(end_pattern)
-                            chunk = content[chunk_start:chunk_end]
-                            chunks.append(chunk)
-                            pos = chunk_end
-                            break
-                        else:
-                            # Pop nested tag
-                            tag_stack.pop()
-                            current_pos = next_end + 1
-                
-                if current_pos >= len(content):  # Reached end without finding closing tag
-                    break
-                
-                pos = max(pos + 1, current_pos)
-        
+            return self._create_xml_scanner().feed(content)
         except Exception as e:
             logger.error(f"Error extracting XML chunks: {e}")
             logger.error(f"Content was: {content}")
-        
-        return chunks
+            return []
 
     def _parse_xml_tool_call(self, xml_chunk: str) -> Optional[Dict[str, Any]]:
-        """Parse XML chunk into tool call format."""
+        """Parse XML chunk into tool call format using the tag's precompiled extraction plan."""
         try:
             # Extract tag name and validate
-            tag_match = re.match(r'<([^\s>]+)', xml_chunk)
+            tag_match = XML_TAG_NAME_PATTERN.match(xml_chunk)
             if not tag_match:
                 logger.error(f"No tag found in XML chunk: {xml_chunk}")
                 return None
@@ -845,50 +1099,14 @@ class ResponseProcessor:
             # This is the actual function name to call (e.g., "create_file")
             function_name = tool_info['method']
             
-            schema = tool_info['schema'].xml_schema
-            params = {}
-            remaining_chunk = xml_chunk
+            # Plans are compiled at registration; compile here only for entries added by hand
+            plan = tool_info.get('plan')
+            if plan is None:
+                plan = tool_info['plan'] = XMLExtractionPlan(tool_info['schema'].xml_schema)
             
-            # Process each mapping
-            for mapping in schema.mappings:
-                try:
-                    if mapping.node_type == "attribute":
-                        # Extract attribute from opening tag
-                        opening_tag = remaining_chunk.split('>', 1)[0]
-                        value = self._extract_attribute(opening_tag, mapping.path)
-                        if value is not None:
-                            params[mapping.param_name] = value
-                            logger.info(f"Found attribute {mapping.path} -> {mapping.param_name}: {value}")
-                
-                    elif mapping.node_type == "element":
-                        # Extract element content
-                        content, remaining_chunk = self._extract_tag_content(remaining_chunk, mapping.path)
-                        if content is not None:
-                            params[mapping.param_name] = content.strip()
-                            logger.info(f"Found element {mapping.path} -> {mapping.param_name}")
-                
-                    elif mapping.node_type == "text":
-                        if mapping.path == ".":
-                            # Extract root content
-                            content, _ = self._extract_tag_content(remaining_chunk, xml_tag_name)
-                            if content is not None:
-                                params[mapping.param_name] = content.strip()
-                                logger.info(f"Found text content for {mapping.param_name}")
-                
-                    elif mapping.node_type == "content":
-                        if mapping.path == ".":
-                            # Extract root content
-                            content, _ = self._extract_tag_content(remaining_chunk, xml_tag_name)
-                            if content is not None:
-                                params[mapping.param_name] = content.strip()
-                                logger.info(f"Found root content for {mapping.param_name}")
-                
-                except Exception as e:
-                    logger.error(f"Error processing mapping {mapping}: {e}")
-                    continue
+            params, missing = plan.extract(xml_chunk)
             
             # Validate required parameters
-            missing = [mapping.param_name for mapping in schema.mappings if mapping.required and mapping.param_name not in params]
             if missing:
                 logger.error(f"Missing required parameters: {missing}")
                 logger.error(f"Current params: {params}")
@@ -902,7 +1120,7 @@ class ResponseProcessor:
                 "arguments": params              # The extracted parameters
             }
             
-            logger.info(f"Created tool call: {tool_call}")
+            logger.info(f"Created tool call: {function_name} with parameters {list(params.keys())}")
             return tool_call
             
         except Exception as e:
@@ -928,8 +1146,74 @@ class ResponseProcessor:
         return tool_calls
 
     # Tool execution methods
-    async def _execute_tool(self, tool_call: Dict[str, Any]) -> ToolResult:
-        """Execute a single tool call and return the result."""
+    def _create_concurrency_limiter(self, config: ProcessorConfig) -> ToolConcurrencyLimiter:
+        """Create the limiter bounding concurrent tool calls for one response."""
+        return ToolConcurrencyLimiter(
+            max_parallel_tools=config.max_parallel_tools,
+            tool_limits=config.tool_concurrency_limits,
+            default_limit=self.tool_registry.get_max_concurrency
+        )
+
+    def _get_tool_timeout(self, tool_call: Dict[str, Any], config: Optional[ProcessorConfig]) -> Optional[float]:
+        """Resolve the timeout for a call: per function or XML tag name, else the default."""
+        if config is None:
+            return None
+        timeout = (
+            config.tool_timeouts.get(tool_call.get("function_name", ""))
+            or config.tool_timeouts.get(tool_call.get("xml_tag_name") or "")
+            or config.tool_timeout
+        )
+        return timeout or None
+
+    async def _execute_tool(
+        self,
+        tool_call: Dict[str, Any],
+        limiter: Optional[ToolConcurrencyLimiter] = None,
+        context: Optional[ToolExecutionContext] = None,
+        timeout: Optional[float] = None
+    ) -> ToolResult:
+        """Execute a single tool call and return the result.
+        
+        Args:
+            tool_call: The tool call to execute
+            limiter: Optional limiter to wait on for a concurrency slot
+            context: Context of a call started on stream; it was registered with the
+                limiter when started and receives the time spent waiting
+            timeout: Optional seconds the tool may run (not counting time spent waiting)
+        """
+        # Streaming tools started on stream report their progress through the context
+        on_progress = partial(context.progress.put, context) if context is not None and context.progress is not None else None
+        
+        if limiter is None:
+            return await self._run_tool(tool_call, timeout, on_progress)
+        
+        if context is None:
+            limiter.submit()
+        elif context.queued:
+            # acquire() unregisters the call from here on
+            context.queued = False
+        wait_time = await limiter.acquire(tool_call)
+        if context is not None:
+            context.wait_time = wait_time
+        if wait_time > 0.001:
+            logger.debug(f"Tool {tool_call.get('function_name')} waited {wait_time:.3f}s for a concurrency slot")
+        
+        try:
+            return await self._run_tool(tool_call, timeout, on_progress)
+        finally:
+            limiter.release(tool_call)
+
+    async def _run_tool(
+        self,
+        tool_call: Dict[str, Any],
+        timeout: Optional[float] = None,
+        on_progress: Optional[Callable[[Any], None]] = None
+    ) -> ToolResult:
+        """Look up and invoke the tool function for a call, abandoning it after timeout seconds.
+        
+        Streaming tools (async generators) pass each progress chunk to on_progress,
+        if given, and produce their last yielded ToolResult.
+        """
         try:
             function_name = tool_call["function_name"]
             arguments = tool_call["arguments"]
@@ -942,27 +1226,100 @@ class ResponseProcessor:
                 except json.JSONDecodeError:
                     arguments = {"text": arguments}
             
-            # Get available functions from tool registry
-            available_functions = self.tool_registry.get_available_functions()
+            # Reject malformed calls before they reach the tool, or create it; XML
+            # values are parsed as strings and converted to the declared types
+            validator = self.tool_registry.get_validator(function_name)
+            if validator is not None:
+                arguments, errors = validator.validate(arguments, coerce_strings="xml_tag_name" in tool_call)
+                if errors:
+                    logger.warning(f"Invalid arguments for tool {function_name}: {errors}")
+                    return ToolResult(success=False, output=json.dumps({
+                        "error": f"Invalid arguments for tool '{function_name}'",
+                        "errors": errors
+                    }, indent=2))
             
-            # Look up the function by name
-            tool_fn = available_functions.get(function_name)
+            # Look up the function in the registry's prebuilt dispatch map. Tools are
+            # created on their first valid call; constructors of blocking tools (e.g.
+            # sandbox lookups) run in the thread pool like their methods
+            tool_class = self.tool_registry.get_unbound_tool_class(function_name)
+            if tool_class is not None and tool_class.blocking:
+                tool_fn = await self.tool_thread_pool.run(self.tool_registry.get_function, {"function_name": function_name})
+            else:
+                tool_fn = self.tool_registry.get_function(function_name)
             if not tool_fn:
                 logger.error(f"Tool function '{function_name}' not found in registry")
                 return ToolResult(success=False, output=f"Tool function '{function_name}' not found")
             
+            # Idempotent tools may be answered from the cache; anything that may
+            # mutate state invalidates the cache for its scope before and after running.
+            # The cache is shared by every run, so tools without a scope aren't cached
+            cache_options = getattr(tool_fn, 'tool_cache_options', None)
+            cache_scope = getattr(getattr(tool_fn, '__self__', None), 'cache_scope', None)
+            mutating = cache_options is None and self._may_mutate(tool_fn)
+            if cache_options is not None and cache_scope is None:
+                logger.debug(f"Tool {function_name} has no cache scope; not caching its result")
+                cache_options = None
+            if cache_options is not None:
+                # Captured before the lookup, so a result computed across an
+                # invalidation of the scope isn't cached
+                cache_generation = self.tool_cache.generation(cache_scope)
+                cached = self.tool_cache.get(cache_scope, function_name, arguments, cache_options)
+                if cached is not None:
+                    logger.info(f"Tool result served from cache: {function_name}")
+                    return cached
+            elif mutating:
+                self.tool_cache.invalidate(cache_scope)
+            
             logger.debug(f"Found tool function for '{function_name}', executing...")
-            result = await tool_fn(**arguments)
+            if getattr(tool_fn, 'tool_executor', None) == "process":
+                # CPU-bound tools run in a worker process; progress isn't forwarded
+                execution = self.tool_process_pool.run(tool_fn, arguments)
+            elif self._is_blocking(tool_fn):
+                # On timeout the worker thread keeps running until the blocking call returns
+                execution = self.tool_thread_pool.run(tool_fn, arguments, on_progress)
+            elif inspect.isasyncgenfunction(tool_fn):
+                execution = collect_tool_stream(tool_fn(**arguments), on_progress)
+            else:
+                execution = tool_fn(**arguments)
+            try:
+                result = await asyncio.wait_for(execution, timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Tool {function_name} timed out after {timeout}s")
+                return ToolResult(success=False, output=f"Tool '{function_name}' timed out after {timeout} seconds")
+            finally:
+                if mutating:
+                    self.tool_cache.invalidate(cache_scope)
+            
+            if cache_options is not None and result.success:
+                self.tool_cache.put(cache_scope, function_name, arguments, cache_options, result, cache_generation)
             logger.info(f"Tool execution complete: {function_name} -> {result}")
             return result
         except Exception as e:
             logger.error(f"Error executing tool {tool_call['function_name']}: {str(e)}", exc_info=True)
             return ToolResult(success=False, output=f"Error executing tool: {str(e)}")
 
+    @staticmethod
+    def _is_blocking(tool_fn: Callable) -> bool:
+        """Whether a tool function must run in the thread pool: per its executor or @blocking_io, else per its tool class."""
+        if getattr(tool_fn, 'tool_executor', None) == "thread":
+            return True
+        enabled = getattr(tool_fn, 'tool_blocking', None)
+        if enabled is None:
+            enabled = getattr(getattr(tool_fn, '__self__', None), 'blocking', False)
+        return enabled
+
+    @staticmethod
+    def _may_mutate(tool_fn: Callable) -> bool:
+        """Whether a tool function may change state: it declares writes, or declares nothing."""
+        resources = getattr(tool_fn, 'tool_resources', None)
+        return resources is None or bool(resources.writes)
+
     async def _execute_tools(
         self, 
         tool_calls: List[Dict[str, Any]], 
-        execution_strategy: ToolExecutionStrategy = "sequential"
+        execution_strategy: ToolExecutionStrategy = "sequential",
+        limiter: Optional[ToolConcurrencyLimiter] = None,
+        config: Optional[ProcessorConfig] = None
     ) -> List[Tuple[Dict[str, Any], ToolResult]]:
         """Execute tool calls with the specified strategy.
         
@@ -974,6 +1331,10 @@ class ResponseProcessor:
             execution_strategy: Strategy for executing tools:
                 - "sequential": Execute tools one after another, waiting for each to complete
                 - "parallel": Execute all tools simultaneously for better performance 
+                - "auto": Execute tools simultaneously, but serialize calls whose declared
+                  resources conflict (e.g. two edits of the same file)
+            limiter: Optional limiter bounding how many tools run at once
+            config: Optional configuration supplying tool timeouts
                 
         Returns:
             List of tuples containing the original tool call and its result
@@ -981,14 +1342,21 @@ class ResponseProcessor:
         logger.info(f"Executing {len(tool_calls)} tools with strategy: {execution_strategy}")
             
         if execution_strategy == "sequential":
-            return await self._execute_tools_sequentially(tool_calls)
+            return await self._execute_tools_sequentially(tool_calls, limiter, config)
         elif execution_strategy == "parallel":
-            return await self._execute_tools_in_parallel(tool_calls)
+            return await self._execute_tools_in_parallel(tool_calls, limiter, config)
+        elif execution_strategy == "auto":
+            return await self._execute_tools_by_resources(tool_calls, limiter, config)
         else:
             logger.warning(f"Unknown execution strategy: {execution_strategy}, falling back to sequential")
-            return await self._execute_tools_sequentially(tool_calls)
+            return await self._execute_tools_sequentially(tool_calls, limiter, config)
 
-    async def _execute_tools_sequentially(self, tool_calls: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], ToolResult]]:
+    async def _execute_tools_sequentially(
+        self,
+        tool_calls: List[Dict[str, Any]],
+        limiter: Optional[ToolConcurrencyLimiter] = None,
+        config: Optional[ProcessorConfig] = None
+    ) -> List[Tuple[Dict[str, Any], ToolResult]]:
         """Execute tool calls sequentially and return results.
         
         This method executes tool calls one after another, waiting for each tool to complete
@@ -1013,7 +1381,7 @@ class ResponseProcessor:
                 logger.debug(f"Executing tool {index+1}/{len(tool_calls)}: {tool_name}")
                 
                 try:
-                    result = await self._execute_tool(tool_call)
+                    result = await self._execute_tool(tool_call, limiter, timeout=self._get_tool_timeout(tool_call, config))
                     results.append((tool_call, result))
                     logger.debug(f"Completed tool {tool_name} with success={result.success}")
                 except Exception as e:
@@ -1036,7 +1404,12 @@ class ResponseProcessor:
                             
             return (results if 'results' in locals() else []) + error_results
 
-    async def _execute_tools_in_parallel(self, tool_calls: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], ToolResult]]:
+    async def _execute_tools_in_parallel(
+        self,
+        tool_calls: List[Dict[str, Any]],
+        limiter: Optional[ToolConcurrencyLimiter] = None,
+        config: Optional[ProcessorConfig] = None
+    ) -> List[Tuple[Dict[str, Any], ToolResult]]:
         """Execute tool calls in parallel and return results.
         
         This method executes all tool calls simultaneously using asyncio.gather, which
@@ -1056,7 +1429,10 @@ class ResponseProcessor:
             logger.info(f"Executing {len(tool_calls)} tools in parallel: {tool_names}")
             
             # Create tasks for all tool calls
-            tasks = [self._execute_tool(tool_call) for tool_call in tool_calls]
+            tasks = [
+                self._execute_tool(tool_call, limiter, timeout=self._get_tool_timeout(tool_call, config))
+                for tool_call in tool_calls
+            ]
             
             # Execute all tasks concurrently with error handling
             results = await asyncio.gather(*tasks, return_exceptions=True)
@@ -1081,15 +1457,99 @@ class ResponseProcessor:
             return [(tool_call, ToolResult(success=False, output=f"Execution error: {str(e)}")) 
                     for tool_call in tool_calls]
 
+    async def _execute_tools_by_resources(
+        self,
+        tool_calls: List[Dict[str, Any]],
+        limiter: Optional[ToolConcurrencyLimiter] = None,
+        config: Optional[ProcessorConfig] = None
+    ) -> List[Tuple[Dict[str, Any], ToolResult]]:
+        """Execute tool calls concurrently, ordering only the calls that conflict.
+        
+        Each call waits for the earlier calls whose declared read/write resources
+        conflict with its own; calls to tools without declarations run exclusively.
+        
+        Args:
+            tool_calls: List of tool calls to execute
+            
+        Returns:
+            List of tuples containing the original tool call and its result, in the original order
+        """
+        if not tool_calls:
+            return []
+            
+        try:
+            tool_names = [t.get('function_name', 'unknown') for t in tool_calls]
+            logger.info(f"Executing {len(tool_calls)} tools by declared resources: {tool_names}")
+            
+            scheduler = ToolCallScheduler(self.tool_registry, self._execute_tool)
+            tasks = [
+                scheduler.submit(tool_call, limiter=limiter, timeout=self._get_tool_timeout(tool_call, config))
+                for tool_call in tool_calls
+            ]
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            
+            processed_results = []
+            for tool_call, result in zip(tool_calls, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error executing tool {tool_call.get('function_name', 'unknown')}: {str(result)}")
+                    error_result = ToolResult(success=False, output=f"Error executing tool: {str(result)}")
+                    processed_results.append((tool_call, error_result))
+                else:
+                    processed_results.append((tool_call, result))
+            
+            logger.info(f"Resource-aware execution completed for {len(tool_calls)} tools")
+            return processed_results
+        
+        except Exception as e:
+            logger.error(f"Error in resource-aware tool execution: {str(e)}", exc_info=True)
+            return [(tool_call, ToolResult(success=False, output=f"Execution error: {str(e)}")) 
+                    for tool_call in tool_calls]
+
+    def _start_tool_execution(
+        self,
+        tool_call: Dict[str, Any],
+        context: ToolExecutionContext,
+        tool_scheduler: Optional[ToolCallScheduler],
+        tool_limiter: ToolConcurrencyLimiter,
+        config: ProcessorConfig,
+        tool_progress: Optional[ToolProgressBuffer] = None
+    ) -> asyncio.Task:
+        """Start a tool call in the background, through the scheduler if one is in use."""
+        context.queue_depth = tool_limiter.submit()
+        context.queued = True
+        context.progress = tool_progress
+        timeout = self._get_tool_timeout(tool_call, config)
+        if tool_scheduler is not None:
+            task = tool_scheduler.submit(tool_call, limiter=tool_limiter, context=context, timeout=timeout)
+        else:
+            task = asyncio.create_task(self._execute_tool(tool_call, tool_limiter, context, timeout))
+        
+        # A call cancelled before it waits for a slot (e.g. while the scheduler
+        # holds it back) never reaches acquire(), so withdraw it here
+        def withdraw_if_queued(_):
+            if context.queued:
+                context.queued = False
+                tool_limiter.withdraw()
+        task.add_done_callback(withdraw_if_queued)
+        return task
+
     async def _add_tool_result(
         self, 
         thread_id: str, 
         tool_call: Dict[str, Any], 
         result: ToolResult,
-        strategy: Union[XmlAddingStrategy, str] = "assistant_message"
+        strategy: Union[XmlAddingStrategy, str] = "assistant_message",
+        config: Optional[ProcessorConfig] = None
     ):
         """Add a tool result to the thread based on the specified format."""
         try:
+            compact = config is not None and config.tool_result_encoding == "compact"
+            if compact:
+                result = encode_compact(result, config.tool_result_key_abbreviations)
+            
+            if config is not None and config.tool_output_max_chars:
+                result = await self._offload_tool_output(thread_id, tool_call, result, config)
+            
             # Check if this is a native function call (has id field)
             if "id" in tool_call:
                 # Format as a proper tool message according to OpenAI spec
@@ -1140,7 +1600,7 @@ class ResponseProcessor:
             context.result = result
             
             # Format the content using the formatting helper
-            content = self._format_xml_tool_result(tool_call, result)
+            content = self._format_xml_tool_result(tool_call, result, compact)
             
             # Add the message with the appropriate role
             result_message = {
@@ -1170,24 +1630,51 @@ class ResponseProcessor:
             except Exception as e2:
                 logger.error(f"Failed even with fallback message: {str(e2)}", exc_info=True)
 
-    def _format_xml_tool_result(self, tool_call: Dict[str, Any], result: ToolResult) -> str:
+    async def _offload_tool_output(
+        self,
+        thread_id: str,
+        tool_call: Dict[str, Any],
+        result: ToolResult,
+        config: ProcessorConfig
+    ) -> ToolResult:
+        """Replace an oversized output by a preview, storing the full output out of band."""
+        if self.tool_output_store is None or not self.tool_registry.get_offload_output(tool_call.get("function_name", "")):
+            return result
+        output = result.output if isinstance(result.output, str) else json.dumps(result.output)
+        if len(output) <= config.tool_output_max_chars:
+            return result
+        
+        try:
+            preview = await self.tool_output_store.offload(
+                thread_id, tool_call.get("function_name", ""), output, config.tool_output_preview_chars
+            )
+        except Exception as e:
+            # Keeping the full output in the thread is better than losing it
+            logger.error(f"Error storing oversized tool output: {str(e)}", exc_info=True)
+            return result
+        return ToolResult(success=result.success, output=preview)
+
+    def _format_xml_tool_result(self, tool_call: Dict[str, Any], result: ToolResult, compact: bool = False) -> str:
         """Format a tool result as an XML tag or plain text.
         
         Args:
             tool_call: The tool call that was executed
             result: The result of the tool execution
+            compact: Format the output alone instead of the ToolResult repr
             
         Returns:
             String containing the formatted result
         """
+        text = format_compact(result) if compact else str(result)
+        
         # Always use xml_tag_name if it exists
         if "xml_tag_name" in tool_call:
             xml_tag_name = tool_call["xml_tag_name"]
-            return f"<{xml_tag_name}> {str(result)} </{xml_tag_name}>"
+            return f"<{xml_tag_name}> {text} </{xml_tag_name}>"
         
         # Non-XML tool, just return the function result
         function_name = tool_call["function_name"]
-        return f"Result for {function_name}: {str(result)}"
+        return f"Result for {function_name}: {text}"
 
     # At class level, define a method for yielding tool results
     def _yield_tool_result(self, context: ToolExecutionContext) -> Dict[str, Any]:
@@ -1237,6 +1724,17 @@ class ResponseProcessor:
             "function_name": context.function_name,
             "xml_tag_name": context.xml_tag_name,
             "message": f"Starting execution of {tool_name}",
+            "tool_index": context.tool_index,
+            "queue_depth": context.queue_depth
+        }
+        
+    def _yield_tool_progress(self, context: ToolExecutionContext, chunk: Any) -> Dict[str, Any]:
+        """Format and return a progress message of a streaming tool."""
+        return {
+            "type": "tool_progress",
+            "function_name": context.function_name,
+            "xml_tag_name": context.xml_tag_name,
+            "content": chunk,
             "tool_index": context.tool_index
         }
         
@@ -1252,7 +1750,9 @@ class ResponseProcessor:
             "function_name": context.function_name,
             "xml_tag_name": context.xml_tag_name,
             "message": f"Tool {tool_name} {'completed successfully' if context.result.success else 'failed'}",
-            "tool_index": context.tool_index
+            "tool_index": context.tool_index,
+            "queue_depth": context.queue_depth,
+            "wait_time": round(context.wait_time, 3)
         }
         
     def _yield_tool_error(self, context: ToolExecutionContext) -> Dict[str, Any]:
@@ -1265,5 +1765,7 @@ class ResponseProcessor:
             "function_name": context.function_name,
             "xml_tag_name": context.xml_tag_name,
             "message": f"Error executing tool: {error_msg}",
-            "tool_index": context.tool_index
+            "tool_index": context.tool_index,
+            "queue_depth": context.queue_depth,
+            "wait_time": round(context.wait_time, 3)
         } 
\ No newline at end of file
@@ -11,13 +11,19 @@ This module provides comprehensive conversation management, including:
 
 import json
 import uuid
+import inspect
 from typing import List, Dict, Any, Optional, Type, Union, AsyncGenerator, Tuple, Callable, Literal
 from services.llm import make_llm_api_call
 from agentpress.tool import Tool, ToolResult
 from agentpress.tool_registry import ToolRegistry
+from agentpress.tool_output_store import ToolOutputStore
+from agentpress.thread_message_cache import ThreadMessageCache, get_thread_message_cache
+from agentpress.message_writer import MessageWriter, create_message_writer
+from agentpress.token_counter import get_token_counter
 from agentpress.response_processor import (
     ResponseProcessor, 
-    ProcessorConfig    
+    ProcessorConfig,
+    CancellationToken
 )
 from services.supabase import DBConnection
 from utils.logger import logger
@@ -33,18 +39,42 @@ class ThreadManager:
     XML-based tool execution patterns.
     """
 
-    def __init__(self):
-        """Initialize ThreadManager."""
+    def __init__(self, tool_registry: Optional[ToolRegistry] = None, message_cache: Optional[ThreadMessageCache] = None):
+        """Initialize ThreadManager.
+        
+        Args:
+            tool_registry: Registry of tools to use. Defaults to a new, empty registry.
+            message_cache: Cache of thread messages. Defaults to the process-wide cache.
+        """
         self.db = DBConnection()
-        self.tool_registry = ToolRegistry()
+        self.tool_registry = tool_registry or ToolRegistry()
+        self.message_cache = message_cache or get_thread_message_cache()
+        self.message_writer: MessageWriter = create_message_writer(self._insert_messages)
+        self.token_counter = get_token_counter()
+        # Token totals of this manager, i.e. of a run for a fork
+        self.token_usage = {"llm_calls": 0, "prompt_tokens": 0, "last_prompt_tokens": 0, "message_tokens": 0}
         self.response_processor = ResponseProcessor(
             tool_registry=self.tool_registry,
-            add_message_callback=self.add_message
+            add_message_callback=self.add_message,
+            tool_output_store=ToolOutputStore(self.db)
         )
 
+    def fork(self) -> 'ThreadManager':
+        """Create a ThreadManager for a single agent run.
+        
+        The fork starts with this manager's tools and shares its database
+        connection, message queues and cached tool results, but tools added to it (e.g. bound to a
+        run's sandbox) are not visible to this manager or to other forks. The
+        fork's token_usage counts only its own run.
+        """
+        thread_manager = ThreadManager(tool_registry=self.tool_registry.view(), message_cache=self.message_cache)
+        thread_manager.message_writer = self.message_writer
+        thread_manager.response_processor.tool_cache = self.response_processor.tool_cache
+        return thread_manager
+
     def add_tool(self, tool_class: Type[Tool], function_names: Optional[List[str]] = None, **kwargs):
-        """Add a tool to the ThreadManager."""
-        self.tool_registry.register_tool(tool_class, function_names, **kwargs)
+        """Add a tool to the ThreadManager; the tool is created on first use."""
+        return self.tool_registry.register_tool(tool_class, function_names, **kwargs)
 
     async def add_message(
         self, 
@@ -56,35 +86,89 @@ class ThreadManager:
     ):
         """Add a message to the thread in the database.
 
+        The message is queued and written with other messages of the thread in
+        a single insert; call flush_messages() to wait until it is persisted.
+
         Args:
             thread_id: The ID of the thread to add the message to.
             type: The type of the message (e.g., 'text', 'image_url', 'tool_call', 'tool', 'user', 'assistant').
             content: The content of the message. Can be a dictionary, list, or string.
-                     It will be stored as JSONB in the database.
+                     It is stored as is in the JSONB column, so it must not be
+                     modified after being added.
             is_llm_message: Flag indicating if the message originated from the LLM.
                             Defaults to False (user message).
             metadata: Optional dictionary for additional message metadata.
                       Defaults to None, stored as an empty JSONB object if None.
+                      The token count of LLM messages is added as token_count.
         """
         logger.debug(f"Adding message of type '{type}' to thread {thread_id}")
-        client = await self.db.client
+        
+        # Count LLM messages once, as the LLM will see them; the count is stored
+        # with the message and read back when it is part of a prompt
+        llm_message = None
+        token_count = None
+        if is_llm_message and not isinstance(content, str):
+            llm_message = self._format_llm_message(content)
+            token_count = self.token_counter.count_message(llm_message)
+            metadata = {**(metadata or {}), 'token_count': token_count}
+            self.token_usage['message_tokens'] += token_count
         
         # Prepare data for insertion
         data_to_insert = {
             'thread_id': thread_id,
             'type': type,
-            'content': json.dumps(content) if isinstance(content, (dict, list)) else content,
+            'content': content,
             'is_llm_message': is_llm_message,
-            'metadata': json.dumps(metadata or {}), # Ensure metadata is always a JSON object
+            'metadata': metadata or {}, # Ensure metadata is always a JSON object
         }
         
+        await self.message_writer.write(thread_id, data_to_insert)
+        
+        # Keep the cached history in step, so the next get_messages needs no query
+        if llm_message is not None:
+            await self.message_cache.append(thread_id, llm_message, token_count)
+
+    async def _insert_messages(self, thread_id: str, rows: List[Dict[str, Any]]):
+        """Insert queued messages of a thread in one request, in order."""
+        client = await self.db.client
         try:
-            result = await client.table('messages').insert(data_to_insert).execute()
-            logger.info(f"Successfully added message to thread {thread_id}")
-        except Exception as e:
-            logger.error(f"Failed to add message to thread {thread_id}: {str(e)}", exc_info=True)
+            await client.table('messages').insert(rows).execute()
+            logger.info(f"Successfully added {len(rows)} messages to thread {thread_id}")
+        except Exception:
+            # The cache already holds the messages; don't serve a history the database lacks
+            await self.message_cache.invalidate(thread_id)
             raise
 
+    async def flush_messages(self, thread_id: str):
+        """Wait until every message added to a thread is persisted.
+        
+        Raises:
+            Exception: If writing a message of the thread failed since the last flush
+        """
+        await self.message_writer.flush(thread_id)
+
+    @staticmethod
+    def _format_llm_message(message: Union[Dict[str, Any], List[Any]]) -> Any:
+        """Format message content as get_llm_formatted_messages does.
+        
+        tool_calls function arguments are converted to strings, in a copy of the
+        message, since the content itself is still waiting to be written.
+        """
+        if not isinstance(message, dict) or not message.get('tool_calls'):
+            return message
+        
+        tool_calls = []
+        for tool_call in message['tool_calls']:
+            if isinstance(tool_call, dict) and 'function' in tool_call:
+                # Ensure function.arguments is a string
+                if 'arguments' in tool_call['function'] and not isinstance(tool_call['function']['arguments'], str):
+                    # Log and fix the issue
+                    logger.warning(f"Found non-string arguments in tool_call, converting to string")
+                    function = {**tool_call['function'], 'arguments': json.dumps(tool_call['function']['arguments'])}
+                    tool_call = {**tool_call, 'function': function}
+            tool_calls.append(tool_call)
+        return {**message, 'tool_calls': tool_calls}
+
     async def get_messages(self, thread_id: str) -> List[Dict[str, Any]]:
         """Get all messages for a thread.
         
@@ -94,44 +178,82 @@ class ThreadManager:
         Returns:
             List of message objects.
         """
+        messages, _ = await self.get_messages_with_token_counts(thread_id)
+        return messages
+
+    async def get_messages_with_token_counts(self, thread_id: str) -> Tuple[List[Dict[str, Any]], List[Optional[int]]]:
+        """Get all messages for a thread with the token counts stored with them.
+        
+        Args:
+            thread_id: The ID of the thread to get messages for.
+            
+        Returns:
+            Tuple of the message objects and the token count of each, None for
+            messages stored without one.
+            
+        Notes:
+            - Served from the thread message cache when it holds the thread's
+              current history; otherwise loaded from the database and cached
+            - Messages still queued for the thread are persisted first
+        """
         logger.debug(f"Getting messages for thread {thread_id}")
+        await self.flush_messages(thread_id)
+        messages, token_counts, version = await self.message_cache.get(thread_id)
+        if messages is not None:
+            return messages, token_counts
+        
         client = await self.db.client
         
         try:
-            result = await client.rpc('get_llm_formatted_messages', {'p_thread_id': thread_id}).execute()
+            result = await client.rpc('get_llm_formatted_messages_with_token_counts', {'p_thread_id': thread_id}).execute()
             
-            # Parse the returned data which might be stringified JSON
-            if not result.data:
-                return []
-                
-            # Return properly parsed JSON objects
-            messages = []
-            for item in result.data:
-                if isinstance(item, str):
-                    try:
-                        parsed_item = json.loads(item)
-                        messages.append(parsed_item)
-                    except json.JSONDecodeError:
-                        logger.error(f"Failed to parse message: {item}")
-                else:
-                    messages.append(item)
-
-            # Ensure tool_calls have properly formatted function arguments
-            for message in messages:
-                if message.get('tool_calls'):
-                    for tool_call in message['tool_calls']:
-                        if isinstance(tool_call, dict) and 'function' in tool_call:
-                            # Ensure function.arguments is a string
-                            if 'arguments' in tool_call['function'] and not isinstance(tool_call['function']['arguments'], str):
-                                # Log and fix the issue
-                                logger.warning(f"Found non-string arguments in tool_call, converting to string")
-                                tool_call['function']['arguments'] = json.dumps(tool_call['function']['arguments'])
+            # Messages come back as JSON objects, already formatted for the LLM;
+            # the few stored as plain strings aren't messages the LLM can take
+            messages, token_counts = [], []
+            for row in result.data or []:
+                if isinstance(row['message'], str):
+                    logger.error(f"Skipping message stored as a string: {row['message']}")
+                    continue
+                messages.append(row['message'])
+                token_counts.append(row['token_count'])
 
-            return messages
+            await self.message_cache.put(thread_id, messages, version, token_counts)
+            return messages, token_counts
             
         except Exception as e:
             logger.error(f"Failed to get messages for thread {thread_id}: {str(e)}", exc_info=True)
-            return []
+            return [], []
+
+    async def get_messages_since(self, thread_id: str, cursor: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Get the messages of a thread added after a cursor.
+        
+        Messages carry a per-thread sequence number that increases in insertion
+        order, so a caller holding the last one it saw fetches only newer messages.
+        
+        Args:
+            thread_id: The ID of the thread to get messages for.
+            cursor: Sequence number of the last message already seen (0 for all).
+            
+        Returns:
+            Tuple of the newer messages, in order, and the cursor to pass next time.
+        """
+        logger.debug(f"Getting messages for thread {thread_id} since {cursor}")
+        await self.flush_messages(thread_id)
+        client = await self.db.client
+        
+        result = await client.rpc('get_llm_formatted_messages_since', {
+            'p_thread_id': thread_id,
+            'p_cursor': cursor
+        }).execute()
+        
+        messages = []
+        for row in result.data or []:
+            cursor = max(cursor, row['seq'])
+            if isinstance(row['message'], str):
+                logger.error(f"Skipping message stored as a string: {row['message']}")
+                continue
+            messages.append(row['message'])
+        return messages, cursor
 
     async def run_thread(
         self,
@@ -146,6 +268,7 @@ class ThreadManager:
         tool_choice: ToolChoice = "auto",
         native_max_auto_continues: int = 25,
         max_xml_tool_calls: int = 0,
+        cancellation_token: Optional[CancellationToken] = None,
     ) -> Union[Dict[str, Any], AsyncGenerator]:
         """Run a conversation thread with LLM integration and tool execution.
         
@@ -162,6 +285,8 @@ class ThreadManager:
             native_max_auto_continues: Maximum number of automatic continuations when 
                                       finish_reason="tool_calls" (0 disables auto-continue)
             max_xml_tool_calls: Maximum number of XML tool calls to allow (0 = no limit)
+            cancellation_token: Optional token that stops the run; in-flight tools are
+                                cancelled and the LLM stream is closed when it fires
             
         Returns:
             An async generator yielding response chunks or error dict
@@ -189,11 +314,15 @@ class ThreadManager:
                 if max_xml_tool_calls > 0:
                     processor_config.max_xml_tool_calls = max_xml_tool_calls
                 
-                # 1. Get messages from thread for LLM call
-                messages = await self.get_messages(thread_id)
+                # 1. Get messages from thread for LLM call (a barrier: queued messages
+                #    of the previous turn are persisted first)
+                messages, token_counts = await self.get_messages_with_token_counts(thread_id)
                 
                 # 2. Prepare messages for LLM call + add temporary message if it exists
                 prepared_messages = [system_prompt]
+                # Stored token counts, in step with prepared_messages; the system
+                # prompt and temporary message have none
+                prepared_token_counts = [None]
                 
                 # Find the last user message index
                 last_user_index = -1
@@ -206,12 +335,17 @@ class ThreadManager:
                     prepared_messages.extend(messages[:last_user_index])
                     prepared_messages.append(temp_msg)
                     prepared_messages.extend(messages[last_user_index:])
+                    prepared_token_counts.extend(token_counts[:last_user_index])
+                    prepared_token_counts.append(None)
+                    prepared_token_counts.extend(token_counts[last_user_index:])
                     logger.debug("Added temporary message before the last user message")
                 else:
                     # If no user message or no temporary message, just add all messages
                     prepared_messages.extend(messages)
+                    prepared_token_counts.extend(token_counts)
                     if temp_msg:
                         prepared_messages.append(temp_msg)
+                        prepared_token_counts.append(None)
                         logger.debug("Added temporary message to the end of prepared messages")
 
                 # 3. Create or use processor config - this is now redundant since we handle it above
@@ -226,6 +360,14 @@ class ThreadManager:
                     openapi_tool_schemas = self.tool_registry.get_openapi_schemas()
                     logger.debug(f"Retrieved {len(openapi_tool_schemas) if openapi_tool_schemas else 0} OpenAPI tool schemas")
 
+                # Measure the prompt; messages were counted when added, so only
+                # those without a stored count are counted now
+                prompt_tokens = self.token_counter.count_prompt(prepared_messages, openapi_tool_schemas, prepared_token_counts)
+                self.token_usage['llm_calls'] += 1
+                self.token_usage['prompt_tokens'] += prompt_tokens
+                self.token_usage['last_prompt_tokens'] = prompt_tokens
+                logger.info(f"Prompt for thread {thread_id}: {len(prepared_messages)} messages, ~{prompt_tokens} tokens")
+
                 # 5. Make LLM API call
                 logger.info("Making LLM API call")
                 try:
@@ -250,7 +392,8 @@ class ThreadManager:
                     response_generator = self.response_processor.process_streaming_response(
                         llm_response=llm_response,
                         thread_id=thread_id,
-                        config=processor_config
+                        config=processor_config,
+                        cancellation_token=cancellation_token
                     )
                     
                     return response_generator
@@ -260,7 +403,8 @@ class ThreadManager:
                         response = await self.response_processor.process_non_streaming_response(
                             llm_response=llm_response,
                             thread_id=thread_id,
-                            config=processor_config
+                            config=processor_config,
+                            cancellation_token=cancellation_token
                         )
                         return response
                     except Exception as e:
@@ -274,6 +418,21 @@ class ThreadManager:
                     "message": str(e)
                 }
         
+        # Don't end the run with messages still queued, however it ends
+        async def finish_run():
+            try:
+                await self.flush_messages(thread_id)
+            except Exception as e:
+                logger.error(f"Failed to persist messages of thread {thread_id}: {str(e)}")
+            logger.info(f"Token usage for thread {thread_id}: {self.token_usage}")
+        
+        async def finish_run_after(response_gen):
+            try:
+                async for chunk in response_gen:
+                    yield chunk
+            finally:
+                await finish_run()
+        
         # Define a wrapper generator that handles auto-continue logic
         async def auto_continue_wrapper():
             nonlocal auto_continue, auto_continue_count
@@ -282,6 +441,11 @@ class ThreadManager:
                 # Reset auto_continue for this iteration
                 auto_continue = False
                 
+                # Don't start another LLM call for a run that has been stopped
+                if cancellation_token is not None and cancellation_token.cancelled:
+                    logger.info(f"Run cancelled ({cancellation_token.reason}), not continuing thread {thread_id}")
+                    break
+                
                 # Run the thread once
                 response_gen = await _run_once(temporary_message if auto_continue_count == 0 else None)
                 
@@ -326,7 +490,11 @@ class ThreadManager:
         # If auto-continue is disabled (max=0), just run once
         if native_max_auto_continues == 0:
             logger.info("Auto-continue is disabled (native_max_auto_continues=0)")
-            return await _run_once(temporary_message)
+            response = await _run_once(temporary_message)
+            if inspect.isasyncgen(response):
+                return finish_run_after(response)
+            await finish_run()
+            return response
         
         # Otherwise return the auto-continue wrapper generator
-        return auto_continue_wrapper()
+        return finish_run_after(auto_continue_wrapper())
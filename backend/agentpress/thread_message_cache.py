@@ -0,0 +1,336 @@
+"""
+Two-tier cache of the LLM-formatted messages of threads.
+
+Every auto-continue iteration of a run reads the thread's whole history, and the
+get_llm_formatted_messages RPC re-reads and re-aggregates it each time. Threads
+are cached in an in-process LRU (L1) of parsed messages in front of Redis (L2),
+which other instances share and which holds them serialized. Messages added
+through ThreadManager are appended to both tiers, so in steady state reading a
+thread costs one Redis round trip to check its version, no database query and
+no deserialization. Readers get shallow copies of the cached messages: they may
+replace a message's fields, but must not modify nested values in place. Each
+message is cached with the token count stored with it (None if it has none), so
+prompts can be measured without counting the history again.
+
+Every write to a thread's cache, including invalidation, sets a new random
+version. L1 entries are only used while their version matches the one in Redis,
+and writes are conditional on the version the writer last saw, so a reader that
+loaded the history from the database while a message was being added can't
+cache the stale history. Messages inserted without ThreadManager (e.g. by the
+frontend) aren't seen by the cache: whoever inserts them must invalidate the
+thread.
+
+Without Redis the cache is L1-only, which is only correct with a single instance.
+"""
+
+import os
+import json
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils.logger import logger
+
+DEFAULT_MAX_THREADS = 256
+DEFAULT_REDIS_TTL = 3600
+
+# Prefix of versions marking an invalidated thread, whose messages aren't cached
+INVALID_VERSION_PREFIX = "invalid:"
+
+# Set the version and append a message, if the version is still the expected one
+_APPEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('RPUSH', KEYS[2], ARGV[3])
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return 1
+"""
+
+# Replace the messages and set the version, if the version is still the expected
+# one ('' for none)
+_WRITE_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+for i = 4, #ARGV, 1000 do
+    redis.call('RPUSH', KEYS[2], unpack(ARGV, i, math.min(i + 999, #ARGV)))
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return 1
+"""
+
+
+class RedisMessageStore:
+    """Thread message lists and their versions in Redis (the L2 tier)."""
+
+    def __init__(self, ttl: int = DEFAULT_REDIS_TTL):
+        """Initialize the store.
+
+        Args:
+            ttl: Seconds a thread's cached messages are kept after their last write
+        """
+        self.ttl = ttl
+
+    @staticmethod
+    def _keys(thread_id: str) -> Tuple[str, str]:
+        # v2: list items are [message, token_count] pairs
+        return f"thread_messages:v2:{thread_id}:version", f"thread_messages:v2:{thread_id}"
+
+    async def get_version(self, thread_id: str) -> Optional[str]:
+        """Get the current version of a thread's cached messages, if any."""
+        from services import redis
+        version_key, _ = self._keys(thread_id)
+        return await redis.get(version_key)
+
+    async def read(self, thread_id: str) -> Tuple[Optional[str], List[str]]:
+        """Get the version and serialized messages of a thread, atomically.
+
+        Returns:
+            (version, messages); the version is None if the thread isn't cached
+        """
+        from services import redis
+        version_key, list_key = self._keys(thread_id)
+        client = await redis.get_client()
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.get(version_key)
+            pipe.lrange(list_key, 0, -1)
+            version, messages = await pipe.execute()
+        return version, messages
+
+    async def write(self, thread_id: str, expected: Optional[str], version: str, messages: List[str]) -> bool:
+        """Replace a thread's messages if its version is still the expected one."""
+        from services import redis
+        client = await redis.get_client()
+        return bool(await client.eval(
+            _WRITE_SCRIPT, 2, *self._keys(thread_id), expected or "", version, self.ttl, *messages
+        ))
+
+    async def append(self, thread_id: str, expected: str, version: str, message: str) -> bool:
+        """Append a message if the thread's version is still the expected one."""
+        from services import redis
+        client = await redis.get_client()
+        return bool(await client.eval(
+            _APPEND_SCRIPT, 2, *self._keys(thread_id), expected, version, message, self.ttl
+        ))
+
+    async def invalidate(self, thread_id: str, version: str):
+        """Drop a thread's messages, marking it with an invalid version."""
+        from services import redis
+        version_key, list_key = self._keys(thread_id)
+        client = await redis.get_client()
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.delete(list_key)
+            pipe.set(version_key, version, ex=self.ttl)
+            await pipe.execute()
+
+
+class ThreadMessageCache:
+    """LRU of thread messages in front of an optional shared store.
+
+    Attributes:
+        max_threads (int): Maximum number of threads kept in L1
+        store (RedisMessageStore, optional): Shared L2 tier
+        l1_hits (int): Reads answered from L1
+        l2_hits (int): Reads answered from L2
+        misses (int): Reads that had to go to the database
+    """
+
+    def __init__(self, store: Optional[RedisMessageStore] = None, max_threads: int = DEFAULT_MAX_THREADS):
+        """Initialize an empty cache.
+
+        Args:
+            store: Shared L2 tier (None for an L1-only cache)
+            max_threads: Maximum number of threads kept in L1
+        """
+        self.store = store
+        self.max_threads = max_threads
+        # Version, parsed messages and their token counts by thread; messages
+        # are None for an invalidated thread, whose version is kept so stale
+        # loads aren't cached
+        self._entries: "OrderedDict[str, Tuple[str, Optional[List[Any]], Optional[List[Optional[int]]]]]" = OrderedDict()
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _is_valid(version: Optional[str]) -> bool:
+        return version is not None and not version.startswith(INVALID_VERSION_PREFIX)
+
+    @staticmethod
+    def _copy(messages: List[Any]) -> List[Any]:
+        return [dict(message) if isinstance(message, dict) else message for message in messages]
+
+    @staticmethod
+    def _token_counts(messages: List[Any], token_counts: Optional[List[Optional[int]]]) -> List[Optional[int]]:
+        if token_counts is None or len(token_counts) != len(messages):
+            return [None] * len(messages)
+        return list(token_counts)
+
+    def _remember(
+        self,
+        thread_id: str,
+        version: str,
+        messages: Optional[List[Any]],
+        token_counts: Optional[List[Optional[int]]] = None
+    ):
+        self._entries[thread_id] = (version, messages, token_counts)
+        self._entries.move_to_end(thread_id)
+        while len(self._entries) > self.max_threads:
+            self._entries.popitem(last=False)
+
+    async def get(self, thread_id: str) -> Tuple[Optional[List[Dict[str, Any]]], Optional[List[Optional[int]]], Optional[str]]:
+        """Get the cached messages of a thread.
+
+        Args:
+            thread_id: ID of the thread
+
+        Returns:
+            (messages, token_counts, version): the messages and their stored
+            token counts, or None for both on a miss, and the version to pass
+            to put() after loading them from the database
+        """
+        entry = self._entries.get(thread_id)
+        if self.store is None:
+            if entry is None or entry[1] is None:
+                self.misses += 1
+                return None, None, entry[0] if entry else None
+            self._entries.move_to_end(thread_id)
+            self.l1_hits += 1
+            return self._copy(entry[1]), list(entry[2]), entry[0]
+
+        try:
+            version = await self.store.get_version(thread_id)
+            if entry is not None and entry[1] is not None and entry[0] == version:
+                self._entries.move_to_end(thread_id)
+                self.l1_hits += 1
+                return self._copy(entry[1]), list(entry[2]), version
+
+            version, items = await self.store.read(thread_id)
+        except Exception as e:
+            logger.warning(f"Thread message cache unavailable for thread {thread_id}: {str(e)}")
+            self._entries.pop(thread_id, None)
+            self.misses += 1
+            return None, None, None
+
+        if not self._is_valid(version):
+            self._entries.pop(thread_id, None)
+            self.misses += 1
+            return None, None, version
+        messages, token_counts = [], []
+        for item in items:
+            message, token_count = json.loads(item)
+            messages.append(message)
+            token_counts.append(token_count)
+        self._remember(thread_id, version, messages, token_counts)
+        self.l2_hits += 1
+        return self._copy(messages), list(token_counts), version
+
+    async def put(
+        self,
+        thread_id: str,
+        messages: List[Dict[str, Any]],
+        expected: Optional[str] = None,
+        token_counts: Optional[List[Optional[int]]] = None
+    ):
+        """Cache the messages of a thread loaded from the database.
+
+        Args:
+            thread_id: ID of the thread
+            messages: The thread's LLM-formatted messages
+            expected: Version returned by the get() that missed; the messages are
+                only shared if no one wrote to the thread since
+            token_counts: Stored token count of each message, None where a
+                message has none
+        """
+        token_counts = self._token_counts(messages, token_counts)
+        version = uuid.uuid4().hex
+        if self.store is None:
+            entry = self._entries.get(thread_id)
+            if (entry[0] if entry else None) != expected:
+                logger.debug(f"Thread {thread_id} changed while loading its messages; not caching them")
+                return
+        else:
+            try:
+                serialized = [json.dumps([message, token_count]) for message, token_count in zip(messages, token_counts)]
+                if not await self.store.write(thread_id, expected, version, serialized):
+                    logger.debug(f"Thread {thread_id} changed while loading its messages; not caching them")
+                    self._entries.pop(thread_id, None)
+                    return
+            except Exception as e:
+                logger.warning(f"Failed to cache messages of thread {thread_id}: {str(e)}")
+                self._entries.pop(thread_id, None)
+                return
+        self._remember(thread_id, version, self._copy(messages), token_counts)
+
+    async def append(self, thread_id: str, message: Dict[str, Any], token_count: Optional[int] = None):
+        """Append a message just added to a thread.
+
+        If this cache doesn't hold the thread's current history, the thread is
+        invalidated instead, so no tier is left with a partial history.
+
+        Args:
+            thread_id: ID of the thread
+            message: The LLM-formatted message
+            token_count: The message's token count, if it was counted
+        """
+        entry = self._entries.get(thread_id)
+        if entry is None or entry[1] is None:
+            await self.invalidate(thread_id)
+            return
+
+        expected, messages, token_counts = entry
+        version = uuid.uuid4().hex
+        if self.store is not None:
+            try:
+                appended = await self.store.append(thread_id, expected, version, json.dumps([message, token_count]))
+            except Exception as e:
+                logger.warning(f"Failed to append to cached messages of thread {thread_id}: {str(e)}")
+                appended = False
+            if not appended:
+                await self.invalidate(thread_id)
+                return
+        # L1 lists are never handed out, so they can be extended in place
+        messages.extend(self._copy([message]))
+        token_counts.append(token_count)
+        self._remember(thread_id, version, messages, token_counts)
+
+    async def invalidate(self, thread_id: str):
+        """Drop a thread from both tiers, e.g. after messages were added elsewhere."""
+        version = INVALID_VERSION_PREFIX + uuid.uuid4().hex
+        if self.store is None:
+            self._remember(thread_id, version, None)
+            return
+        self._entries.pop(thread_id, None)
+        try:
+            await self.store.invalidate(thread_id, version)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate cached messages of thread {thread_id}: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        """Get cache counters.
+
+        Returns:
+            Dict with threads, l1_hits, l2_hits and misses
+        """
+        return {"threads": len(self._entries), "l1_hits": self.l1_hits, "l2_hits": self.l2_hits, "misses": self.misses}
+
+
+_message_cache: Optional[ThreadMessageCache] = None
+
+
+def get_thread_message_cache() -> ThreadMessageCache:
+    """Get the process-wide thread message cache, creating it on first use.
+
+    Redis is used as the shared tier when REDIS_HOST is configured.
+    """
+    global _message_cache
+    if _message_cache is None:
+        store = RedisMessageStore() if os.getenv("REDIS_HOST") else None
+        max_threads = int(os.getenv("THREAD_MESSAGE_CACHE_SIZE", DEFAULT_MAX_THREADS))
+        _message_cache = ThreadMessageCache(store, max_threads)
+        logger.info(f"Initialized thread message cache ({'L1 and Redis' if store else 'L1 only'}, {max_threads} threads)")
+    return _message_cache
@@ -0,0 +1,191 @@
+"""
+Token accounting for thread messages.
+
+Messages are counted once, when they are added, and their counts are stored in
+their metadata and read back with the thread's history, so measuring a prompt
+before an LLM call adds up stored counts instead of tokenizing the whole history
+again. Messages without a stored count (the system prompt, temporary messages,
+messages added before counts were stored) are counted here, cached by a hash of
+their content. The tokenizer
+is pluggable; by default it is tiktoken's cl100k_base encoding, or an estimate
+from the text length where tiktoken isn't available. Counts are meant for
+budgeting prompts, not billing: they follow OpenAI's chat format, which other
+providers' tokenizers only approximate.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from utils.logger import logger
+
+DEFAULT_ENCODING = "cl100k_base"
+DEFAULT_MAX_ENTRIES = 8192
+
+# Tokens the chat format adds around each message, and to prime the reply
+MESSAGE_OVERHEAD_TOKENS = 3
+REPLY_OVERHEAD_TOKENS = 3
+
+# Rough cost of an image part; its data isn't text the tokenizer can count
+IMAGE_TOKENS = 765
+
+Tokenizer = Callable[[str], int]
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the tokens of a text from its length (about 4 characters each)."""
+    return (len(text) + 3) // 4
+
+
+def load_tokenizer(encoding: str = DEFAULT_ENCODING) -> Tokenizer:
+    """Get a tiktoken tokenizer, or the length estimate if it can't be loaded.
+
+    Args:
+        encoding: Name of the tiktoken encoding
+    """
+    try:
+        import tiktoken
+        tokenizer = tiktoken.get_encoding(encoding)
+    except Exception as e:
+        logger.warning(f"Tokenizer {encoding} unavailable, estimating token counts: {str(e)}")
+        return estimate_tokens
+    return lambda text: len(tokenizer.encode(text, disallowed_special=()))
+
+
+def _message_text(message: Dict[str, Any]) -> Tuple[str, int]:
+    """Get the text of a message the tokenizer counts, and the tokens of its images."""
+    parts = [str(message.get("role") or ""), str(message.get("name") or "")]
+    image_tokens = 0
+
+    content = message.get("content")
+    if isinstance(content, str):
+        parts.append(content)
+    elif isinstance(content, list):
+        for part in content:
+            if isinstance(part, dict) and part.get("type") == "image_url":
+                image_tokens += IMAGE_TOKENS
+            elif isinstance(part, dict) and isinstance(part.get("text"), str):
+                parts.append(part["text"])
+            else:
+                parts.append(json.dumps(part))
+    elif content is not None:
+        parts.append(json.dumps(content))
+
+    for tool_call in message.get("tool_calls") or []:
+        function = tool_call.get("function", {}) if isinstance(tool_call, dict) else {}
+        arguments = function.get("arguments", "")
+        parts.append(str(function.get("name") or ""))
+        parts.append(arguments if isinstance(arguments, str) else json.dumps(arguments))
+    return "\n".join(part for part in parts if part), image_tokens
+
+
+class TokenCounter:
+    """Counts tokens of messages and tool schemas, caching counts by content hash.
+
+    Attributes:
+        tokenizer (Callable): Function returning the tokens of a text
+        max_entries (int): Maximum number of cached counts
+        hits (int): Counts answered from the cache
+        misses (int): Counts that needed the tokenizer
+    """
+
+    def __init__(self, tokenizer: Optional[Tokenizer] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """Initialize the counter.
+
+        Args:
+            tokenizer: Function returning the tokens of a text. Defaults to tiktoken's cl100k_base.
+            max_entries: Maximum number of cached counts
+        """
+        self.tokenizer = tokenizer or load_tokenizer()
+        self.max_entries = max_entries
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def content_hash(value: Any) -> str:
+        """Hash of a JSON value, independent of key order."""
+        serialized = json.dumps(value, sort_keys=True, separators=(",", ":"))
+        return hashlib.blake2b(serialized.encode(), digest_size=16).hexdigest()
+
+    def _cached(self, key: str, count: Callable[[], int]) -> int:
+        with self._lock:
+            tokens = self._counts.get(key)
+            if tokens is not None:
+                self._counts.move_to_end(key)
+                self.hits += 1
+                return tokens
+            self.misses += 1
+        tokens = count()
+        with self._lock:
+            self._counts[key] = tokens
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return tokens
+
+    def _count_message(self, message: Dict[str, Any]) -> int:
+        text, image_tokens = _message_text(message)
+        return MESSAGE_OVERHEAD_TOKENS + self.tokenizer(text) + image_tokens
+
+    def count_message(self, message: Dict[str, Any]) -> int:
+        """Count the tokens of an LLM-formatted message."""
+        return self._cached(self.content_hash(message), lambda: self._count_message(message))
+
+    def count_tools(self, tool_schemas: Optional[List[Dict[str, Any]]]) -> int:
+        """Count the tokens of the tool schemas sent with a request."""
+        if not tool_schemas:
+            return 0
+        return self._cached(self.content_hash(tool_schemas), lambda: self.tokenizer(json.dumps(tool_schemas)))
+
+    def count_prompt(
+        self,
+        messages: List[Dict[str, Any]],
+        tool_schemas: Optional[List[Dict[str, Any]]] = None,
+        token_counts: Optional[List[Optional[int]]] = None
+    ) -> int:
+        """Count the tokens of a request's messages and tool schemas.
+
+        Args:
+            messages: The request's messages
+            tool_schemas: The tool schemas sent with the request
+            token_counts: Stored token count of each message, None where a message
+                has none; only messages without one are counted
+        """
+        if token_counts is None or len(token_counts) != len(messages):
+            token_counts = [None] * len(messages)
+        message_tokens = sum(
+            token_count if token_count is not None else self.count_message(message)
+            for message, token_count in zip(messages, token_counts)
+        )
+        return message_tokens + self.count_tools(tool_schemas) + REPLY_OVERHEAD_TOKENS
+
+    def stats(self) -> Dict[str, int]:
+        """Get cache counters.
+
+        Returns:
+            Dict with entries, hits and misses
+        """
+        with self._lock:
+            return {"entries": len(self._counts), "hits": self.hits, "misses": self.misses}
+
+
+_token_counter: Optional[TokenCounter] = None
+_token_counter_lock = threading.Lock()
+
+
+def get_token_counter() -> TokenCounter:
+    """Get the process-wide token counter, creating it on first use.
+
+    TOKENIZER_ENCODING selects the tiktoken encoding.
+    """
+    global _token_counter
+    with _token_counter_lock:
+        if _token_counter is None:
+            encoding = os.getenv("TOKENIZER_ENCODING", DEFAULT_ENCODING)
+            _token_counter = TokenCounter(load_tokenizer(encoding))
+            logger.info(f"Initialized token counter ({encoding})")
+        return _token_counter
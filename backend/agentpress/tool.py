@@ -7,11 +7,12 @@ This module defines the base classes and decorators for creating tools in AgentP
 - Result containers for standardized tool outputs
 """
 
-from typing import Dict, Any, Union, Optional, List, Type
+from typing import Dict, Any, Union, Optional, List, Type, Tuple, Callable
 from dataclasses import dataclass, field
 from abc import ABC
 import json
 import inspect
+import string
 from enum import Enum
 from utils.logger import logger
 
@@ -82,6 +83,71 @@ class ToolSchema:
     schema: Dict[str, Any]
     xml_schema: Optional[XMLTagSchema] = None
 
+@dataclass
+class ToolResources:
+    """Resource keys a tool method reads and writes, used to schedule concurrent calls.
+    
+    Keys are templates formatted with the call's arguments, e.g. "file:{file_path}".
+    A list argument expands to one key per item, and a key ending in "*" covers
+    every key with that prefix (e.g. "file:*" for any file).
+    
+    Attributes:
+        reads (Tuple[str, ...]): Key templates of resources the call only reads
+        writes (Tuple[str, ...]): Key templates of resources the call modifies
+    """
+    reads: Tuple[str, ...] = ()
+    writes: Tuple[str, ...] = ()
+    
+    def resolve(
+        self,
+        arguments: Dict[str, Any],
+        normalize: Optional[Callable[[str], str]] = None
+    ) -> Optional[Tuple[frozenset, frozenset]]:
+        """Format the key templates with call arguments.
+        
+        Args:
+            arguments: Arguments of the tool call
+            normalize: Optional function applied to each argument value (e.g. path cleaning)
+            
+        Returns:
+            (read keys, write keys), or None if a referenced argument is missing
+        """
+        reads = self._expand(self.reads, arguments, normalize)
+        writes = self._expand(self.writes, arguments, normalize)
+        if reads is None or writes is None:
+            return None
+        return frozenset(reads), frozenset(writes)
+    
+    @staticmethod
+    def _expand(templates, arguments, normalize) -> Optional[List[str]]:
+        keys = []
+        for template in templates:
+            partial_keys = [""]
+            for literal, field_name, _, _ in string.Formatter().parse(template):
+                if field_name is None:
+                    partial_keys = [key + literal for key in partial_keys]
+                    continue
+                if field_name not in arguments or arguments[field_name] is None:
+                    return None
+                value = arguments[field_name]
+                values = value if isinstance(value, (list, tuple)) else [value]
+                values = [normalize(str(v)) if normalize else str(v) for v in values]
+                partial_keys = [key + literal + v for key in partial_keys for v in values]
+            keys.extend(partial_keys)
+        return keys
+
+@dataclass
+class ToolCacheOptions:
+    """Result caching options for an idempotent tool method.
+    
+    Attributes:
+        ttl (float): Seconds a cached result stays valid
+        key (Tuple[str, ...], optional): Argument names that identify a call
+            (None means all arguments)
+    """
+    ttl: float = 60.0
+    key: Optional[Tuple[str, ...]] = None
+
 @dataclass
 class ToolResult:
     """Container for tool execution results.
@@ -89,9 +155,12 @@ class ToolResult:
     Attributes:
         success (bool): Whether the tool execution succeeded
         output (str): Output message or error description
+        data (Any, optional): Structured data the output was serialized from, kept so
+            results can be re-encoded (e.g. compactly) for the LLM
     """
     success: bool
     output: str
+    data: Any = field(default=None, repr=False)
 
 class Tool(ABC):
     """Abstract base class for all tools.
@@ -99,36 +168,70 @@ class Tool(ABC):
     Provides the foundation for implementing tools with schema registration
     and result handling capabilities.
     
+    Tool methods are coroutines returning a ToolResult, or async generators that
+    yield progress chunks (str or dict) while they run and a ToolResult last;
+    progress is streamed to the client as tool_progress events.
+    
     Attributes:
-        _schemas (Dict[str, List[ToolSchema]]): Registered schemas for tool methods
+        _schemas (Dict[str, List[ToolSchema]]): Registered schemas for tool methods,
+            discovered once per class when the subclass is defined
+        cache_scope (str, optional): Scope shared by tools acting on the same state
+            (e.g. a sandbox); mutating calls invalidate cached results in their scope
+        blocking (bool): Whether the tool's methods make blocking calls (e.g. synchronous
+            SDKs) and must run in the tool thread pool; @blocking_io overrides it per method
         
     Methods:
         get_schemas: Get all registered tool schemas
+        get_class_schemas: Get the schemas of a tool class without instantiating it
         success_response: Create a successful result
         fail_response: Create a failed result
     """
     
+    cache_scope: Optional[str] = None
+    blocking: bool = False
+    _class_schemas: Dict[str, List[ToolSchema]] = {}
+    
+    def __init_subclass__(cls, **kwargs):
+        """Discover the schemas of a tool class once, when it is defined."""
+        super().__init_subclass__(**kwargs)
+        cls._class_schemas = {}
+        for name, function in inspect.getmembers(cls, predicate=inspect.isfunction):
+            if hasattr(function, 'tool_schemas'):
+                cls._class_schemas[name] = function.tool_schemas
+                logger.debug(f"Registered schemas for method '{name}' in {cls.__name__}")
+    
     def __init__(self):
-        """Initialize tool with empty schema registry."""
-        self._schemas: Dict[str, List[ToolSchema]] = {}
+        """Initialize tool with its class's schema registry."""
+        self._schemas: Dict[str, List[ToolSchema]] = self._class_schemas
         logger.debug(f"Initializing tool class: {self.__class__.__name__}")
-        self._register_schemas()
 
-    def _register_schemas(self):
-        """Register schemas from all decorated methods."""
-        for name, method in inspect.getmembers(self, predicate=inspect.ismethod):
-            if hasattr(method, 'tool_schemas'):
-                self._schemas[name] = method.tool_schemas
-                logger.debug(f"Registered schemas for method '{name}' in {self.__class__.__name__}")
+    @classmethod
+    def get_class_schemas(cls) -> Dict[str, List[ToolSchema]]:
+        """Get the schemas of a tool class without instantiating it.
+        
+        Returns:
+            Dict mapping method names to their schema definitions (shared; do not modify)
+        """
+        return cls._class_schemas
 
     def get_schemas(self) -> Dict[str, List[ToolSchema]]:
         """Get all registered tool schemas.
         
         Returns:
-            Dict mapping method names to their schema definitions
+            Dict mapping method names to their schema definitions (shared; do not modify)
         """
         return self._schemas
 
+    @classmethod
+    def normalize_resource_value(cls, value: str) -> str:
+        """Normalize an argument value used in a resource key.
+        
+        Override to map equivalent spellings (e.g. relative and absolute paths)
+        to the same key, so conflicting calls are recognized as such. This is a
+        classmethod: calls are scheduled before their tool is created.
+        """
+        return value
+
     def success_response(self, data: Union[Dict[str, Any], str]) -> ToolResult:
         """Create a successful tool result.
         
@@ -138,12 +241,10 @@ class Tool(ABC):
         Returns:
             ToolResult with success=True and formatted output
         """
-        if isinstance(data, str):
-            text = data
-        else:
-            text = json.dumps(data, indent=2)
         logger.debug(f"Created success response for {self.__class__.__name__}")
-        return ToolResult(success=True, output=text)
+        if isinstance(data, str):
+            return ToolResult(success=True, output=data)
+        return ToolResult(success=True, output=json.dumps(data, indent=2), data=data)
 
     def fail_response(self, msg: str) -> ToolResult:
         """Create a failed tool result.
@@ -165,10 +266,51 @@ def _add_schema(func, schema: ToolSchema):
     logger.debug(f"Added {schema.schema_type.value} schema to function {func.__name__}")
     return func
 
-def openapi_schema(schema: Dict[str, Any]):
-    """Decorator for OpenAPI schema tools."""
+TOOL_EXECUTORS = ("thread", "process")
+
+def _add_execution_options(
+    func,
+    reads: Optional[List[str]],
+    writes: Optional[List[str]],
+    max_concurrency: Optional[int],
+    executor: Optional[str] = None
+):
+    """Helper to attach declared resource keys, concurrency limit and executor to a function."""
+    if max_concurrency is not None:
+        func.tool_max_concurrency = max_concurrency
+    if executor is not None:
+        if executor not in TOOL_EXECUTORS:
+            raise ValueError(f"executor must be one of {TOOL_EXECUTORS}, got {executor!r}")
+        func.tool_executor = executor
+    if reads is None and writes is None:
+        return func
+    existing = getattr(func, 'tool_resources', None) or ToolResources()
+    func.tool_resources = ToolResources(
+        reads=tuple(dict.fromkeys(existing.reads + tuple(reads or ()))),
+        writes=tuple(dict.fromkeys(existing.writes + tuple(writes or ())))
+    )
+    return func
+
+def openapi_schema(
+    schema: Dict[str, Any],
+    reads: List[str] = None,
+    writes: List[str] = None,
+    max_concurrency: int = None,
+    executor: str = None
+):
+    """Decorator for OpenAPI schema tools.
+    
+    Args:
+        schema: OpenAPI function schema
+        reads: Optional resource key templates the function reads (see ToolResources)
+        writes: Optional resource key templates the function modifies
+        max_concurrency: Optional maximum number of concurrent calls of the function
+        executor: Optional executor running the function off the event loop: "thread"
+            for blocking I/O, or "process" for CPU-bound work (see ToolProcessPool)
+    """
     def decorator(func):
         logger.debug(f"Applying OpenAPI schema to function {func.__name__}")
+        _add_execution_options(func, reads, writes, max_concurrency, executor)
         return _add_schema(func, ToolSchema(
             schema_type=SchemaType.OPENAPI,
             schema=schema
@@ -178,7 +320,11 @@ def openapi_schema(schema: Dict[str, Any]):
 def xml_schema(
     tag_name: str,
     mappings: List[Dict[str, Any]] = None,
-    example: str = None
+    example: str = None,
+    reads: List[str] = None,
+    writes: List[str] = None,
+    max_concurrency: int = None,
+    executor: str = None
 ):
     """
     Decorator for XML schema tools with improved node mapping.
@@ -191,6 +337,11 @@ def xml_schema(
             - path: Path to the node (default "." for root)
             - required: Whether the parameter is required (default True)
         example: Optional example showing how to use the XML tag
+        reads: Optional resource key templates the function reads (see ToolResources)
+        writes: Optional resource key templates the function modifies
+        max_concurrency: Optional maximum number of concurrent calls of the function
+        executor: Optional executor running the function off the event loop: "thread"
+            for blocking I/O, or "process" for CPU-bound work (see ToolProcessPool)
     
     Example:
         @xml_schema(
@@ -210,6 +361,7 @@ def xml_schema(
     """
     def decorator(func):
         logger.debug(f"Applying XML schema with tag '{tag_name}' to function {func.__name__}")
+        _add_execution_options(func, reads, writes, max_concurrency, executor)
         xml_schema = XMLTagSchema(tag_name=tag_name, example=example)
         
         # Add mappings
@@ -238,3 +390,52 @@ def custom_schema(schema: Dict[str, Any]):
             schema=schema
         ))
     return decorator
+
+def cacheable(ttl: float = 60.0, key: List[str] = None):
+    """Decorator marking a tool method as idempotent so its results can be cached.
+    
+    Successful results are cached per cache scope, function name and arguments
+    until the TTL expires or a mutating tool runs in the same scope. The cache is
+    shared by all runs, so only tools with a cache_scope (e.g. their sandbox) are
+    cached.
+    
+    Args:
+        ttl: Seconds a cached result stays valid
+        key: Optional argument names that identify a call (default: all arguments)
+    """
+    def decorator(func):
+        logger.debug(f"Marking function {func.__name__} as cacheable (ttl={ttl}s)")
+        func.tool_cache_options = ToolCacheOptions(ttl=ttl, key=tuple(key) if key is not None else None)
+        return func
+    return decorator
+
+def offload_output(enabled: bool = True):
+    """Decorator marking whether oversized outputs of a tool method are stored out of band.
+    
+    Outputs above ProcessorConfig.tool_output_max_chars are replaced in the thread
+    by a preview (see ToolOutputStore). Disable it for methods whose output must
+    reach the LLM in full, such as reading back a stored output.
+    
+    Args:
+        enabled: Whether oversized outputs are offloaded
+    """
+    def decorator(func):
+        logger.debug(f"Marking function {func.__name__} as {'offloading' if enabled else 'not offloading'} oversized outputs")
+        func.tool_offload_output = enabled
+        return func
+    return decorator
+
+def blocking_io(enabled: bool = True):
+    """Decorator marking whether a tool method makes blocking calls.
+    
+    Blocking methods are run in the tool thread pool so they don't stall the
+    event loop. Overrides the tool class's `blocking` attribute for this method.
+    
+    Args:
+        enabled: Whether the method blocks
+    """
+    def decorator(func):
+        logger.debug(f"Marking function {func.__name__} as {'blocking' if enabled else 'non-blocking'}")
+        func.tool_blocking = enabled
+        return func
+    return decorator
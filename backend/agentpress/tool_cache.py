@@ -0,0 +1,157 @@
+"""
+Memoization of results of idempotent tool calls.
+
+Tool methods marked with @cacheable have their successful results kept in a
+bounded LRU cache keyed on cache scope, function name and normalized arguments.
+Entries expire after the method's TTL, and a mutating tool call in the same
+scope (e.g. the same sandbox) invalidates every entry of that scope.
+
+Invalidating a scope also advances its generation. Callers capture the
+generation when a lookup misses and pass it to put(), which drops the result if
+the scope was invalidated in the meantime: a read that started before a write
+may finish after it, and its result must not be cached as current.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from agentpress.tool import ToolResult, ToolCacheOptions
+from utils.logger import logger
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_SCOPES = 1024
+
+
+class ToolResultCache:
+    """Bounded LRU cache of tool results with per-entry TTL.
+
+    Attributes:
+        max_entries (int): Maximum number of cached results
+        hits (int): Lookups answered from the cache
+        misses (int): Lookups that found no valid entry
+        evictions (int): Entries dropped to stay within max_entries
+        invalidations (int): Entries dropped by mutating calls
+        stale_puts (int): Results dropped because their scope was invalidated while they were computed
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_scopes: int = DEFAULT_MAX_SCOPES):
+        """Initialize an empty cache.
+
+        Args:
+            max_entries: Maximum number of cached results
+            max_scopes: Maximum number of scopes whose generation is tracked
+        """
+        self.max_entries = max_entries
+        self.max_scopes = max_scopes
+        self._entries: "OrderedDict[Tuple[Optional[str], str, str], Tuple[float, ToolResult]]" = OrderedDict()
+        # Generation of each recently invalidated scope. Generations are unique
+        # across scopes; untracked scopes are at the newest generation forgotten,
+        # so forgetting a scope never makes a stale generation current again
+        self._generations: "OrderedDict[Optional[str], int]" = OrderedDict()
+        self._last_generation = 0
+        self._forgotten_generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+
+    @staticmethod
+    def _make_key(
+        scope: Optional[str],
+        function_name: str,
+        arguments: Dict[str, Any],
+        options: ToolCacheOptions
+    ) -> Tuple[Optional[str], str, str]:
+        if options.key is not None:
+            arguments = {name: arguments.get(name) for name in options.key}
+        normalized = json.dumps(arguments, sort_keys=True, separators=(",", ":"), default=str)
+        return scope, function_name, normalized
+
+    def generation(self, scope: Optional[str]) -> int:
+        """Get the current generation of a scope, to pass to put() after a miss."""
+        return self._generations.get(scope, self._forgotten_generation)
+
+    def get(
+        self,
+        scope: Optional[str],
+        function_name: str,
+        arguments: Dict[str, Any],
+        options: ToolCacheOptions
+    ) -> Optional[ToolResult]:
+        """Return a cached result for the call, if one is still valid."""
+        key = self._make_key(scope, function_name, arguments, options)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, result = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        scope: Optional[str],
+        function_name: str,
+        arguments: Dict[str, Any],
+        options: ToolCacheOptions,
+        result: ToolResult,
+        generation: Optional[int] = None
+    ):
+        """Cache the result of a call for the method's TTL.
+
+        Args:
+            scope: Cache scope of the tool
+            function_name: Name of the tool function
+            arguments: Arguments of the call
+            options: Cache options of the tool function
+            result: The call's result
+            generation: Generation of the scope when the call's lookup missed; the
+                result is dropped if the scope was invalidated since
+        """
+        if generation is not None and generation != self.generation(scope):
+            self.stale_puts += 1
+            logger.debug(f"Scope {scope} was invalidated while {function_name} ran; not caching its result")
+            return
+        key = self._make_key(scope, function_name, arguments, options)
+        self._entries[key] = (time.monotonic() + options.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, scope: Optional[str]):
+        """Drop every cached result in a scope and advance its generation."""
+        self._last_generation += 1
+        self._generations[scope] = self._last_generation
+        self._generations.move_to_end(scope)
+        while len(self._generations) > self.max_scopes:
+            _, generation = self._generations.popitem(last=False)
+            self._forgotten_generation = max(self._forgotten_generation, generation)
+
+        stale = [key for key in self._entries if key[0] == scope]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            self.invalidations += len(stale)
+            logger.debug(f"Invalidated {len(stale)} cached tool results for scope {scope}")
+
+    def stats(self) -> Dict[str, int]:
+        """Get cache counters.
+
+        Returns:
+            Dict with size, hits, misses, evictions, invalidations and stale_puts
+        """
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "stale_puts": self.stale_puts,
+        }
@@ -0,0 +1,318 @@
+"""
+Off-loop execution of blocking tool implementations.
+
+Many tools are declared `async def` but call synchronous SDKs (HTTP clients,
+sandbox file and process APIs) in their bodies, which blocks the event loop and
+every other run and stream served by it. Tools marked as blocking (see
+Tool.blocking and the @blocking_io decorator) are run in a bounded, process-wide
+thread pool instead: coroutine functions get their own event loop in the worker
+thread, plain functions are called directly.
+
+Streaming tools are async generators that yield progress chunks and finally a
+ToolResult; collect_tool_stream forwards the chunks and returns the result, on
+the event loop or inside a worker thread.
+
+The pool size is read from the TOOL_THREAD_POOL_WORKERS environment variable.
+A call that is abandoned (timeout or cancellation) keeps its worker until the
+blocking call returns, since threads can't be interrupted.
+
+CPU-bound tools (diffing, parsing, compression) hold the GIL and stall the loop
+even from a thread. Methods declared with executor="process" run in a shared
+process pool instead (see ToolProcessPool), sized by TOOL_PROCESS_POOL_WORKERS.
+"""
+
+import os
+import pickle
+import asyncio
+import inspect
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Callable, Optional, AsyncIterator
+
+from agentpress.tool import ToolResult
+from utils.logger import logger
+
+DEFAULT_THREAD_POOL_WORKERS = 16
+DEFAULT_PROCESS_POOL_WORKERS = min(4, os.cpu_count() or 1)
+
+
+async def collect_tool_stream(
+    stream: AsyncIterator[Any],
+    on_progress: Optional[Callable[[Any], None]] = None
+) -> ToolResult:
+    """Consume a streaming tool call.
+    
+    Args:
+        stream: Async generator returned by a streaming tool method
+        on_progress: Optional callback receiving each progress chunk
+        
+    Returns:
+        The last ToolResult the tool yielded
+    """
+    result = None
+    async for item in stream:
+        if isinstance(item, ToolResult):
+            result = item
+        elif on_progress is not None:
+            on_progress(item)
+    if result is None:
+        return ToolResult(success=False, output="Tool finished without a result")
+    return result
+
+
+class ToolThreadPool:
+    """Bounded thread pool running blocking tool calls, with saturation metrics.
+
+    Attributes:
+        max_workers (int): Number of worker threads
+        active (int): Calls currently running in a worker
+        queued (int): Calls waiting for a free worker
+        peak_active (int): Highest number of calls running at once
+        saturated_submissions (int): Calls submitted while every worker was busy
+        completed (int): Calls that finished (successfully or not)
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_THREAD_POOL_WORKERS):
+        """Initialize the pool; threads are started on demand.
+
+        Args:
+            max_workers: Number of worker threads
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool-worker")
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.peak_active = 0
+        self.saturated_submissions = 0
+        self.completed = 0
+
+    def _run(self, tool_fn: Callable, arguments: Dict[str, Any], on_progress: Optional[Callable[[Any], None]]) -> Any:
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+        try:
+            if inspect.isasyncgenfunction(tool_fn):
+                return asyncio.run(collect_tool_stream(tool_fn(**arguments), on_progress))
+            if inspect.iscoroutinefunction(tool_fn):
+                return asyncio.run(tool_fn(**arguments))
+            return tool_fn(**arguments)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    async def run(
+        self,
+        tool_fn: Callable,
+        arguments: Dict[str, Any],
+        on_progress: Optional[Callable[[Any], None]] = None
+    ) -> Any:
+        """Run a tool function in a worker thread and wait for its result.
+
+        Args:
+            tool_fn: Tool function (coroutine, async generator or plain function)
+            arguments: Keyword arguments of the call
+            on_progress: Optional callback receiving progress chunks of a streaming
+                tool; it is called on the caller's event loop
+
+        Returns:
+            The function's return value
+        """
+        with self._lock:
+            if self.active + self.queued >= self.max_workers:
+                self.saturated_submissions += 1
+                logger.warning(
+                    f"Tool thread pool saturated ({self.active} running, {self.queued} queued, "
+                    f"{self.max_workers} workers); {getattr(tool_fn, '__name__', tool_fn)} will wait"
+                )
+            self.queued += 1
+        if on_progress is not None:
+            loop = asyncio.get_running_loop()
+            forward = on_progress
+            on_progress = lambda chunk: loop.call_soon_threadsafe(forward, chunk)
+        future = self._executor.submit(self._run, tool_fn, arguments, on_progress)
+        future.add_done_callback(self._discard_if_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _discard_if_cancelled(self, future):
+        # A call cancelled while still queued never reaches _run
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def stats(self) -> Dict[str, int]:
+        """Get pool counters.
+
+        Returns:
+            Dict with max_workers, active, queued, peak_active,
+            saturated_submissions and completed
+        """
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "active": self.active,
+                "queued": self.queued,
+                "peak_active": self.peak_active,
+                "saturated_submissions": self.saturated_submissions,
+                "completed": self.completed,
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker threads once running calls have finished."""
+        self._executor.shutdown(wait=wait)
+
+
+def _run_in_process(payload: bytes) -> bytes:
+    """Worker entry point: unpickle a call, run it and pickle its result.
+
+    Exceptions and unpicklable results are turned into failed ToolResults here, so
+    the parent only sees an exception when the worker itself dies.
+    """
+    try:
+        tool_fn, arguments = pickle.loads(payload)
+        if inspect.isasyncgenfunction(tool_fn):
+            result = asyncio.run(collect_tool_stream(tool_fn(**arguments)))
+        elif inspect.iscoroutinefunction(tool_fn):
+            result = asyncio.run(tool_fn(**arguments))
+        else:
+            result = tool_fn(**arguments)
+    except Exception as e:
+        result = ToolResult(success=False, output=f"Error executing tool: {str(e)}")
+    try:
+        return pickle.dumps(result)
+    except Exception as e:
+        return pickle.dumps(ToolResult(success=False, output=f"Tool result could not be returned from the worker process: {str(e)}"))
+
+
+class ToolProcessPool:
+    """Shared process pool running CPU-bound tool calls.
+
+    The bound tool method and its arguments are pickled in the caller and the
+    result is pickled in the worker, so tool instances, arguments and results
+    must be picklable; a call that can't be pickled fails without being sent.
+    Progress chunks of streaming tools are not forwarded across processes.
+
+    Workers are started with the "spawn" method, since forking a process that
+    runs an event loop and threads is unsafe. If a worker dies (e.g. killed or
+    out of memory), every call in flight on the pool fails with an error
+    result, and the pool is replaced so later calls run on fresh workers. A call
+    that is abandoned (timeout or cancellation) keeps its worker until it returns.
+
+    Attributes:
+        max_workers (int): Number of worker processes
+        active (int): Calls submitted and not yet finished
+        completed (int): Calls that finished (successfully or not)
+        crashes (int): Times the pool was broken by a dying worker
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_PROCESS_POOL_WORKERS):
+        """Initialize the pool; worker processes are started on demand.
+
+        Args:
+            max_workers: Number of worker processes
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+        self.active = 0
+        self.completed = 0
+        self.crashes = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def run(self, tool_fn: Callable, arguments: Dict[str, Any]) -> ToolResult:
+        """Run a tool function in a worker process and wait for its result.
+
+        Args:
+            tool_fn: Bound tool method (coroutine, async generator or plain function)
+            arguments: Keyword arguments of the call
+
+        Returns:
+            The function's ToolResult, or a failed ToolResult if the call couldn't be
+            pickled or its worker died
+        """
+        name = getattr(tool_fn, '__name__', tool_fn)
+        try:
+            payload = pickle.dumps((tool_fn, arguments))
+        except Exception as e:
+            logger.error(f"Tool call {name} can't be sent to a worker process: {str(e)}")
+            return ToolResult(success=False, output=f"Tool '{name}' can't run in a worker process: {str(e)}")
+
+        with self._lock:
+            executor = self._executor
+            self.active += 1
+        try:
+            future = executor.submit(_run_in_process, payload)
+            return pickle.loads(await asyncio.wrap_future(future))
+        except BrokenProcessPool:
+            self._replace_broken(executor)
+            logger.error(f"Worker process died while running tool {name}")
+            return ToolResult(success=False, output=f"Tool '{name}' failed: its worker process died")
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    def _replace_broken(self, executor: ProcessPoolExecutor):
+        # Calls that were in flight on the broken pool all land here; replace it once
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self.crashes += 1
+            self._executor = self._new_executor()
+        executor.shutdown(wait=False)
+        logger.warning(f"Replaced broken tool process pool ({self.crashes} crashes so far)")
+
+    def stats(self) -> Dict[str, int]:
+        """Get pool counters.
+
+        Returns:
+            Dict with max_workers, active, completed and crashes
+        """
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "active": self.active,
+                "completed": self.completed,
+                "crashes": self.crashes,
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker processes once running calls have finished."""
+        self._executor.shutdown(wait=wait)
+
+
+_thread_pool: Optional[ToolThreadPool] = None
+_thread_pool_lock = threading.Lock()
+_process_pool: Optional[ToolProcessPool] = None
+
+
+def get_tool_thread_pool() -> ToolThreadPool:
+    """Get the process-wide pool for blocking tools, creating it on first use."""
+    global _thread_pool
+    with _thread_pool_lock:
+        if _thread_pool is None:
+            max_workers = int(os.getenv("TOOL_THREAD_POOL_WORKERS", DEFAULT_THREAD_POOL_WORKERS))
+            _thread_pool = ToolThreadPool(max_workers)
+            logger.info(f"Initialized tool thread pool with {max_workers} workers")
+        return _thread_pool
+
+
+def get_tool_process_pool() -> ToolProcessPool:
+    """Get the process-wide pool for CPU-bound tools, creating it on first use."""
+    global _process_pool
+    with _thread_pool_lock:
+        if _process_pool is None:
+            max_workers = int(os.getenv("TOOL_PROCESS_POOL_WORKERS", DEFAULT_PROCESS_POOL_WORKERS))
+            _process_pool = ToolProcessPool(max_workers)
+            logger.info(f"Initialized tool process pool with {max_workers} workers")
+        return _process_pool
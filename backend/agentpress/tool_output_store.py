@@ -0,0 +1,94 @@
+"""
+Out-of-band storage of oversized tool outputs.
+
+Tool outputs such as file searches or workspace listings can be megabytes, and
+everything stored in a thread's messages is resent to the LLM on every turn.
+Outputs above a configured size are stored in the tool_outputs table instead;
+the thread keeps a head/tail preview with a handle that the read_tool_output
+tool uses to page in the rest on demand.
+"""
+
+import uuid
+from typing import Optional, Dict, Any
+
+from services.supabase import DBConnection
+from utils.logger import logger
+
+
+class ToolOutputStore:
+    """Stores full tool outputs and builds the previews kept in the thread."""
+
+    def __init__(self, db: Optional[DBConnection] = None):
+        """Initialize the store.
+
+        Args:
+            db: Database connection (defaults to the shared DBConnection)
+        """
+        self.db = db or DBConnection()
+
+    async def offload(self, thread_id: str, function_name: str, output: str, preview_chars: int) -> str:
+        """Store a full output and return the preview to keep in the thread.
+
+        Args:
+            thread_id: Thread the output belongs to
+            function_name: Tool function that produced the output
+            output: Full output text
+            preview_chars: Number of characters of the preview, split between head and tail
+
+        Returns:
+            Head and tail of the output around a note with the output's handle
+        """
+        output_id = str(uuid.uuid4())
+        client = await self.db.client
+        await client.table('tool_outputs').insert({
+            'output_id': output_id,
+            'thread_id': thread_id,
+            'function_name': function_name,
+            'content': output,
+            'size': len(output),
+        }).execute()
+        logger.info(f"Stored {len(output)} character output of {function_name} as tool output {output_id}")
+
+        head = output[:preview_chars // 2]
+        tail = output[len(output) - (preview_chars - len(head)):]
+        omitted = len(output) - len(head) - len(tail)
+        return (
+            f"{head}\n"
+            f"... [{omitted} of {len(output)} characters omitted. The full output is stored as tool output "
+            f"{output_id}; call read_tool_output with this output_id and an offset to read the rest.] ...\n"
+            f"{tail}"
+        )
+
+    async def read(self, thread_id: str, output_id: str, offset: int = 0, length: int = 10000) -> Optional[Dict[str, Any]]:
+        """Read part of a stored output.
+
+        Args:
+            thread_id: Thread the output belongs to
+            output_id: Handle of the output
+            offset: Character offset to start reading at
+            length: Maximum number of characters to read
+
+        Returns:
+            Dict with the content read, its offset, the total size and the offset
+            to continue at (None when the end was reached), or None if no output
+            with this handle exists in the thread
+        """
+        # Only the requested range is read from the database, not the whole output
+        client = await self.db.client
+        result = await client.rpc('read_tool_output', {
+            'p_thread_id': thread_id,
+            'p_output_id': output_id,
+            'p_offset': offset,
+            'p_length': length
+        }).execute()
+        if not result.data:
+            return None
+
+        content, size = result.data[0]['content'], result.data[0]['size']
+        end = offset + len(content)
+        return {
+            "content": content,
+            "offset": offset,
+            "size": size,
+            "next_offset": end if end < size else None,
+        }
@@ -1,36 +1,151 @@
-from typing import Dict, Type, Any, List, Optional, Callable
-from agentpress.tool import Tool, SchemaType, ToolSchema
+import json
+import threading
+from typing import Dict, Type, Any, List, Optional, Callable, Tuple
+from agentpress.tool import Tool, SchemaType, ToolSchema, ToolResources
+from agentpress.xml_parsing import XMLExtractionPlan
+from agentpress.tool_validation import ArgumentValidator
 from utils.logger import logger
 
 
+class ToolDefinition:
+    """Instance-independent registration data of a tool class.
+    
+    Schemas and compiled XML extraction plans depend only on the tool class and
+    the selected functions, so they are built once per process and shared by
+    every registry that registers the class.
+    
+    Attributes:
+        tool_class (Type[Tool]): The tool class
+        openapi (Dict[str, ToolSchema]): OpenAPI schemas by function name
+        validators (Dict[str, ArgumentValidator]): Compiled argument validators by function name
+        xml (Dict[str, Tuple[str, ToolSchema, XMLExtractionPlan]]): Method name,
+            schema and extraction plan by XML tag name
+    """
+    
+    _cache: Dict[Tuple[Type[Tool], Optional[frozenset]], "ToolDefinition"] = {}
+    
+    def __init__(self, tool_class: Type[Tool], function_names: Optional[List[str]] = None):
+        """Collect the schemas of a tool class.
+        
+        Args:
+            tool_class: The tool class
+            function_names: Optional list of specific functions to include
+        """
+        self.tool_class = tool_class
+        self.openapi: Dict[str, ToolSchema] = {}
+        self.validators: Dict[str, ArgumentValidator] = {}
+        self.xml: Dict[str, Tuple[str, ToolSchema, XMLExtractionPlan]] = {}
+        
+        for func_name, schema_list in tool_class.get_class_schemas().items():
+            if function_names is not None and func_name not in function_names:
+                continue
+            for schema in schema_list:
+                if schema.schema_type == SchemaType.OPENAPI:
+                    self.openapi[func_name] = schema
+                    self.validators[func_name] = ArgumentValidator(schema.schema.get("function", {}).get("parameters"))
+                if schema.schema_type == SchemaType.XML and schema.xml_schema:
+                    self.xml[schema.xml_schema.tag_name] = (func_name, schema, XMLExtractionPlan(schema.xml_schema))
+    
+    @classmethod
+    def for_class(cls, tool_class: Type[Tool], function_names: Optional[List[str]] = None) -> "ToolDefinition":
+        """Get the shared definition of a tool class, building it on first use."""
+        key = (tool_class, frozenset(function_names) if function_names is not None else None)
+        definition = cls._cache.get(key)
+        if definition is None:
+            definition = cls._cache[key] = cls(tool_class, function_names)
+            logger.debug(f"Built tool definition for {tool_class.__name__}: {len(definition.openapi)} OpenAPI functions, {len(definition.xml)} XML tags")
+        return definition
+
+
+class LazyTool:
+    """A registered tool whose instance is created on first use.
+    
+    Tool constructors may do remote lookups (e.g. sandbox tools fetch their
+    sandbox and preview links), so registration only records the class and its
+    arguments; the instance is created when one of its functions is first called.
+    A constructor that fails is retried on the next use.
+    
+    Attributes:
+        tool_class (Type[Tool]): The tool class
+        kwargs (Dict[str, Any]): Arguments for the tool's constructor
+    """
+    
+    def __init__(self, tool_class: Type[Tool], kwargs: Dict[str, Any]):
+        self.tool_class = tool_class
+        self.kwargs = kwargs
+        self._instance: Optional[Tool] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def created(self) -> bool:
+        """Whether the tool instance exists."""
+        return self._instance is not None
+    
+    def get(self) -> Tool:
+        """Get the tool instance, creating it on first use."""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    logger.debug(f"Creating tool instance of {self.tool_class.__name__} on first use")
+                    self._instance = self.tool_class(**self.kwargs)
+        return self._instance
+
+
+# Schema views by sequence of registered definitions, shared by all registries;
+# never handed out, so callers can't modify them for every other registry
+_schema_views: Dict[Tuple[ToolDefinition, ...], Tuple[Tuple[Dict[str, Any], ...], str, Dict[str, str]]] = {}
+
+
 class ToolRegistry:
     """Registry for managing and accessing tools.
     
     Maintains a collection of tool instances and their schemas, allowing for
     selective registration of tool functions and easy access to tool capabilities.
+    Each registry is a view for one agent run: tool definitions are shared
+    process-wide, while tool instances bind per-run arguments such as a sandbox id.
+    Tool instances are created lazily, when one of their functions is first called.
     
     Attributes:
-        tools (Dict[str, Dict[str, Any]]): OpenAPI-style tools and schemas
-        xml_tools (Dict[str, Dict[str, Any]]): XML-style tools and schemas
+        tools (Dict[str, Dict[str, Any]]): OpenAPI-style tools (LazyTool) and schemas
+        xml_tools (Dict[str, Dict[str, Any]]): XML-style tools (LazyTool), schemas and compiled extraction plans
+        version (int): Incremented on every registration; derived caches are rebuilt with it
         
     Methods:
         register_tool: Register a tool with optional function filtering
+        view: Create a registry view starting from this registry's tools
         get_tool: Get a specific tool by name
+        get_function: Get the bound implementation of a tool function
+        get_unbound_tool_class: Get the class of a tool not instantiated yet
+        get_validator: Get the compiled argument validator of a tool function
         get_xml_tool: Get a tool by XML tag name
         get_openapi_schemas: Get OpenAPI schemas for function calling
+        get_openapi_schemas_json: Get the OpenAPI schemas pre-serialized as JSON
         get_xml_examples: Get examples of XML tool usage
     """
     
-    _instance = None
+    def __init__(self):
+        """Initialize an empty registry."""
+        self.tools: Dict[str, Dict[str, Any]] = {}
+        self.xml_tools: Dict[str, Dict[str, Any]] = {}
+        self.version = 0
+        self._definitions: Tuple[ToolDefinition, ...] = ()
+        self._rebuild_dispatch()
     
-    def __new__(cls):
-        """Create or return singleton instance."""
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance.tools = {}
-            cls._instance.xml_tools = {}
-            logger.info("Initialized new ToolRegistry instance")
-        return cls._instance
+    def view(self) -> "ToolRegistry":
+        """Create a registry view starting from this registry's tools.
+        
+        Tools registered on the view don't affect this registry, so concurrent
+        runs can each bind their own tool instances.
+        
+        Returns:
+            New ToolRegistry sharing this registry's (lazily created) tool instances and definitions
+        """
+        registry = ToolRegistry()
+        registry.tools = dict(self.tools)
+        registry.xml_tools = dict(self.xml_tools)
+        registry._definitions = self._definitions
+        registry._rebuild_dispatch()
+        return registry
     
     def register_tool(self, tool_class: Type[Tool], function_names: Optional[List[str]] = None, **kwargs):
         """Register a tool with optional function filtering.
@@ -40,65 +155,180 @@ class ToolRegistry:
             function_names: Optional list of specific functions to register
             **kwargs: Additional arguments passed to tool initialization
             
+        Returns:
+            LazyTool creating the registered tool instance on first use
+            
         Notes:
             - If function_names is None, all functions are registered
             - Handles both OpenAPI and XML schema registration
+            - Schemas and XML extraction plans are shared process-wide per tool
+              class; the tool instance is created per registration, on first call
         """
         logger.info(f"Registering tool class: {tool_class.__name__}")
-        tool_instance = tool_class(**kwargs)
-        schemas = tool_instance.get_schemas()
-        
-        logger.debug(f"Available schemas for {tool_class.__name__}: {list(schemas.keys())}")
-        
-        registered_openapi = 0
-        registered_xml = 0
-        
-        for func_name, schema_list in schemas.items():
-            if function_names is None or func_name in function_names:
-                for schema in schema_list:
-                    if schema.schema_type == SchemaType.OPENAPI:
-                        self.tools[func_name] = {
-                            "instance": tool_instance,
-                            "schema": schema
-                        }
-                        registered_openapi += 1
-                        logger.debug(f"Registered OpenAPI function {func_name} from {tool_class.__name__}")
-                    
-                    if schema.schema_type == SchemaType.XML and schema.xml_schema:
-                        self.xml_tools[schema.xml_schema.tag_name] = {
-                            "instance": tool_instance,
-                            "method": func_name,
-                            "schema": schema
-                        }
-                        registered_xml += 1
-                        logger.debug(f"Registered XML tag {schema.xml_schema.tag_name} -> {func_name} from {tool_class.__name__}")
-        
-        logger.info(f"Tool registration complete for {tool_class.__name__}: {registered_openapi} OpenAPI functions, {registered_xml} XML tags")
+        definition = ToolDefinition.for_class(tool_class, function_names)
+        tool = LazyTool(tool_class, kwargs)
+        
+        for func_name, schema in definition.openapi.items():
+            self.tools[func_name] = {
+                "tool": tool,
+                "schema": schema,
+                "validator": definition.validators[func_name]
+            }
+        
+        for tag_name, (func_name, schema, plan) in definition.xml.items():
+            self.xml_tools[tag_name] = {
+                "tool": tool,
+                "method": func_name,
+                "schema": schema,
+                "plan": plan
+            }
+        
+        self._definitions += (definition,)
+        self._rebuild_dispatch()
+        logger.info(f"Tool registration complete for {tool_class.__name__}: {len(definition.openapi)} OpenAPI functions, {len(definition.xml)} XML tags")
+        return tool
+
+    def _rebuild_dispatch(self):
+        """Rebuild the dispatch map and cached schema views after a registration.
+        
+        Lookups during tool execution are on the hot path, so bound methods are
+        resolved once per tool instance instead of per call: here for tools that
+        already exist, on first call for the others. Schema views only depend on
+        the registered definitions and are shared between registries.
+        """
+        tools = {}
+        for tool_name, tool_info in self.tools.items():
+            tools[tool_name] = tool_info['tool']
+        for tool_info in self.xml_tools.values():
+            tools.setdefault(tool_info['method'], tool_info['tool'])
+        
+        self._tools = tools
+        self._functions = {
+            function_name: getattr(tool.get(), function_name)
+            for function_name, tool in tools.items()
+            if tool.created
+        }
+        
+        views = _schema_views.get(self._definitions)
+        if views is None:
+            openapi_schemas = tuple(
+                tool_info['schema'].schema
+                for tool_info in self.tools.values()
+                if tool_info['schema'].schema_type == SchemaType.OPENAPI
+            )
+            xml_examples = {
+                tag_name: tool_info['schema'].xml_schema.example
+                for tag_name, tool_info in self.xml_tools.items()
+                if tool_info['schema'].xml_schema and tool_info['schema'].xml_schema.example
+            }
+            views = _schema_views[self._definitions] = (openapi_schemas, json.dumps(list(openapi_schemas)), xml_examples)
+        self._openapi_schemas, self._openapi_schemas_json, self._xml_examples = views
+        self.version += 1
+        logger.debug(f"Rebuilt tool dispatch map (version {self.version}): {len(tools)} functions")
 
     def get_available_functions(self) -> Dict[str, Callable]:
         """Get all available tool functions.
         
         Returns:
-            Dict mapping function names to their implementations
+            Dict mapping function names to their implementations (creates every
+            tool instance; use get_function for single lookups)
+        """
+        return {function_name: self.get_function(function_name) for function_name in self._tools}
+
+    def get_function(self, function_name: str) -> Optional[Callable]:
+        """Get the bound implementation of a tool function.
+        
+        Args:
+            function_name: Name of the tool function
+            
+        Returns:
+            The bound method, or None if no tool registers the function
+            
+        Notes:
+            - Creates the tool instance on the first call of any of its functions
         """
-        available_functions = {}
+        function = self._functions.get(function_name)
+        if function is None:
+            tool = self._tools.get(function_name)
+            if tool is None:
+                return None
+            function = self._functions[function_name] = getattr(tool.get(), function_name)
+        return function
+
+    def get_unbound_tool_class(self, function_name: str) -> Optional[Type[Tool]]:
+        """Get the class of the tool implementing a function, if it isn't instantiated yet.
         
-        # Get OpenAPI tool functions
-        for tool_name, tool_info in self.tools.items():
-            tool_instance = tool_info['instance']
-            function_name = tool_name
-            function = getattr(tool_instance, function_name)
-            available_functions[function_name] = function
+        Args:
+            function_name: Name of the tool function
+            
+        Returns:
+            The tool class, or None if the tool exists or no tool registers the function
+        """
+        tool = self._tools.get(function_name)
+        if tool is None or tool.created:
+            return None
+        return tool.tool_class
+
+    def get_validator(self, function_name: str) -> Optional[ArgumentValidator]:
+        """Get the compiled argument validator of a tool function.
+        
+        Args:
+            function_name: Name of the tool function
+            
+        Returns:
+            The validator, or None if the function has no OpenAPI schema
+        """
+        return self.tools.get(function_name, {}).get("validator")
+
+    def get_resource_keys(self, function_name: str, arguments: Dict[str, Any]) -> Optional[Tuple[frozenset, frozenset]]:
+        """Resolve the resources a tool call reads and writes.
+        
+        Args:
+            function_name: Name of the tool function
+            arguments: Arguments of the call
             
-        # Get XML tool functions
-        for tag_name, tool_info in self.xml_tools.items():
-            tool_instance = tool_info['instance']
-            method_name = tool_info['method']
-            function = getattr(tool_instance, method_name)
-            available_functions[method_name] = function
+        Returns:
+            (read keys, write keys), or None if the function declares no resources
+            or its keys can't be resolved from the arguments
+        """
+        tool = self._tools.get(function_name)
+        if tool is None:
+            return None
+        
+        resources: Optional[ToolResources] = getattr(getattr(tool.tool_class, function_name), 'tool_resources', None)
+        if resources is None:
+            return None
+        # Resolved from the class: the tool may not exist yet, and creating it
+        # here would do its (possibly blocking) setup on the event loop
+        return resources.resolve(arguments, normalize=tool.tool_class.normalize_resource_value)
+
+    def get_max_concurrency(self, function_name: str) -> Optional[int]:
+        """Get the concurrency limit a tool function declares, if any.
+        
+        Args:
+            function_name: Name of the tool function
             
-        logger.debug(f"Retrieved {len(available_functions)} available functions")
-        return available_functions
+        Returns:
+            Maximum number of concurrent calls, or None if unlimited
+        """
+        tool = self._tools.get(function_name)
+        if tool is None:
+            return None
+        return getattr(getattr(tool.tool_class, function_name), 'tool_max_concurrency', None)
+
+    def get_offload_output(self, function_name: str) -> bool:
+        """Check whether oversized outputs of a tool function are stored out of band.
+        
+        Args:
+            function_name: Name of the tool function
+            
+        Returns:
+            False if the function opted out with @offload_output(False), else True
+        """
+        tool = self._tools.get(function_name)
+        if tool is None:
+            return True
+        return getattr(getattr(tool.tool_class, function_name), 'tool_offload_output', True)
 
     def get_tool(self, tool_name: str) -> Dict[str, Any]:
         """Get a specific tool by name.
@@ -108,11 +338,13 @@ class ToolRegistry:
             
         Returns:
             Dict containing tool instance and schema, or empty dict if not found
+            (creates the tool instance)
         """
         tool = self.tools.get(tool_name, {})
         if not tool:
             logger.warning(f"Tool not found: {tool_name}")
-        return tool
+            return tool
+        return {**tool, "instance": tool["tool"].get()}
 
     def get_xml_tool(self, tag_name: str) -> Dict[str, Any]:
         """Get tool info by XML tag name.
@@ -121,7 +353,7 @@ class ToolRegistry:
             tag_name: XML tag name for the tool
             
         Returns:
-            Dict containing tool instance, method name, and schema
+            Dict containing the tool (LazyTool), method name, schema and extraction plan
         """
         tool = self.xml_tools.get(tag_name, {})
         if not tool:
@@ -132,26 +364,23 @@ class ToolRegistry:
         """Get OpenAPI schemas for function calling.
         
         Returns:
-            List of OpenAPI-compatible schema definitions
+            New list of the OpenAPI-compatible schema definitions (the schemas
+            themselves are shared; do not modify them)
         """
-        schemas = [
-            tool_info['schema'].schema 
-            for tool_info in self.tools.values()
-            if tool_info['schema'].schema_type == SchemaType.OPENAPI
-        ]
-        logger.debug(f"Retrieved {len(schemas)} OpenAPI schemas")
-        return schemas
+        return list(self._openapi_schemas)
+
+    def get_openapi_schemas_json(self) -> str:
+        """Get OpenAPI schemas for function calling, serialized as JSON.
+        
+        Returns:
+            JSON array of the schemas returned by get_openapi_schemas
+        """
+        return self._openapi_schemas_json
 
     def get_xml_examples(self) -> Dict[str, str]:
         """Get all XML tag examples.
         
         Returns:
-            Dict mapping tag names to their example usage
+            New dict mapping tag names to their example usage
         """
-        examples = {}
-        for tool_info in self.xml_tools.values():
-            schema = tool_info['schema']
-            if schema.xml_schema and schema.xml_schema.example:
-                examples[schema.xml_schema.tag_name] = schema.xml_schema.example
-        logger.debug(f"Retrieved {len(examples)} XML examples")
-        return examples
+        return dict(self._xml_examples)
@@ -0,0 +1,46 @@
+"""
+Compact encoding of tool results sent back to the LLM.
+
+By default tool results reach the thread as the ToolResult repr wrapped in the
+tool's XML tag, with structured data pretty-printed as JSON and its newlines
+escaped inside the repr. The compact encoding drops the repr, minifies JSON and
+can shorten frequent keys, which saves tokens on every turn the result is resent.
+"""
+
+import json
+from typing import Dict, Any, Optional
+
+from agentpress.tool import ToolResult
+
+
+def abbreviate_keys(value: Any, abbreviations: Dict[str, str]) -> Any:
+    """Rename dictionary keys at any depth using an abbreviation map."""
+    if isinstance(value, dict):
+        return {abbreviations.get(key, key): abbreviate_keys(item, abbreviations) for key, item in value.items()}
+    if isinstance(value, list):
+        return [abbreviate_keys(item, abbreviations) for item in value]
+    return value
+
+
+def encode_compact(result: ToolResult, abbreviations: Optional[Dict[str, str]] = None) -> ToolResult:
+    """Re-encode a tool result compactly.
+
+    Args:
+        result: The tool result
+        abbreviations: Optional map of dictionary keys to shorter names
+
+    Returns:
+        ToolResult whose output is minified JSON of the result's data, or its
+        output unchanged if it has no structured data
+    """
+    if result.data is None:
+        return ToolResult(success=result.success, output=result.output)
+
+    data = abbreviate_keys(result.data, abbreviations) if abbreviations else result.data
+    output = json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+    return ToolResult(success=result.success, output=output)
+
+
+def format_compact(result: ToolResult) -> str:
+    """Format a compactly encoded result as text, marking failures."""
+    return result.output if result.success else f"Error: {result.output}"
@@ -0,0 +1,221 @@
+"""
+Resource-aware scheduling and concurrency limiting of tool calls.
+
+Tools declare the resources they read and write through the schema decorators
+(see ToolResources). The ToolCallScheduler starts each call as soon as every
+earlier call it conflicts with has finished, so independent calls run
+concurrently while, for example, two edits of the same file run in order.
+Calls to tools without declarations are exclusive: they wait for all earlier
+calls, and all later calls wait for them.
+
+The ToolConcurrencyLimiter bounds how many calls run at once, overall and per
+tool, independently of the execution strategy.
+"""
+
+import json
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, Any, List, Tuple, Callable, Awaitable, Optional
+
+from agentpress.tool import ToolResult
+from agentpress.tool_registry import ToolRegistry
+
+
+def _keys_overlap(key_a: str, key_b: str) -> bool:
+    """Whether two resource keys may refer to the same resource ("*" suffix = prefix match)."""
+    wild_a = key_a.endswith("*")
+    wild_b = key_b.endswith("*")
+    if wild_a and wild_b:
+        return key_a[:-1].startswith(key_b[:-1]) or key_b[:-1].startswith(key_a[:-1])
+    if wild_a:
+        return key_b.startswith(key_a[:-1])
+    if wild_b:
+        return key_a.startswith(key_b[:-1])
+    return key_a == key_b
+
+
+def _any_overlap(keys_a: frozenset, keys_b: frozenset) -> bool:
+    if not keys_a or not keys_b:
+        return False
+    if keys_a & keys_b:
+        return True
+    return any(_keys_overlap(a, b) for a in keys_a for b in keys_b if a.endswith("*") or b.endswith("*"))
+
+
+@dataclass(frozen=True)
+class ResourceFootprint:
+    """Resolved resources of a single tool call.
+
+    Attributes:
+        reads (frozenset): Resource keys the call reads
+        writes (frozenset): Resource keys the call modifies
+        exclusive (bool): Whether the call conflicts with every other call
+    """
+    reads: frozenset = frozenset()
+    writes: frozenset = frozenset()
+    exclusive: bool = False
+
+    def conflicts_with(self, other: "ResourceFootprint") -> bool:
+        """Two calls conflict if either is exclusive or one writes what the other uses."""
+        if self.exclusive or other.exclusive:
+            return True
+        return (
+            _any_overlap(self.writes, other.writes | other.reads)
+            or _any_overlap(other.writes, self.reads)
+        )
+
+
+EXCLUSIVE = ResourceFootprint(exclusive=True)
+
+
+class ToolCallScheduler:
+    """Starts tool calls as tasks ordered by their declared resources.
+
+    Each submitted call depends on the earlier, still running calls it conflicts
+    with, which forms a dependency DAG in submission order. Calls can be submitted
+    all at once (a batch) or one at a time as they are parsed from a stream.
+    """
+
+    def __init__(self, tool_registry: ToolRegistry, execute_tool: Callable[[Dict[str, Any]], Awaitable[ToolResult]]):
+        """Initialize the scheduler.
+
+        Args:
+            tool_registry: Registry used to resolve declared resources
+            execute_tool: Coroutine function that executes a single tool call
+        """
+        self.tool_registry = tool_registry
+        self.execute_tool = execute_tool
+        self._scheduled: List[Tuple[ResourceFootprint, asyncio.Task]] = []
+
+    def footprint(self, tool_call: Dict[str, Any]) -> ResourceFootprint:
+        """Resolve the resources a tool call uses; undeclared or unresolvable calls are exclusive."""
+        arguments = tool_call.get("arguments", {})
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments)
+            except json.JSONDecodeError:
+                return EXCLUSIVE
+        if not isinstance(arguments, dict):
+            return EXCLUSIVE
+
+        keys = self.tool_registry.get_resource_keys(tool_call.get("function_name", ""), arguments)
+        if keys is None:
+            return EXCLUSIVE
+        return ResourceFootprint(reads=keys[0], writes=keys[1])
+
+    def submit(self, tool_call: Dict[str, Any], **kwargs) -> asyncio.Task:
+        """Start a tool call once all earlier conflicting calls have finished.
+
+        Args:
+            tool_call: The tool call to execute
+            **kwargs: Additional arguments passed to execute_tool
+
+        Returns:
+            Task resolving to the call's ToolResult
+        """
+        footprint = self.footprint(tool_call)
+
+        # Finished calls no longer constrain anything
+        self._scheduled = [(fp, task) for fp, task in self._scheduled if not task.done()]
+        dependencies = [task for fp, task in self._scheduled if fp.conflicts_with(footprint)]
+
+        task = asyncio.create_task(self._run_after(dependencies, tool_call, kwargs))
+        self._scheduled.append((footprint, task))
+        return task
+
+    async def _run_after(self, dependencies: List[asyncio.Task], tool_call: Dict[str, Any], kwargs: Dict[str, Any]) -> ToolResult:
+        if dependencies:
+            await asyncio.wait(dependencies)
+        return await self.execute_tool(tool_call, **kwargs)
+
+
+class ToolConcurrencyLimiter:
+    """Bounds the number of in-flight tool calls, overall and per tool.
+
+    Per-tool limits are looked up by function name or XML tag name in the given
+    limits, falling back to the limit the tool declares in its decorator. A call
+    first waits for its tool's slot, then for a global slot.
+
+    Attributes:
+        max_parallel_tools (int): Maximum calls running at once (0 = no limit)
+        queue_depth (int): Calls started but still waiting for a slot
+    """
+
+    def __init__(
+        self,
+        max_parallel_tools: int = 0,
+        tool_limits: Optional[Dict[str, int]] = None,
+        default_limit: Optional[Callable[[str], Optional[int]]] = None
+    ):
+        """Initialize the limiter.
+
+        Args:
+            max_parallel_tools: Maximum calls running at once (0 = no limit)
+            tool_limits: Limits by function name or XML tag name
+            default_limit: Returns the limit a function declares, if any
+        """
+        self.max_parallel_tools = max_parallel_tools
+        self.tool_limits = tool_limits or {}
+        self.default_limit = default_limit
+        self.queue_depth = 0
+        self._global = asyncio.Semaphore(max_parallel_tools) if max_parallel_tools > 0 else None
+        self._per_tool: Dict[str, Optional[asyncio.Semaphore]] = {}
+
+    def _tool_semaphore(self, tool_call: Dict[str, Any]) -> Optional[asyncio.Semaphore]:
+        function_name = tool_call.get("function_name", "")
+        if function_name not in self._per_tool:
+            limit = self.tool_limits.get(function_name) or self.tool_limits.get(tool_call.get("xml_tag_name") or "")
+            if not limit and self.default_limit is not None:
+                limit = self.default_limit(function_name)
+            self._per_tool[function_name] = asyncio.Semaphore(limit) if limit else None
+        return self._per_tool[function_name]
+
+    def submit(self) -> int:
+        """Register a call that is about to wait for a slot.
+
+        The registration ends when the call's acquire() returns or fails; a call
+        that never gets to acquire() (e.g. it was cancelled first) must withdraw().
+
+        Returns:
+            Number of calls already waiting ahead of it
+        """
+        depth = self.queue_depth
+        self.queue_depth += 1
+        return depth
+
+    def withdraw(self):
+        """Unregister a call registered with submit() that won't call acquire()."""
+        self.queue_depth -= 1
+
+    async def acquire(self, tool_call: Dict[str, Any]) -> float:
+        """Wait for slots for a call previously registered with submit().
+
+        The call is unregistered however the wait ends, including cancellation.
+
+        Returns:
+            Seconds spent waiting
+        """
+        started = time.monotonic()
+        tool_semaphore = self._tool_semaphore(tool_call)
+        try:
+            if tool_semaphore is not None:
+                await tool_semaphore.acquire()
+            if self._global is not None:
+                try:
+                    await self._global.acquire()
+                except BaseException:
+                    if tool_semaphore is not None:
+                        tool_semaphore.release()
+                    raise
+        finally:
+            self.queue_depth -= 1
+        return time.monotonic() - started
+
+    def release(self, tool_call: Dict[str, Any]):
+        """Release the slots held by a finished call."""
+        if self._global is not None:
+            self._global.release()
+        tool_semaphore = self._per_tool.get(tool_call.get("function_name", ""))
+        if tool_semaphore is not None:
+            tool_semaphore.release()
@@ -0,0 +1,196 @@
+"""
+Validation of tool call arguments against OpenAPI parameter schemas.
+
+Each tool function's `parameters` block is compiled once into a tree of small
+checker functions, so a call can be validated before dispatch without
+re-interpreting the schema. Invalid calls are answered with a structured error
+instead of reaching the tool (and its sandbox).
+
+Supported keywords: type (including lists of types), enum, properties,
+required, additionalProperties (false), items, anyOf and oneOf. Unknown
+keywords are ignored, so schemas the validator doesn't understand are accepted.
+"""
+
+from typing import Dict, Any, List, Tuple, Callable, Optional
+
+# A compiled check: (value, path, coerce_strings) -> (value, errors)
+Checker = Callable[[Any, str, bool], Tuple[Any, List[Dict[str, str]]]]
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda value: isinstance(value, str),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "array": lambda value: isinstance(value, list),
+    "object": lambda value: isinstance(value, dict),
+    "null": lambda value: value is None,
+}
+
+_NO_COERCION = object()
+
+
+def _coerce_string(value: str, type_name: str) -> Any:
+    """Convert a string (e.g. an XML attribute) to a declared type, if it represents one."""
+    if type_name == "boolean":
+        lowered = value.strip().lower()
+        if lowered in ("true", "false"):
+            return lowered == "true"
+    elif type_name == "integer":
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    elif type_name == "number":
+        try:
+            return float(value.strip())
+        except ValueError:
+            pass
+    elif type_name == "array":
+        return [value]
+    return _NO_COERCION
+
+
+def _type_label(value: Any) -> str:
+    for type_name in ("null", "boolean", "integer", "number", "string", "array", "object"):
+        if _TYPE_CHECKS[type_name](value):
+            return type_name
+    return type(value).__name__
+
+
+def _error(path: str, message: str) -> Dict[str, str]:
+    return {"path": path or "$", "message": message}
+
+
+def _compile(schema: Dict[str, Any]) -> Checker:
+    """Compile a schema node into a checker function."""
+    if not isinstance(schema, dict):
+        return lambda value, path, coerce: (value, [])
+
+    checks: List[Checker] = []
+
+    alternatives = schema.get("anyOf") or schema.get("oneOf")
+    if alternatives:
+        compiled_alternatives = [_compile(alternative) for alternative in alternatives]
+
+        def check_alternatives(value, path, coerce):
+            for check in compiled_alternatives:
+                checked, errors = check(value, path, False)
+                if not errors:
+                    return checked, []
+            if coerce:
+                for check in compiled_alternatives:
+                    checked, errors = check(value, path, True)
+                    if not errors:
+                        return checked, []
+            return value, [_error(path, f"value does not match any of the {len(compiled_alternatives)} allowed schemas")]
+        checks.append(check_alternatives)
+
+    declared = schema.get("type")
+    type_names = [declared] if isinstance(declared, str) else list(declared or [])
+    type_names = [name for name in type_names if name in _TYPE_CHECKS]
+    if type_names:
+        type_checks = [_TYPE_CHECKS[name] for name in type_names]
+        expected = " or ".join(type_names)
+
+        def check_type(value, path, coerce):
+            if any(type_check(value) for type_check in type_checks):
+                return value, []
+            if coerce and isinstance(value, str):
+                for type_name in type_names:
+                    coerced = _coerce_string(value, type_name)
+                    if coerced is not _NO_COERCION:
+                        return coerced, []
+            return value, [_error(path, f"expected {expected}, got {_type_label(value)}")]
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+
+        def check_enum(value, path, coerce):
+            if value in allowed:
+                return value, []
+            return value, [_error(path, f"must be one of {allowed}, got {value!r}")]
+        checks.append(check_enum)
+
+    if "items" in schema:
+        check_item = _compile(schema["items"])
+
+        def check_items(value, path, coerce):
+            if not isinstance(value, list):
+                return value, []
+            items, errors = [], []
+            for index, item in enumerate(value):
+                item, item_errors = check_item(item, f"{path}[{index}]", coerce)
+                items.append(item)
+                errors.extend(item_errors)
+            return items, errors
+        checks.append(check_items)
+
+    if "properties" in schema or "required" in schema or schema.get("additionalProperties") is False:
+        property_checks = {name: _compile(subschema) for name, subschema in schema.get("properties", {}).items()}
+        required = list(schema.get("required", []))
+        closed = schema.get("additionalProperties") is False
+
+        def check_object(value, path, coerce):
+            if not isinstance(value, dict):
+                return value, []
+            prefix = f"{path}." if path else ""
+            result, errors = {}, []
+            for name in required:
+                if name not in value:
+                    errors.append(_error(f"{prefix}{name}", "required argument is missing"))
+            for name, item in value.items():
+                check_property = property_checks.get(name)
+                if check_property is not None:
+                    item, item_errors = check_property(item, f"{prefix}{name}", coerce)
+                    errors.extend(item_errors)
+                elif closed:
+                    errors.append(_error(f"{prefix}{name}", "unexpected argument"))
+                result[name] = item
+            return result, errors
+        checks.append(check_object)
+
+    if len(checks) == 1:
+        return checks[0]
+
+    def check_all(value, path, coerce):
+        errors: List[Dict[str, str]] = []
+        for check in checks:
+            value, check_errors = check(value, path, coerce)
+            if check_errors:
+                errors.extend(check_errors)
+                break
+        return value, errors
+    return check_all
+
+
+class ArgumentValidator:
+    """Validator compiled from a tool function's OpenAPI `parameters` schema.
+
+    Attributes:
+        parameters (Dict[str, Any]): The schema the validator was compiled from
+    """
+
+    def __init__(self, parameters: Optional[Dict[str, Any]]):
+        """Compile a parameters schema.
+
+        Args:
+            parameters: JSON schema of the function's arguments (an object schema)
+        """
+        self.parameters = parameters or {}
+        self._check = _compile(dict(self.parameters, type="object"))
+
+    def validate(self, arguments: Any, coerce_strings: bool = False) -> Tuple[Any, List[Dict[str, str]]]:
+        """Check call arguments against the schema.
+
+        Args:
+            arguments: Arguments of the call
+            coerce_strings: Convert string values to the declared boolean, number,
+                integer or array type where possible (XML attributes and elements
+                are always parsed as strings)
+
+        Returns:
+            (arguments, errors): the arguments, with coerced values if requested,
+            and a list of {"path", "message"} errors, empty if the call is valid
+        """
+        return self._check(arguments, "", coerce_strings)
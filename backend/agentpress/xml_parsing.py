@@ -0,0 +1,407 @@
+"""
+Incremental XML tool call detection for AgentPress.
+
+This module provides the building blocks used by the ResponseProcessor to find
+XML tool calls in LLM output without rescanning the whole response:
+- XMLTagAutomaton: an Aho-Corasick automaton over all registered opening tags
+- XMLToolCallScanner: a resumable scanner that emits complete tool call chunks
+  as soon as their closing tag arrives
+- XMLExtractionPlan: a precompiled plan that turns a tool call chunk into
+  function arguments according to its XMLTagSchema
+"""
+
+import re
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from agentpress.tool import XMLTagSchema
+
+# Characters that may follow a tag name inside an opening tag
+_TAG_NAME_TERMINATORS = frozenset(" \t\r\n>/")
+
+# Common XML entities decoded in attribute values
+_XML_ENTITIES = {"quot": '"', "apos": "'", "lt": "<", "gt": ">", "amp": "&"}
+_XML_ENTITY_PATTERN = re.compile(r"&(quot|apos|lt|gt|amp);")
+
+
+def unescape_xml_entities(value: str) -> str:
+    """Decode common XML entities in a single pass.
+    
+    Args:
+        value: Raw attribute value
+        
+    Returns:
+        The value with &quot;, &apos;, &lt;, &gt; and &amp; decoded
+    """
+    if "&" not in value:
+        return value
+    return _XML_ENTITY_PATTERN.sub(lambda match: _XML_ENTITIES[match.group(1)], value)
+
+
+class XMLTagAutomaton:
+    """Aho-Corasick automaton matching the opening of every registered XML tag.
+
+    The automaton is immutable once built and can be shared between any number
+    of scanners, so it is built once per set of registered tags.
+
+    Attributes:
+        tag_names (Tuple[str, ...]): Tag names the automaton was built from
+        max_pattern_length (int): Length of the longest opening pattern
+    """
+
+    def __init__(self, tag_names: Iterable[str]):
+        """Build the automaton from a collection of tag names.
+
+        Args:
+            tag_names: XML tag names to detect (e.g. "create-file")
+        """
+        self.tag_names: Tuple[str, ...] = tuple(sorted(set(tag_names)))
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+
+        for tag_name in self.tag_names:
+            self._add_pattern(tag_name)
+        self._build_failure_links()
+
+        self.max_pattern_length = max((len(tag) + 1 for tag in self.tag_names), default=0)
+
+    def _add_pattern(self, tag_name: str) -> None:
+        """Insert the opening pattern '<tag_name' into the trie."""
+        state = 0
+        for char in f"<{tag_name}":
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state].append(tag_name)
+
+    def _build_failure_links(self) -> None:
+        """Compute failure links and merged outputs breadth-first."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def step(self, state: int, char: str) -> int:
+        """Advance the automaton by one character.
+
+        Args:
+            state: Current automaton state
+            char: Next input character
+
+        Returns:
+            The new automaton state
+        """
+        while state and char not in self._goto[state]:
+            state = self._fail[state]
+        return self._goto[state].get(char, 0)
+
+    def matches(self, state: int) -> List[str]:
+        """Get the tag names whose opening pattern ends at this state."""
+        return self._output[state]
+
+
+class XMLToolCallScanner:
+    """Resumable scanner that extracts complete XML tool call chunks from a stream.
+
+    Content is fed delta by delta. The scanner keeps its automaton state and
+    position between calls, so each call only examines the newly added text
+    (plus at most one pattern length of carried-over context).
+
+    Only the text of a tool call that is still open, and a short tail needed to
+    resume a partial match, is retained between calls.
+    """
+
+    def __init__(self, automaton: XMLTagAutomaton):
+        """Initialize the scanner.
+
+        Args:
+            automaton: Shared automaton built from the registered tag names
+        """
+        self.automaton = automaton
+        self._buffer = ""
+        self._pos = 0
+        self._state = 0
+
+        # Opening tag waiting for its next character to confirm the tag name ended
+        self._candidate: Optional[Tuple[str, int]] = None
+
+        # Tool call currently being collected
+        self._open_tag: Optional[str] = None
+        self._chunk_start = 0
+        self._depth = 0
+
+    @property
+    def in_tool_call(self) -> bool:
+        """Whether the scanner is inside an unterminated tool call."""
+        return self._open_tag is not None
+
+    def feed(self, text: str) -> List[str]:
+        """Feed a new piece of content to the scanner.
+
+        Args:
+            text: Newly received content
+
+        Returns:
+            List of complete XML chunks closed by this piece of content, in order
+        """
+        chunks: List[str] = []
+        if not text or not self.automaton.tag_names:
+            return chunks
+
+        self._buffer += text
+        while self._pos < len(self._buffer):
+            if self._open_tag is not None:
+                chunk = self._scan_for_close()
+                if chunk is None:
+                    break
+                chunks.append(chunk)
+            else:
+                self._scan_for_open()
+
+        self._compact()
+        return chunks
+
+    def _scan_for_open(self) -> None:
+        """Run the automaton over the buffer until a tool call opens or input runs out."""
+        buffer = self._buffer
+        automaton = self.automaton
+        length = len(buffer)
+        pos = self._pos
+        state = self._state
+
+        while pos < length:
+            # Confirm a pending match once the character after the tag name is known
+            if self._candidate is not None:
+                tag_name, start = self._candidate
+                self._candidate = None
+                if buffer[pos] in _TAG_NAME_TERMINATORS:
+                    self._open_tag = tag_name
+                    self._chunk_start = start
+                    self._depth = 1
+                    self._state = 0
+                    self._pos = pos
+                    return
+
+            # Every pattern starts with '<', so skip straight to the next one from the root
+            if state == 0:
+                next_open = buffer.find("<", pos)
+                if next_open == -1:
+                    pos = length
+                    break
+                pos = next_open
+
+            state = automaton.step(state, buffer[pos])
+            pos += 1
+
+            matched = automaton.matches(state)
+            if matched:
+                # Patterns only contain '<' at their start, so at most one can end here
+                tag_name = matched[0]
+                self._candidate = (tag_name, pos - len(tag_name) - 1)
+
+        self._state = state
+        self._pos = pos
+
+    def _scan_for_close(self) -> Optional[str]:
+        """Look for the closing tag of the open tool call, tracking same-name nesting.
+
+        Returns:
+            The complete chunk if the tool call closed, otherwise None
+        """
+        buffer = self._buffer
+        open_pattern = f"<{self._open_tag}"
+        close_pattern = f"</{self._open_tag}>"
+
+        while True:
+            next_open = buffer.find(open_pattern, self._pos)
+            next_close = buffer.find(close_pattern, self._pos)
+
+            if next_open != -1 and (next_close == -1 or next_open < next_close):
+                boundary = next_open + len(open_pattern)
+                if boundary >= len(buffer):
+                    # Can't tell yet whether this opens the same tag or a longer one
+                    self._pos = next_open
+                    return None
+                if buffer[boundary] in _TAG_NAME_TERMINATORS:
+                    self._depth += 1
+                self._pos = boundary
+                continue
+
+            if next_close != -1:
+                self._depth -= 1
+                self._pos = next_close + len(close_pattern)
+                if self._depth == 0:
+                    chunk = buffer[self._chunk_start:self._pos]
+                    self._open_tag = None
+                    return chunk
+                continue
+
+            # Neither pattern is complete yet; keep enough text to match a split pattern
+            self._pos = max(self._pos, len(buffer) - len(close_pattern) + 1)
+            return None
+
+    def _compact(self) -> None:
+        """Drop buffered text that can no longer be part of a tool call."""
+        if self._open_tag is not None:
+            keep_from = self._chunk_start
+        elif self._candidate is not None:
+            keep_from = self._candidate[1]
+        else:
+            keep_from = max(0, len(self._buffer) - self.automaton.max_pattern_length)
+
+        if keep_from > 0:
+            self._buffer = self._buffer[keep_from:]
+            self._pos -= keep_from
+            self._chunk_start -= keep_from
+            if self._candidate is not None:
+                tag_name, start = self._candidate
+                self._candidate = (tag_name, start - keep_from)
+
+
+class XMLExtractionPlan:
+    """Precompiled extraction plan for one XMLTagSchema.
+    
+    Everything that only depends on the schema is computed once: attribute
+    patterns, the element names to look for and the closing tag. Extracting a
+    tool call then needs one regex search per attribute and a single walk over
+    the chunk for all element mappings.
+    
+    Mapping paths are interpreted as follows:
+    - attribute: "@name" or "name" is the attribute name; "." uses the parameter name
+    - element: "name" yields the first matching element's content; a nested path
+      such as "files/file" yields a list with every matching element's content
+    - content/text: "." yields the content of the root tag
+    """
+
+    def __init__(self, xml_schema: XMLTagSchema):
+        """Compile the plan for a schema.
+        
+        Args:
+            xml_schema: Schema describing the XML tag and its parameter mappings
+        """
+        self.tag_name = xml_schema.tag_name
+        self.close_tag = f"</{xml_schema.tag_name}>"
+        self.required = [mapping.param_name for mapping in xml_schema.mappings if mapping.required]
+
+        # (param_name, compiled pattern) for attribute mappings
+        self.attributes: List[Tuple[str, re.Pattern]] = []
+        # (param_name, path segments) for element mappings
+        self.elements: List[Tuple[str, Tuple[str, ...]]] = []
+        # Parameter names filled with the root tag content
+        self.content_params: List[str] = []
+
+        for mapping in xml_schema.mappings:
+            if mapping.node_type == "attribute":
+                attr_name = mapping.path.lstrip("@")
+                if attr_name in ("", "."):
+                    attr_name = mapping.param_name
+                pattern = re.compile(
+                    rf"(?<![\w\-]){re.escape(attr_name)}=(?:\"([^\"]*)\"|'([^']*)'|([^\s/>;]+))"
+                )
+                self.attributes.append((mapping.param_name, pattern))
+            elif mapping.node_type == "element":
+                segments = tuple(segment for segment in mapping.path.split("/") if segment and segment != ".")
+                if segments:
+                    self.elements.append((mapping.param_name, segments))
+            elif mapping.node_type in ("content", "text") and mapping.path == ".":
+                self.content_params.append(mapping.param_name)
+
+        # One pattern matching the opening and closing tags of every mapped element
+        element_names = sorted({name for _, segments in self.elements for name in segments})
+        self.element_pattern: Optional[re.Pattern] = None
+        if element_names:
+            alternatives = "|".join(re.escape(name) for name in element_names)
+            self.element_pattern = re.compile(rf"<(/?)({alternatives})(?=[\s>/])[^>]*?(/?)>")
+
+    def extract(self, xml_chunk: str) -> Tuple[Dict[str, Any], List[str]]:
+        """Extract function arguments from a complete XML chunk.
+        
+        Args:
+            xml_chunk: Complete XML tool call, from its opening to its closing tag
+            
+        Returns:
+            Tuple of (extracted parameters, names of missing required parameters)
+        """
+        params: Dict[str, Any] = {}
+
+        opening_end = xml_chunk.find(">")
+        if opening_end == -1:
+            return params, list(self.required)
+
+        if self.attributes:
+            opening_tag = xml_chunk[:opening_end]
+            for param_name, pattern in self.attributes:
+                match = pattern.search(opening_tag)
+                if match:
+                    value = next(group for group in match.groups() if group is not None)
+                    params[param_name] = unescape_xml_entities(value)
+
+        if self.elements or self.content_params:
+            content = self._root_content(xml_chunk, opening_end)
+            if content is not None:
+                for param_name in self.content_params:
+                    params[param_name] = content.strip()
+                if self.elements:
+                    params.update(self._extract_elements(content))
+
+        missing = [name for name in self.required if name not in params]
+        return params, missing
+
+    def _root_content(self, xml_chunk: str, opening_end: int) -> Optional[str]:
+        """Get the content between the root opening tag and its closing tag."""
+        if xml_chunk[opening_end - 1] == "/":
+            return ""
+        if xml_chunk.endswith(self.close_tag):
+            return xml_chunk[opening_end + 1:len(xml_chunk) - len(self.close_tag)]
+        close_start = xml_chunk.rfind(self.close_tag)
+        if close_start == -1:
+            return None
+        return xml_chunk[opening_end + 1:close_start]
+
+    def _extract_elements(self, content: str) -> Dict[str, Any]:
+        """Collect all mapped element values in one walk over the content."""
+        # Each entry is (ancestor path including the element itself, content start, content end)
+        spans: List[Tuple[Tuple[str, ...], int, int]] = []
+        stack: List[Tuple[str, int]] = []
+
+        for match in self.element_pattern.finditer(content):
+            is_close, name, self_closing = match.group(1), match.group(2), match.group(3)
+            if is_close:
+                # Pop up to the matching open element, tolerating unclosed children
+                for depth in range(len(stack) - 1, -1, -1):
+                    if stack[depth][0] == name:
+                        path = tuple(entry[0] for entry in stack[:depth + 1])
+                        spans.append((path, stack[depth][1], match.start()))
+                        del stack[depth:]
+                        break
+            elif self_closing:
+                path = tuple(entry[0] for entry in stack) + (name,)
+                spans.append((path, match.end(), match.end()))
+            else:
+                stack.append((name, match.end()))
+
+        # Spans are recorded at their closing tag; restore document order
+        spans.sort(key=lambda span: span[1])
+
+        values: Dict[str, Any] = {}
+        for param_name, segments in self.elements:
+            matches = [
+                content[start:end].strip()
+                for path, start, end in spans
+                if path[-len(segments):] == segments
+            ]
+            if matches:
+                values[param_name] = matches if len(segments) > 1 else matches[0]
+        return values
@@ -0,0 +1,73 @@
+-- Full outputs of tool calls too large to keep in the thread's messages.
+-- The message holds a preview and the output_id; the agent reads the rest on demand.
+CREATE TABLE tool_outputs (
+    output_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    thread_id UUID NOT NULL REFERENCES threads(thread_id) ON DELETE CASCADE,
+    function_name TEXT NOT NULL,
+    content TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL
+);
+
+CREATE INDEX idx_tool_outputs_thread_id ON tool_outputs(thread_id);
+
+ALTER TABLE tool_outputs ENABLE ROW LEVEL SECURITY;
+
+-- Tool output policies based on thread ownership, as for messages
+CREATE POLICY tool_output_select_policy ON tool_outputs
+    FOR SELECT
+    USING (
+        EXISTS (
+            SELECT 1 FROM threads
+            LEFT JOIN projects ON threads.project_id = projects.project_id
+            WHERE threads.thread_id = tool_outputs.thread_id
+            AND (
+                threads.user_id = auth.uid() OR 
+                projects.user_id = auth.uid()
+            )
+        )
+    );
+
+CREATE POLICY tool_output_insert_policy ON tool_outputs
+    FOR INSERT
+    WITH CHECK (
+        EXISTS (
+            SELECT 1 FROM threads
+            LEFT JOIN projects ON threads.project_id = projects.project_id
+            WHERE threads.thread_id = tool_outputs.thread_id
+            AND (
+                threads.user_id = auth.uid() OR 
+                projects.user_id = auth.uid()
+            )
+        )
+    );
+
+CREATE POLICY tool_output_delete_policy ON tool_outputs
+    FOR DELETE
+    USING (
+        EXISTS (
+            SELECT 1 FROM threads
+            LEFT JOIN projects ON threads.project_id = projects.project_id
+            WHERE threads.thread_id = tool_outputs.thread_id
+            AND (
+                threads.user_id = auth.uid() OR 
+                projects.user_id = auth.uid()
+            )
+        )
+    );
+
+GRANT ALL PRIVILEGES ON TABLE tool_outputs TO authenticated, service_role;
+
+revoke delete on table "public"."tool_outputs" from "anon";
+
+revoke insert on table "public"."tool_outputs" from "anon";
+
+revoke references on table "public"."tool_outputs" from "anon";
+
+revoke select on table "public"."tool_outputs" from "anon";
+
+revoke trigger on table "public"."tool_outputs" from "anon";
+
+revoke truncate on table "public"."tool_outputs" from "anon";
+
+revoke update on table "public"."tool_outputs" from "anon";
@@ -0,0 +1,151 @@
+-- Per-thread message sequence numbers.
+-- Messages get a gapless, monotonically increasing seq within their thread,
+-- assigned under a lock on the thread row, so seq order is insertion order and
+-- a reader holding the last seq it saw can fetch exactly the newer messages.
+
+ALTER TABLE threads ADD COLUMN message_seq BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE messages ADD COLUMN seq BIGINT;
+
+-- Number existing messages in their previous (created_at) order
+UPDATE messages m
+SET seq = numbered.seq
+FROM (
+    SELECT message_id, ROW_NUMBER() OVER (PARTITION BY thread_id ORDER BY created_at, message_id) AS seq
+    FROM messages
+) numbered
+WHERE m.message_id = numbered.message_id;
+
+UPDATE threads t
+SET message_seq = last_seq.seq
+FROM (
+    SELECT thread_id, MAX(seq) AS seq
+    FROM messages
+    GROUP BY thread_id
+) last_seq
+WHERE t.thread_id = last_seq.thread_id;
+
+ALTER TABLE messages ALTER COLUMN seq SET NOT NULL;
+ALTER TABLE messages ADD CONSTRAINT messages_thread_id_seq_key UNIQUE (thread_id, seq);
+
+CREATE INDEX idx_messages_thread_llm_seq ON messages(thread_id, is_llm_message, seq);
+
+-- Assign the next seq of the thread; the row lock taken by the update serializes
+-- concurrent inserts into the same thread until they commit
+CREATE OR REPLACE FUNCTION assign_message_seq()
+RETURNS TRIGGER
+SECURITY DEFINER
+SET search_path = public
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE threads
+    SET message_seq = message_seq + 1
+    WHERE thread_id = NEW.thread_id
+    RETURNING message_seq INTO NEW.seq;
+    RETURN NEW;
+END;
+$$;
+
+CREATE TRIGGER assign_messages_seq
+    BEFORE INSERT ON messages
+    FOR EACH ROW
+    EXECUTE FUNCTION assign_message_seq();
+
+-- Format a stored message for the LLM: parse content stored as a JSON string and
+-- make sure tool_calls function arguments are strings
+CREATE OR REPLACE FUNCTION format_llm_message(p_content JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+DECLARE
+    parsed_content JSONB;
+BEGIN
+    parsed_content := CASE
+        WHEN jsonb_typeof(p_content) = 'string' THEN p_content::text::jsonb
+        ELSE p_content
+    END;
+
+    IF jsonb_typeof(parsed_content -> 'tool_calls') IS DISTINCT FROM 'array' THEN
+        RETURN parsed_content;
+    END IF;
+
+    RETURN jsonb_set(
+        parsed_content,
+        '{tool_calls}',
+        (
+            SELECT COALESCE(jsonb_agg(
+                CASE
+                    WHEN jsonb_path_exists(tool_call, '$.function.arguments')
+                         AND jsonb_typeof(tool_call #> '{function,arguments}') != 'string' THEN
+                        jsonb_set(tool_call, '{function,arguments}', to_jsonb(tool_call #>> '{function,arguments}'))
+                    ELSE tool_call
+                END
+                ORDER BY idx
+            ), '[]'::JSONB)
+            FROM jsonb_array_elements(parsed_content -> 'tool_calls') WITH ORDINALITY AS calls(tool_call, idx)
+        )
+    );
+END;
+$$;
+
+-- Order the full history by seq instead of created_at, which can tie
+CREATE OR REPLACE FUNCTION public.get_llm_formatted_messages(p_thread_id uuid)
+ RETURNS jsonb
+ LANGUAGE plpgsql
+AS $function$
+DECLARE
+    messages_array JSONB := '[]'::JSONB;
+BEGIN
+    -- Check if thread exists
+    IF NOT EXISTS (
+        SELECT 1 FROM threads t
+        WHERE t.thread_id = p_thread_id
+    ) THEN
+        RAISE EXCEPTION 'Thread not found';
+    END IF;
+
+    SELECT JSONB_AGG(format_llm_message(content) ORDER BY seq)
+    INTO messages_array
+    FROM messages
+    WHERE thread_id = p_thread_id
+    AND is_llm_message = TRUE;
+
+    -- Handle the case when no messages are found
+    IF messages_array IS NULL THEN
+        RETURN '[]'::JSONB;
+    END IF;
+
+    RETURN messages_array;
+END;
+$function$
+;
+
+-- LLM messages of a thread after a cursor (the seq of the last message already
+-- seen), in seq order
+CREATE OR REPLACE FUNCTION public.get_llm_formatted_messages_since(p_thread_id uuid, p_cursor bigint)
+ RETURNS TABLE (seq BIGINT, message JSONB)
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+    -- Check if thread exists
+    IF NOT EXISTS (
+        SELECT 1 FROM threads t
+        WHERE t.thread_id = p_thread_id
+    ) THEN
+        RAISE EXCEPTION 'Thread not found';
+    END IF;
+
+    RETURN QUERY
+    SELECT m.seq, format_llm_message(m.content)
+    FROM messages m
+    WHERE m.thread_id = p_thread_id
+    AND m.is_llm_message = TRUE
+    AND m.seq > p_cursor
+    ORDER BY m.seq;
+END;
+$function$
+;
+
+GRANT EXECUTE ON FUNCTION format_llm_message TO authenticated, service_role;
+GRANT EXECUTE ON FUNCTION get_llm_formatted_messages_since TO authenticated, service_role;
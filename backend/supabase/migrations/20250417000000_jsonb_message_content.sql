@@ -0,0 +1,64 @@
+-- Store message content and metadata as JSON values instead of JSON strings.
+-- They used to be written as json.dumps() output, so every read had to parse
+-- each message again; now they are written as JSON objects and the strings
+-- already stored are converted once, here.
+
+-- The JSON object or array a string holds, or NULL if it holds anything else
+CREATE OR REPLACE FUNCTION parse_jsonb_string(p_value JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+DECLARE
+    parsed JSONB;
+BEGIN
+    parsed := (p_value #>> '{}')::JSONB;
+    IF jsonb_typeof(parsed) IN ('object', 'array') THEN
+        RETURN parsed;
+    END IF;
+    RETURN NULL;
+EXCEPTION WHEN invalid_text_representation THEN
+    RETURN NULL;
+END;
+$$;
+
+UPDATE messages
+SET content = COALESCE(parse_jsonb_string(content), content)
+WHERE jsonb_typeof(content) = 'string';
+
+UPDATE messages
+SET metadata = COALESCE(parse_jsonb_string(metadata), metadata)
+WHERE jsonb_typeof(metadata) = 'string';
+
+DROP FUNCTION parse_jsonb_string(JSONB);
+
+-- Content no longer needs parsing; only tool_calls arguments are formatted.
+-- get_llm_formatted_messages and get_llm_formatted_messages_since use this.
+CREATE OR REPLACE FUNCTION format_llm_message(p_content JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+BEGIN
+    IF jsonb_typeof(p_content -> 'tool_calls') IS DISTINCT FROM 'array' THEN
+        RETURN p_content;
+    END IF;
+
+    RETURN jsonb_set(
+        p_content,
+        '{tool_calls}',
+        (
+            SELECT COALESCE(jsonb_agg(
+                CASE
+                    WHEN jsonb_path_exists(tool_call, '$.function.arguments')
+                         AND jsonb_typeof(tool_call #> '{function,arguments}') != 'string' THEN
+                        jsonb_set(tool_call, '{function,arguments}', to_jsonb(tool_call #>> '{function,arguments}'))
+                    ELSE tool_call
+                END
+                ORDER BY idx
+            ), '[]'::JSONB)
+            FROM jsonb_array_elements(p_content -> 'tool_calls') WITH ORDINALITY AS calls(tool_call, idx)
+        )
+    );
+END;
+$$;
@@ -0,0 +1,20 @@
+-- Read a range of a stored tool output without transferring the rest of it.
+-- Stored uncompressed, so substring() only fetches the TOAST chunks it needs
+-- (applies to outputs stored from now on).
+ALTER TABLE tool_outputs ALTER COLUMN content SET STORAGE EXTERNAL;
+
+-- A range of an output of a thread, as characters from p_offset (0-based),
+-- with the output's total size; no row if there is no such output
+CREATE OR REPLACE FUNCTION public.read_tool_output(p_thread_id uuid, p_output_id uuid, p_offset integer, p_length integer)
+ RETURNS TABLE (content TEXT, size INTEGER)
+ LANGUAGE sql
+ STABLE
+AS $function$
+    SELECT substring(t.content FROM p_offset + 1 FOR p_length), t.size
+    FROM tool_outputs t
+    WHERE t.output_id = p_output_id
+    AND t.thread_id = p_thread_id;
+$function$
+;
+
+GRANT EXECUTE ON FUNCTION read_tool_output TO authenticated, service_role;
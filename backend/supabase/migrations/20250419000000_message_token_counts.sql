@@ -0,0 +1,31 @@
+-- LLM messages of a thread with the token counts stored in their metadata when
+-- they were added, in seq order. Measuring a prompt then only needs to count
+-- messages without a stored count (token_count is NULL for those).
+CREATE OR REPLACE FUNCTION public.get_llm_formatted_messages_with_token_counts(p_thread_id uuid)
+ RETURNS TABLE (message JSONB, token_count INTEGER)
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+    -- Check if thread exists
+    IF NOT EXISTS (
+        SELECT 1 FROM threads t
+        WHERE t.thread_id = p_thread_id
+    ) THEN
+        RAISE EXCEPTION 'Thread not found';
+    END IF;
+
+    RETURN QUERY
+    SELECT
+        format_llm_message(m.content),
+        CASE
+            WHEN jsonb_typeof(m.metadata -> 'token_count') = 'number' THEN (m.metadata ->> 'token_count')::INTEGER
+        END
+    FROM messages m
+    WHERE m.thread_id = p_thread_id
+    AND m.is_llm_message = TRUE
+    ORDER BY m.seq;
+END;
+$function$
+;
+
+GRANT EXECUTE ON FUNCTION get_llm_formatted_messages_with_token_counts TO authenticated, service_role;
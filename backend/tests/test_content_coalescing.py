@@ -0,0 +1,123 @@
+"""
+Tests for coalescing of streamed content deltas in the response processor.
+
+With coalesce_content enabled, adjacent content deltas are merged into one event
+that is flushed on a size or latency threshold, and always before any tool or
+finish event, so the text and event order seen by clients are unchanged.
+"""
+
+import sys
+import time
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from agentpress.tool import Tool, ToolResult, xml_schema
+from agentpress.tool_registry import ToolRegistry
+from agentpress.response_processor import ResponseProcessor, ProcessorConfig
+
+
+class EchoTool(Tool):
+    """Test tool that returns its input."""
+
+    @xml_schema(
+        tag_name="echo-text",
+        mappings=[{"param_name": "text", "node_type": "content", "path": "."}],
+        example='<echo-text>hello</echo-text>'
+    )
+    async def echo_text(self, text: str) -> ToolResult:
+        return self.success_response(text)
+
+
+def _chunk(content, finish_reason=None):
+    delta = SimpleNamespace(content=content, tool_calls=None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)])
+
+
+async def _stream(parts, finish_reason="stop"):
+    """Yield content parts; a float entry pauses the stream for that many seconds."""
+    for part in parts:
+        if isinstance(part, float):
+            await asyncio.sleep(part)
+        else:
+            yield _chunk(part)
+    yield _chunk(None, finish_reason=finish_reason)
+
+
+async def _collect(parts, **config_overrides):
+    registry = ToolRegistry()
+    registry.register_tool(EchoTool)
+    processor = ResponseProcessor(registry, AsyncMock())
+    config = ProcessorConfig(xml_tool_calling=True, execute_on_stream=True, **config_overrides)
+
+    start = time.monotonic()
+    events = []
+    async for event in processor.process_streaming_response(_stream(parts), "thread-1", config):
+        events.append((time.monotonic() - start, event))
+    return events
+
+
+def _text(events):
+    return "".join(e["content"] for _, e in events if e["type"] == "content")
+
+
+@pytest.mark.asyncio
+async def test_coalescing_reduces_events_and_preserves_text():
+    """A burst of token deltas becomes a few size-bounded content events."""
+    tokens = [f"token{i} " for i in range(2_000)]
+    plain = await _collect(tokens)
+    coalesced = await _collect(tokens, coalesce_content=True, coalesce_max_chars=512)
+
+    plain_count = sum(1 for _, e in plain if e["type"] == "content")
+    coalesced_count = sum(1 for _, e in coalesced if e["type"] == "content")
+    print(f"\ncontent events: {plain_count} -> {coalesced_count}")
+
+    assert _text(coalesced) == _text(plain) == "".join(tokens)
+    assert coalesced_count * 10 < plain_count
+    assert all(len(e["content"]) < 512 + 16 for _, e in coalesced if e["type"] == "content")
+    assert coalesced[-1][1] == {"type": "finish", "finish_reason": "stop"}
+
+
+@pytest.mark.asyncio
+async def test_buffered_text_flushed_after_latency():
+    """Text is not held back while the LLM pauses."""
+    events = await _collect(["Hello", " world", 0.3, "!"], coalesce_content=True, coalesce_max_latency=0.02)
+    content = [(t, e["content"]) for t, e in events if e["type"] == "content"]
+
+    assert [text for _, text in content] == ["Hello world", "!"]
+    assert content[0][0] < 0.15, f"First frame took {content[0][0]:.3f}s"
+
+
+@pytest.mark.asyncio
+async def test_flush_before_tool_events():
+    """Buffered text always precedes the tool events that follow it."""
+    parts = ["Let me ", "echo: ", "<echo-text>", "hi", "</echo-text>", " after"]
+    events = [e for _, e in await _collect(parts, coalesce_content=True, coalesce_max_latency=10.0)]
+    plain = [e for _, e in await _collect(parts)]
+
+    def shape(evts):
+        # Collapse runs of content into one marker to compare event order
+        out = []
+        for e in evts:
+            kind = "content" if e["type"] == "content" else f'{e["type"]}:{e.get("status", "")}'
+            if not (out and out[-1] == kind == "content"):
+                out.append(kind)
+        return out
+
+    assert shape(events) == shape(plain)
+    assert events[0] == {"type": "content", "content": "Let me echo: <echo-text>hi</echo-text>"}
+    assert events[1]["type"] == "tool_status" and events[1]["status"] == "started"
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(test_coalescing_reduces_events_and_preserves_text())
+        asyncio.run(test_buffered_text_flushed_after_latency())
+        asyncio.run(test_flush_before_tool_events())
+        print("\n✅ Content coalescing tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,98 @@
+"""
+Tests for incremental JSON completeness detection of streamed tool call arguments.
+
+This module checks that the IncrementalJSONScanner reports completion exactly when
+the streamed arguments become parseable, however the text is fragmented.
+"""
+
+import json
+import sys
+import random
+
+from agentpress.json_scanner import IncrementalJSONScanner
+
+ARGUMENTS = json.dumps({
+    "file_path": "src/app.py",
+    "file_contents": 'def main():\n    print("{[ not structure ]}", \'\\\\\')\n    return {"a": [1, 2, {"b": null}]}\n',
+    "permissions": "644",
+    "nested": {"list": [{"x": '\\"quoted\\"'}, [], {}], "unicode": "é中"}
+})
+
+
+def _feed_in_pieces(text, sizes):
+    scanner = IncrementalJSONScanner()
+    pos = 0
+    completed_at = None
+    for size in sizes:
+        scanner.feed(text[pos:pos + size])
+        pos += size
+        if scanner.complete and completed_at is None:
+            completed_at = pos
+    scanner.feed(text[pos:])
+    if scanner.complete and completed_at is None:
+        completed_at = len(text)
+    return scanner, completed_at
+
+
+def test_complete_only_at_end():
+    """Completion is reported when, and only when, the closing brace arrives."""
+    scanner, completed_at = _feed_in_pieces(ARGUMENTS, [1] * len(ARGUMENTS))
+    assert scanner.complete
+    assert not scanner.invalid
+    assert completed_at == len(ARGUMENTS)
+
+
+def test_random_fragmentation_matches_json_loads():
+    """After every fragment, completeness agrees with whether json.loads succeeds."""
+    rng = random.Random(7)
+    for _ in range(30):
+        scanner = IncrementalJSONScanner()
+        pos = 0
+        while pos < len(ARGUMENTS):
+            size = rng.randint(1, 9)
+            scanner.feed(ARGUMENTS[pos:pos + size])
+            pos += size
+            try:
+                json.loads(ARGUMENTS[:pos])
+                parseable = True
+            except json.JSONDecodeError:
+                parseable = False
+            assert scanner.complete == parseable, f"Mismatch after {pos} characters"
+
+
+def test_escape_split_across_fragments():
+    """A backslash at the end of a fragment escapes the first character of the next."""
+    scanner = IncrementalJSONScanner()
+    assert not scanner.feed('{"a": "x\\')
+    assert not scanner.feed('"}')
+    assert scanner.feed('"}')
+
+
+def test_trailing_content_is_invalid():
+    """Non-whitespace after the top-level value marks the arguments invalid."""
+    scanner = IncrementalJSONScanner()
+    assert scanner.feed('{"a": 1}')
+    assert scanner.feed("  \n")
+    assert not scanner.feed("{")
+    assert scanner.invalid
+
+
+def test_scalar_is_left_to_final_parse():
+    """Top-level scalars are not detected structurally."""
+    scanner = IncrementalJSONScanner()
+    assert not scanner.feed("  42")
+    assert scanner.invalid
+
+
+if __name__ == "__main__":
+    try:
+        test_complete_only_at_end()
+        test_random_fragmentation_matches_json_loads()
+        test_escape_split_across_fragments()
+        test_trailing_content_is_invalid()
+        test_scalar_is_left_to_final_parse()
+        print("\n✅ JSON scanner tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,82 @@
+"""
+Tests for cursor-based incremental message fetching.
+
+Checks that ThreadManager.get_messages_since returns only the LLM messages
+after the cursor, in sequence order, with the cursor to use next time.
+"""
+
+import sys
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from agentpress.thread_manager import ThreadManager
+
+
+class _FakeRPC:
+    """Just enough of get_llm_formatted_messages_since over an in-memory table."""
+
+    def __init__(self, rows, params):
+        self.rows = rows
+        self.params = params
+
+    async def execute(self):
+        cursor = self.params['p_cursor']
+        data = [
+            {"seq": row["seq"], "message": row["content"]}
+            for row in sorted(self.rows, key=lambda row: row["seq"])
+            if row["thread_id"] == self.params['p_thread_id'] and row["is_llm_message"] and row["seq"] > cursor
+        ]
+        return SimpleNamespace(data=data)
+
+
+class _FakeDB:
+    def __init__(self):
+        self.rows = []
+        self.calls = []
+
+    def add(self, thread_id, content, is_llm_message=True):
+        seq = 1 + max([row["seq"] for row in self.rows if row["thread_id"] == thread_id], default=0)
+        self.rows.append({"thread_id": thread_id, "seq": seq, "content": content, "is_llm_message": is_llm_message})
+
+    @property
+    async def client(self):
+        def rpc(name, params):
+            self.calls.append((name, params))
+            return _FakeRPC(self.rows, params)
+        return SimpleNamespace(rpc=rpc)
+
+
+@pytest.mark.asyncio
+async def test_get_messages_since_cursor():
+    """Each fetch returns only messages newer than the cursor."""
+    thread_manager = ThreadManager()
+    thread_manager.db = db = _FakeDB()
+    db.add("thread-1", {"role": "user", "content": "hi"})
+    db.add("thread-1", {"role": "assistant", "content": "hello"})
+    db.add("thread-1", {"type": "status"}, is_llm_message=False)
+    db.add("thread-2", {"role": "user", "content": "other thread"})
+
+    messages, cursor = await thread_manager.get_messages_since("thread-1")
+    assert [m["content"] for m in messages] == ["hi", "hello"] and cursor == 2
+
+    messages, cursor = await thread_manager.get_messages_since("thread-1", cursor)
+    assert messages == [] and cursor == 2
+
+    # Content left as a string by the JSONB migration isn't a message
+    db.add("thread-1", "not json")
+    db.add("thread-1", {"role": "assistant", "content": "again"})
+    messages, cursor = await thread_manager.get_messages_since("thread-1", cursor)
+    assert [m["content"] for m in messages] == ["again"] and cursor == 5
+    assert db.calls[-1] == ("get_llm_formatted_messages_since", {"p_thread_id": "thread-1", "p_cursor": 2})
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(test_get_messages_since_cursor())
+        print("\n✅ Message cursor tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,113 @@
+"""
+Tests for write-behind message persistence.
+
+Checks that queued messages are inserted in batches on size, on time and on
+flush, that each thread's messages are inserted in order, and that a failed
+insert is raised by the next flush.
+"""
+
+import sys
+import asyncio
+
+import pytest
+
+from agentpress.message_writer import MessageWriter
+
+
+class FakeTable:
+    """Records inserted batches; inserts take a little time, like a database."""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    async def insert(self, thread_id, rows):
+        await asyncio.sleep(0.005)
+        if self.fail:
+            raise RuntimeError("insert failed")
+        self.batches.append((thread_id, [row["n"] for row in rows]))
+
+    def rows(self, thread_id):
+        return [n for batch_thread, batch in self.batches if batch_thread == thread_id for n in batch]
+
+
+@pytest.mark.asyncio
+async def test_batches_on_size_time_and_flush():
+    """A turn's messages take a few inserts instead of one each."""
+    table = FakeTable()
+    writer = MessageWriter(table.insert, max_batch=4, max_delay=0.02)
+
+    for n in range(10):
+        await writer.write("thread-1", {"n": n})
+    # Two full batches were inserted as they filled up
+    assert table.batches == [("thread-1", [0, 1, 2, 3]), ("thread-1", [4, 5, 6, 7])]
+
+    # The rest is inserted after max_delay
+    await asyncio.sleep(0.05)
+    assert table.batches[-1] == ("thread-1", [8, 9])
+
+    # A barrier inserts what is queued without waiting for max_delay
+    await writer.write("thread-1", {"n": 10})
+    await writer.flush("thread-1")
+    assert table.rows("thread-1") == list(range(11))
+    assert writer.stats() == {"queued": 0, "queues": 0, "inserts": 4, "rows_written": 11}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writers_keep_order():
+    """Rows of each thread are inserted in the order they were queued."""
+    table = FakeTable()
+    writer = MessageWriter(table.insert, max_batch=3, max_delay=0.001)
+
+    async def add_messages(thread_id):
+        for n in range(20):
+            await writer.write(thread_id, {"n": n})
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(add_messages(f"thread-{i}") for i in range(3)))
+    for i in range(3):
+        await writer.flush(f"thread-{i}")
+        assert table.rows(f"thread-{i}") == list(range(20))
+    assert writer.inserts < 60
+
+
+@pytest.mark.asyncio
+async def test_failed_insert_raised_by_flush():
+    """A failed write surfaces at the next barrier, once, and its queue isn't kept."""
+    table = FakeTable(fail=True)
+    writer = MessageWriter(table.insert, max_batch=10, max_delay=0.01)
+    await writer.write("thread-1", {"n": 0})
+    await asyncio.sleep(0.03)
+    assert writer.stats()["queues"] == 0
+
+    with pytest.raises(RuntimeError):
+        await writer.flush("thread-1")
+    await writer.flush("thread-1")
+
+
+
+@pytest.mark.asyncio
+async def test_idle_queues_dropped():
+    """Threads only written on the timer or size paths don't keep their queue."""
+    table = FakeTable()
+    writer = MessageWriter(table.insert, max_batch=2, max_delay=0.01)
+    for i in range(10):
+        await writer.write(f"thread-{i}", {"n": 0})
+    await writer.write("thread-full", {"n": 0})
+    await writer.write("thread-full", {"n": 1})
+    await asyncio.sleep(0.05)
+
+    assert writer.stats() == {"queued": 0, "queues": 0, "inserts": 11, "rows_written": 12}
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(test_batches_on_size_time_and_flush())
+        asyncio.run(test_concurrent_writers_keep_order())
+        asyncio.run(test_failed_insert_raised_by_flush())
+        asyncio.run(test_idle_queues_dropped())
+        print("\n✅ Message writer tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,122 @@
+"""
+Tests for the process-wide sandbox handle cache.
+
+Checks that the tools of a run share one sandbox fetch and one preview link
+lookup per port, that concurrent lookups share a fetch, that handles are
+refetched after expiry, invalidation, or when the sandbox wasn't running, that
+fresh lookups see a sandbox's current state, and that fetch locks don't pile up.
+"""
+
+import sys
+import time
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+from agent.tools.utils.sandbox_cache import SandboxHandleCache
+
+
+class FakeDaytona:
+    """Counts sandbox fetches and preview link lookups."""
+
+    def __init__(self, state="started"):
+        self.state = state
+        self.fetches = 0
+        self.links = 0
+        self._lock = threading.Lock()
+
+    def get_current_sandbox(self, sandbox_id):
+        with self._lock:
+            self.fetches += 1
+        time.sleep(0.01)
+        return SimpleNamespace(id=sandbox_id, instance=SimpleNamespace(state=self.state), get_preview_link=self.preview_link)
+
+    def preview_link(self, port):
+        self.links += 1
+        return f"https://{port}.preview"
+
+
+def _cache(daytona, ttl=300.0):
+    return SandboxHandleCache(daytona.get_current_sandbox, ttl=ttl, is_running=lambda s: s.instance.state == "started")
+
+
+def test_run_shares_one_handle():
+    """Five tool constructions fetch the sandbox once and each preview link once."""
+    daytona = FakeDaytona()
+    cache = _cache(daytona)
+
+    def construct_tool():
+        handle = cache.get("sandbox-1")
+        return handle, [handle.preview_link(port) for port in (8000, 6080, 8080)]
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        handles = [handle for handle, _ in pool.map(lambda _: construct_tool(), range(5))]
+
+    assert daytona.fetches == 1 and daytona.links == 3
+    assert all(handle is handles[0] for handle in handles)
+    assert cache.stats()["misses"] == 1 and cache.stats()["fetching"] == 0
+
+
+def test_expiry_and_invalidation():
+    """Expired or invalidated handles are fetched again."""
+    daytona = FakeDaytona()
+    cache = _cache(daytona, ttl=0.05)
+    cache.get("sandbox-1")
+    cache.get("sandbox-1")
+    assert daytona.fetches == 1
+
+    time.sleep(0.06)
+    cache.get("sandbox-1")
+    assert daytona.fetches == 2
+
+    cache.invalidate("sandbox-1")
+    cache.get("sandbox-1")
+    assert daytona.fetches == 3
+
+
+def test_stopped_sandbox_not_cached():
+    """A stopped sandbox is about to be started, so it's fetched again next time."""
+    daytona = FakeDaytona(state="stopped")
+    cache = _cache(daytona)
+    cache.get("sandbox-1")
+    daytona.state = "started"
+    assert cache.get("sandbox-1").sandbox.instance.state == "started"
+    cache.get("sandbox-1")
+    assert daytona.fetches == 2
+
+
+def test_fresh_lookup_sees_current_state():
+    """A sandbox that stopped while its handle was cached is seen stopped by a fresh lookup."""
+    daytona = FakeDaytona()
+    cache = _cache(daytona)
+    cache.get("sandbox-1")
+    daytona.state = "stopped"
+    assert cache.get("sandbox-1").sandbox.instance.state == "started"
+
+    assert cache.get("sandbox-1", fresh=True).sandbox.instance.state == "stopped"
+    assert cache.stats()["entries"] == 0
+    cache.get("sandbox-1")
+    assert daytona.fetches == 3
+
+
+def test_fetch_locks_dropped():
+    """Fetch locks only exist while a fetch is in progress."""
+    daytona = FakeDaytona()
+    cache = _cache(daytona)
+    for i in range(50):
+        cache.get(f"sandbox-{i}")
+    assert cache.stats()["fetching"] == 0 and cache.stats()["entries"] == 50
+
+
+if __name__ == "__main__":
+    try:
+        test_run_shares_one_handle()
+        test_expiry_and_invalidation()
+        test_stopped_sandbox_not_cached()
+        test_fresh_lookup_sees_current_state()
+        test_fetch_locks_dropped()
+        print("\n✅ Sandbox cache tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,110 @@
+"""
+Timing tests for delivery of tool results executed while the LLM is streaming.
+
+With execute_on_stream enabled, tools run in the background while the response is
+still being streamed. These tests check that each tool's status and result are
+yielded as soon as the tool finishes, even when the stream is paused or has
+already ended, rather than when the next chunk happens to arrive.
+"""
+
+import sys
+import time
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from agentpress.tool import Tool, ToolResult, xml_schema
+from agentpress.tool_registry import ToolRegistry
+from agentpress.response_processor import ResponseProcessor, ProcessorConfig
+
+TOOL_DURATION = 0.05
+STREAM_PAUSE = 0.5
+
+
+class SleepTool(Tool):
+    """Test tool that completes after a given delay."""
+
+    @xml_schema(
+        tag_name="sleep-for",
+        mappings=[{"param_name": "seconds", "node_type": "attribute", "path": "seconds"}],
+        example='<sleep-for seconds="0.1"></sleep-for>'
+    )
+    async def sleep_for(self, seconds: str) -> ToolResult:
+        await asyncio.sleep(float(seconds))
+        return self.success_response(f"slept {seconds}")
+
+
+def _chunk(content):
+    delta = SimpleNamespace(content=content, tool_calls=None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)])
+
+
+async def _paused_stream(parts):
+    """Yield content parts; a float entry pauses the stream for that many seconds."""
+    for part in parts:
+        if isinstance(part, float):
+            await asyncio.sleep(part)
+        else:
+            yield _chunk(part)
+
+
+async def _collect_with_timestamps(parts):
+    registry = ToolRegistry()
+    registry.register_tool(SleepTool)
+    processor = ResponseProcessor(registry, AsyncMock())
+    config = ProcessorConfig(xml_tool_calling=True, execute_on_stream=True, tool_execution_strategy="parallel")
+
+    start = time.monotonic()
+    events = []
+    async for event in processor.process_streaming_response(_paused_stream(parts), "thread-1", config):
+        events.append((time.monotonic() - start, event))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_result_delivered_during_stream_pause():
+    """A tool that finishes while the LLM is silent is reported before the next chunk."""
+    events = await _collect_with_timestamps([
+        f'<sleep-for seconds="{TOOL_DURATION}"></sleep-for>',
+        STREAM_PAUSE,
+        "All done.",
+    ])
+
+    result_at = next(t for t, e in events if e["type"] == "tool_result")
+    resumed_at = next(t for t, e in events if e.get("content") == "All done.")
+    print(f"\ntime to result {result_at * 1000:.0f}ms, stream resumed at {resumed_at * 1000:.0f}ms")
+
+    assert result_at < resumed_at
+    assert result_at < STREAM_PAUSE / 2, f"Result took {result_at:.3f}s, expected close to {TOOL_DURATION}s"
+
+
+@pytest.mark.asyncio
+async def test_results_delivered_in_completion_order_after_stream_end():
+    """After the last token, each remaining tool is reported as soon as it finishes."""
+    events = await _collect_with_timestamps([
+        '<sleep-for seconds="0.3"></sleep-for>',
+        f'<sleep-for seconds="{TOOL_DURATION}"></sleep-for>',
+    ])
+
+    # Results are yielded again once persisted after the stream; only the live ones matter here
+    results = [(t, e) for t, e in events if e["type"] == "tool_result"][:2]
+    statuses = [e for _, e in events if e["type"] == "tool_status" and e["status"] == "completed"]
+    assert [e["tool_index"] for _, e in results] == [1, 0]
+    assert [e["tool_index"] for e in statuses] == [1, 0]
+
+    fast_at, slow_at = results[0][0], results[1][0]
+    print(f"\nfast tool result at {fast_at * 1000:.0f}ms, slow tool result at {slow_at * 1000:.0f}ms")
+    assert fast_at < 0.2, f"Fast tool result took {fast_at:.3f}s and was held behind the slow tool"
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(test_result_delivered_during_stream_pause())
+        asyncio.run(test_results_delivered_in_completion_order_after_stream_end())
+        print("\n✅ Streaming tool delivery tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,161 @@
+"""
+Tests for the two-tier thread message cache.
+
+Checks that appended messages are served without reloading the thread, that a
+second instance is served from the shared tier and notices writes made by the
+first, that invalidation forces a reload, that a history loaded while a
+message was being added is not cached, and that token counts are kept with
+their messages.
+"""
+
+import sys
+import json
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from agentpress.thread_message_cache import ThreadMessageCache
+
+
+class FakeMessageStore:
+    """In-memory stand-in for RedisMessageStore with the same conditional writes."""
+
+    def __init__(self):
+        self.versions = {}
+        self.lists = {}
+
+    async def get_version(self, thread_id):
+        return self.versions.get(thread_id)
+
+    async def read(self, thread_id):
+        return self.versions.get(thread_id), list(self.lists.get(thread_id, []))
+
+    async def write(self, thread_id, expected, version, messages):
+        if (self.versions.get(thread_id) or "") != (expected or ""):
+            return False
+        self.versions[thread_id] = version
+        self.lists[thread_id] = list(messages)
+        return True
+
+    async def append(self, thread_id, expected, version, message):
+        if self.versions.get(thread_id) != expected:
+            return False
+        self.versions[thread_id] = version
+        self.lists.setdefault(thread_id, []).append(message)
+        return True
+
+    async def invalidate(self, thread_id, version):
+        self.versions[thread_id] = version
+        self.lists.pop(thread_id, None)
+
+
+HISTORY = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+
+
+@pytest.mark.asyncio
+async def test_appends_served_from_l1():
+    """After one load, appended messages are served from L1."""
+    cache = ThreadMessageCache(FakeMessageStore())
+    messages, _, version = await cache.get("thread-1")
+    assert messages is None
+    await cache.put("thread-1", HISTORY, version)
+
+    for i in range(25):
+        await cache.append("thread-1", {"role": "tool", "content": str(i)})
+        messages, _, _ = await cache.get("thread-1")
+        assert len(messages) == 3 + i and messages[-1]["content"] == str(i)
+
+    assert cache.stats() == {"threads": 1, "l1_hits": 25, "l2_hits": 0, "misses": 1}
+
+    # Returned messages are copies
+    messages[0]["content"] = "changed"
+    messages.append({"role": "user", "content": "not added"})
+    assert (await cache.get("thread-1"))[0][0]["content"] == "hi"
+    assert len((await cache.get("thread-1"))[0]) == 27
+
+    # L1 holds parsed messages, so hits don't deserialize the history
+    with patch.object(json, "loads", side_effect=AssertionError("deserialized on an L1 hit")):
+        await cache.get("thread-1")
+
+
+@pytest.mark.asyncio
+async def test_instances_share_l2_and_see_each_others_writes():
+    """A second instance reads from L2, and refreshes after the first one appends."""
+    store = FakeMessageStore()
+    first, second = ThreadMessageCache(store), ThreadMessageCache(store)
+    _, _, version = await first.get("thread-1")
+    await first.put("thread-1", HISTORY, version)
+
+    assert (await second.get("thread-1"))[0] == HISTORY
+    await second.get("thread-1")
+    assert second.stats()["l2_hits"] == 1 and second.stats()["l1_hits"] == 1
+
+    await first.append("thread-1", {"role": "assistant", "content": "more"})
+    messages, _, _ = await second.get("thread-1")
+    assert messages[-1]["content"] == "more" and second.stats()["l2_hits"] == 2
+
+    # Either instance can append; both tiers stay whole
+    await second.append("thread-1", {"role": "user", "content": "again"})
+    assert [m["content"] for m in (await first.get("thread-1"))[0]] == ["hi", "hello", "more", "again"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("shared", [True, False])
+async def test_invalidation_and_stale_loads(shared):
+    """Invalidated threads are reloaded; a load that raced with a write isn't cached."""
+    cache = ThreadMessageCache(FakeMessageStore() if shared else None)
+    _, _, version = await cache.get("thread-1")
+    await cache.put("thread-1", HISTORY, version)
+
+    await cache.invalidate("thread-1")
+    messages, _, version = await cache.get("thread-1")
+    assert messages is None
+
+    # A message is added while the history is being loaded from the database
+    await cache.append("thread-1", {"role": "assistant", "content": "in flight"})
+    await cache.put("thread-1", HISTORY, version)
+    assert (await cache.get("thread-1"))[0] is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("shared", [True, False])
+async def test_token_counts_kept_with_messages(shared):
+    """Stored token counts come back with their messages, from either tier."""
+    store = FakeMessageStore() if shared else None
+    cache = ThreadMessageCache(store)
+    _, _, version = await cache.get("thread-1")
+    await cache.put("thread-1", HISTORY, version, [7, None])
+    await cache.append("thread-1", {"role": "assistant", "content": "counted"}, 5)
+    await cache.append("thread-1", {"role": "assistant", "content": "not counted"})
+
+    messages, token_counts, _ = await cache.get("thread-1")
+    assert len(messages) == 4 and token_counts == [7, None, 5, None]
+
+    # Returned counts are copies
+    token_counts.append(1)
+    assert (await cache.get("thread-1"))[1] == [7, None, 5, None]
+
+    if shared:
+        assert (await ThreadMessageCache(store).get("thread-1"))[1] == [7, None, 5, None]
+
+    # Counts that don't match the messages aren't cached
+    await cache.invalidate("thread-1")
+    _, _, version = await cache.get("thread-1")
+    await cache.put("thread-1", HISTORY, version, [1])
+    assert (await cache.get("thread-1"))[1] == [None, None]
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(test_appends_served_from_l1())
+        asyncio.run(test_instances_share_l2_and_see_each_others_writes())
+        asyncio.run(test_invalidation_and_stale_loads(True))
+        asyncio.run(test_invalidation_and_stale_loads(False))
+        asyncio.run(test_token_counts_kept_with_messages(True))
+        asyncio.run(test_token_counts_kept_with_messages(False))
+        print("\n✅ Thread message cache tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,99 @@
+"""
+Tests for token accounting of thread messages.
+
+Checks that each message is tokenized once however often it is part of a
+prompt, that equal messages share a cached count, that stored counts are used
+without hashing or tokenizing their messages, and that prompts count their
+messages, images and tool schemas.
+"""
+
+import sys
+from unittest.mock import patch
+
+from agentpress.token_counter import TokenCounter, estimate_tokens, MESSAGE_OVERHEAD_TOKENS, REPLY_OVERHEAD_TOKENS, IMAGE_TOKENS
+
+
+class WordTokenizer:
+    """Counts words, and how many texts it was asked to tokenize."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return len(text.split())
+
+
+def test_messages_tokenized_once():
+    """Growing prompts only tokenize their new messages."""
+    tokenizer = WordTokenizer()
+    counter = TokenCounter(tokenizer)
+    history = []
+    for turn in range(20):
+        history.append({"role": "user", "content": f"question number {turn}"})
+        history.append({"role": "assistant", "content": "an answer", "tool_calls": [
+            {"id": f"call_{turn}", "type": "function", "function": {"name": "ls", "arguments": '{"path": "."}'}}
+        ]})
+        counter.count_prompt(history)
+
+    assert tokenizer.calls == 40
+    assert counter.stats()["misses"] == 40
+
+    # Key order doesn't matter, so a message read back from the database hits the cache
+    assert counter.count_message({"content": "question number 0", "role": "user"}) == MESSAGE_OVERHEAD_TOKENS + 4
+    assert tokenizer.calls == 40
+
+
+def test_stored_counts_used():
+    """Only messages without a stored count are hashed and tokenized."""
+    tokenizer = WordTokenizer()
+    counter = TokenCounter(tokenizer)
+    system = {"role": "system", "content": "be brief"}
+    history = [{"role": "user", "content": f"question number {i}"} for i in range(100)]
+    stored = [MESSAGE_OVERHEAD_TOKENS + 4] * len(history)
+
+    with patch.object(TokenCounter, "content_hash", wraps=TokenCounter.content_hash) as content_hash:
+        tokens = counter.count_prompt([system] + history, None, [None] + stored)
+    assert content_hash.call_count == 1 and tokenizer.calls == 1
+    assert tokens == counter.count_prompt([system] + history)
+
+    # Counts that don't line up with the messages are ignored
+    assert counter.count_prompt([system] + history, None, stored) == tokens
+
+
+def test_prompt_counts():
+    """Prompts count message text, tool calls, images and tool schemas."""
+    counter = TokenCounter(lambda text: len(text.split()))
+    messages = [
+        {"role": "system", "content": "be brief"},
+        {"role": "user", "content": [{"type": "text", "text": "what is this"}, {"type": "image_url", "image_url": {"url": "data:..."}}]},
+        {"role": "assistant", "content": None, "tool_calls": [{"function": {"name": "look", "arguments": '{"at": "image"}'}}]},
+    ]
+    tools = [{"type": "function", "function": {"name": "look", "description": "Look at something"}}]
+
+    assert counter.count_message(messages[0]) == MESSAGE_OVERHEAD_TOKENS + 3
+    assert counter.count_message(messages[1]) == MESSAGE_OVERHEAD_TOKENS + 4 + IMAGE_TOKENS
+    assert counter.count_message(messages[2]) == MESSAGE_OVERHEAD_TOKENS + 4
+    assert counter.count_prompt(messages, tools) == (
+        sum(counter.count_message(message) for message in messages) + counter.count_tools(tools) + REPLY_OVERHEAD_TOKENS
+    )
+    assert counter.count_tools(None) == 0
+
+
+def test_estimate():
+    """The fallback estimate is about four characters per token."""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a" * 400) == 100
+
+
+if __name__ == "__main__":
+    try:
+        test_messages_tokenized_once()
+        test_stored_counts_used()
+        test_prompt_counts()
+        test_estimate()
+        print("\n✅ Token counter tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
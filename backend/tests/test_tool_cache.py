@@ -0,0 +1,167 @@
+"""
+Tests for memoization of idempotent tool results.
+
+Checks that @cacheable tools are answered from the cache for repeated calls,
+that entries expire and are evicted LRU-first, and that mutating tools in the
+same cache scope invalidate cached results while other scopes are untouched,
+including results of calls that were running when the scope was invalidated.
+"""
+
+import sys
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from agentpress.tool import Tool, ToolResult, openapi_schema, cacheable
+from agentpress.tool_cache import ToolResultCache
+from agentpress.tool_registry import ToolRegistry
+from agentpress.response_processor import ResponseProcessor
+
+
+class WorkspaceTool(Tool):
+    """Test tool with a cacheable search and a mutating write."""
+
+    def __init__(self, scope: str = "sandbox:a"):
+        super().__init__()
+        self.cache_scope = scope
+        self.searches = 0
+        # Set to hold searches until released
+        self.gate = None
+
+    @openapi_schema({"type": "function", "function": {"name": "find_text", "parameters": {}}}, reads=["file:{path}*"])
+    @cacheable(ttl=60, key=["path", "pattern"])
+    async def find_text(self, path: str, pattern: str, verbose: bool = False) -> ToolResult:
+        self.searches += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        return self.success_response(f"search {self.searches}: {pattern} in {path}")
+
+    @openapi_schema({"type": "function", "function": {"name": "write_text", "parameters": {}}}, writes=["file:{path}"])
+    async def write_text(self, path: str) -> ToolResult:
+        return self.success_response(f"wrote {path}")
+
+
+def _call(name, **arguments):
+    return {"function_name": name, "arguments": arguments}
+
+
+def _processor():
+    registry = ToolRegistry()
+    registry.register_tool(WorkspaceTool)
+    processor = ResponseProcessor(registry, AsyncMock())
+    return processor, registry.get_tool("find_text")["instance"]
+
+
+@pytest.mark.asyncio
+async def test_repeated_calls_hit_cache():
+    """Identical calls, including ones differing only in non-key arguments, run the tool once."""
+    processor, tool = _processor()
+    first = await processor._execute_tool(_call("find_text", path="src", pattern="TODO"))
+    second = await processor._execute_tool(_call("find_text", pattern="TODO", path="src", verbose=True))
+    other = await processor._execute_tool(_call("find_text", path="docs", pattern="TODO"))
+
+    assert first.output == second.output == "search 1: TODO in src"
+    assert other.output == "search 2: TODO in docs"
+    assert processor.tool_cache.stats()["hits"] == 1
+    assert processor.tool_cache.stats()["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_mutating_call_invalidates_scope():
+    """A write in the same scope forces the next search to run again."""
+    processor, tool = _processor()
+    await processor._execute_tool(_call("find_text", path="src", pattern="TODO"))
+    await processor._execute_tool(_call("write_text", path="src/a.py"))
+    result = await processor._execute_tool(_call("find_text", path="src", pattern="TODO"))
+
+    assert result.output == "search 2: TODO in src"
+    assert processor.tool_cache.stats()["invalidations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_unscoped_tools_not_cached():
+    """Without a scope, results could leak between threads sharing the cache, so none are cached."""
+    registry = ToolRegistry()
+    registry.register_tool(WorkspaceTool, scope=None)
+    processor = ResponseProcessor(registry, AsyncMock())
+    await processor._execute_tool(_call("find_text", path="src", pattern="TODO"))
+    result = await processor._execute_tool(_call("find_text", path="src", pattern="TODO"))
+
+    assert result.output == "search 2: TODO in src"
+    assert processor.tool_cache.stats()["hits"] == 0 and processor.tool_cache.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_result_computed_across_invalidation_not_cached():
+    """A search that misses before a write and finishes after it isn't cached."""
+    processor, tool = _processor()
+    tool.gate = asyncio.Event()
+    search = asyncio.create_task(processor._execute_tool(_call("find_text", path="src", pattern="TODO")))
+    while tool.searches == 0:
+        await asyncio.sleep(0)
+
+    await processor._execute_tool(_call("write_text", path="src/a.py"))
+    tool.gate.set()
+    assert (await search).output == "search 1: TODO in src"
+
+    result = await processor._execute_tool(_call("find_text", path="src", pattern="TODO"))
+    assert result.output == "search 2: TODO in src"
+    assert processor.tool_cache.stats()["stale_puts"] == 1
+
+
+def test_generations_survive_forgotten_scopes():
+    """Generations stay unique when tracked scopes are dropped, so stale results stay stale."""
+    options = WorkspaceTool().find_text.tool_cache_options
+    cache = ToolResultCache(max_scopes=1)
+    arguments = {"path": "src", "pattern": "a"}
+    result = ToolResult(success=True, output="x")
+
+    generation = cache.generation("sandbox:a")
+    cache.invalidate("sandbox:a")
+    cache.invalidate("sandbox:b")
+    cache.put("sandbox:a", "find_text", arguments, options, result, generation)
+    assert cache.get("sandbox:a", "find_text", arguments, options) is None
+
+    cache.put("sandbox:a", "find_text", arguments, options, result, cache.generation("sandbox:a"))
+    assert cache.get("sandbox:a", "find_text", arguments, options) is result
+
+
+def test_scopes_ttl_and_lru():
+    """Invalidation is per scope, entries expire, and the least recently used entry is evicted."""
+    tool = WorkspaceTool()
+    options = tool.find_text.tool_cache_options
+    cache = ToolResultCache(max_entries=2)
+    result = ToolResult(success=True, output="x")
+
+    cache.put("sandbox:a", "find_text", {"path": "src", "pattern": "a"}, options, result)
+    cache.put("sandbox:b", "find_text", {"path": "src", "pattern": "a"}, options, result)
+    cache.invalidate("sandbox:a")
+    assert cache.get("sandbox:a", "find_text", {"path": "src", "pattern": "a"}, options) is None
+    assert cache.get("sandbox:b", "find_text", {"path": "src", "pattern": "a"}, options) is result
+
+    cache.put("sandbox:b", "find_text", {"path": "src", "pattern": "b"}, options, result)
+    cache.get("sandbox:b", "find_text", {"path": "src", "pattern": "a"}, options)
+    cache.put("sandbox:b", "find_text", {"path": "src", "pattern": "c"}, options, result)
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("sandbox:b", "find_text", {"path": "src", "pattern": "b"}, options) is None
+    assert cache.get("sandbox:b", "find_text", {"path": "src", "pattern": "a"}, options) is result
+
+    expired = type(options)(ttl=0)
+    cache.put("sandbox:b", "find_text", {"path": "x", "pattern": "y"}, expired, result)
+    assert cache.get("sandbox:b", "find_text", {"path": "x", "pattern": "y"}, expired) is None
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(test_repeated_calls_hit_cache())
+        asyncio.run(test_mutating_call_invalidates_scope())
+        asyncio.run(test_unscoped_tools_not_cached())
+        asyncio.run(test_result_computed_across_invalidation_not_cached())
+        test_generations_survive_forgotten_scopes()
+        test_scopes_ttl_and_lru()
+        print("\n✅ Tool cache tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
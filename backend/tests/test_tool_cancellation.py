@@ -0,0 +1,151 @@
+"""
+Tests for tool execution timeouts and cooperative cancellation.
+
+Checks that tool calls are abandoned after their configured timeout, and that a
+CancellationToken stops a response promptly: in-flight tools are cancelled,
+the LLM stream is closed and a "cancelled" finish is yielded, without leaving
+tool calls that have no result in the thread.
+"""
+
+import sys
+import time
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
+from agentpress.tool_registry import ToolRegistry
+from agentpress.response_processor import ResponseProcessor, ProcessorConfig, CancellationToken
+
+
+class SlowTool(Tool):
+    """Test tool that sleeps and records whether it was cancelled."""
+
+    cancelled = []
+
+    @openapi_schema({"type": "function", "function": {"name": "slow_task", "parameters": {}}})
+    @xml_schema(
+        tag_name="slow-task",
+        mappings=[{"param_name": "seconds", "node_type": "attribute", "path": "seconds"}]
+    )
+    async def slow_task(self, seconds: str) -> ToolResult:
+        try:
+            await asyncio.sleep(float(seconds))
+        except asyncio.CancelledError:
+            SlowTool.cancelled.append(seconds)
+            raise
+        return self.success_response(f"slept {seconds}")
+
+
+def _processor():
+    registry = ToolRegistry()
+    registry.register_tool(SlowTool)
+    SlowTool.cancelled = []
+    return ResponseProcessor(registry, AsyncMock())
+
+
+def _call(seconds):
+    return {"function_name": "slow_task", "xml_tag_name": "slow-task", "arguments": {"seconds": str(seconds)}}
+
+
+@pytest.mark.asyncio
+async def test_default_and_per_tool_timeouts():
+    """Calls over their timeout fail fast; per-tool timeouts override the default."""
+    processor = _processor()
+
+    config = ProcessorConfig(tool_timeout=0.05)
+    start = time.monotonic()
+    [(_, result)] = await processor._execute_tools([_call(5)], "parallel", config=config)
+    assert not result.success and "timed out" in result.output
+    assert time.monotonic() - start < 1
+
+    config = ProcessorConfig(tool_timeout=0.05, tool_timeouts={"slow-task": 1.0})
+    [(_, result)] = await processor._execute_tools([_call(0.1)], "parallel", config=config)
+    assert result.success
+
+
+class _ClosableStream:
+    """LLM stream stand-in that yields one chunk, then idles until closed."""
+
+    def __init__(self, content):
+        self.content = content
+        self.closed = False
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        delta = SimpleNamespace(content=self.content, tool_calls=None)
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)])
+        await asyncio.sleep(10)
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_cancellation_stops_tools_and_stream():
+    """Cancelling the token ends the response within milliseconds, not when the tool or stream finish."""
+    processor = _processor()
+    config = ProcessorConfig(xml_tool_calling=True, execute_on_stream=True, tool_execution_strategy="parallel")
+    stream = _ClosableStream('Working on it. <slow-task seconds="10"></slow-task>')
+    token = CancellationToken()
+
+    async def stop_soon():
+        await asyncio.sleep(0.1)
+        token.cancel("stop_signal")
+
+    stopper = asyncio.create_task(stop_soon())
+    start = time.monotonic()
+    events = [e async for e in processor.process_streaming_response(stream, "thread-1", config, cancellation_token=token)]
+    elapsed = time.monotonic() - start
+    await stopper
+
+    print(f"\nstopped after {elapsed * 1000:.0f}ms")
+    assert elapsed < 1
+    assert events[-1] == {"type": "finish", "finish_reason": "cancelled"}
+    assert not any(e["type"] == "tool_result" for e in events)
+    assert SlowTool.cancelled == ["10"]
+    assert stream.closed
+
+    # The streamed text is kept; nothing was persisted for the cancelled tool
+    [assistant_call] = processor.add_message.await_args_list
+    assert assistant_call.kwargs["content"]["content"].startswith("Working on it.")
+
+
+@pytest.mark.asyncio
+async def test_non_streaming_cancellation_keeps_history_valid():
+    """A cancelled non-streaming response saves its text without the unfinished tool calls."""
+    processor = _processor()
+    config = ProcessorConfig(xml_tool_calling=False, native_tool_calling=True, tool_execution_strategy="parallel")
+    tool_call = SimpleNamespace(id="call_1", function=SimpleNamespace(name="slow_task", arguments='{"seconds": "10"}'))
+    message = SimpleNamespace(content="Let me wait.", tool_calls=[tool_call])
+    response = SimpleNamespace(choices=[SimpleNamespace(finish_reason="tool_calls", message=message)])
+    token = CancellationToken()
+
+    async def stop_soon():
+        await asyncio.sleep(0.1)
+        token.cancel("stop_signal")
+
+    stopper = asyncio.create_task(stop_soon())
+    events = [e async for e in processor.process_non_streaming_response(response, "thread-1", config, cancellation_token=token)]
+    await stopper
+
+    assert events[-1] == {"type": "finish", "finish_reason": "cancelled"}
+    assert SlowTool.cancelled == ["10"]
+    [assistant_call] = processor.add_message.await_args_list
+    assert assistant_call.kwargs["content"] == {"role": "assistant", "content": "Let me wait.", "tool_calls": None}
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(test_default_and_per_tool_timeouts())
+        asyncio.run(test_cancellation_stops_tools_and_stream())
+        asyncio.run(test_non_streaming_cancellation_keeps_history_valid())
+        print("\n✅ Tool cancellation tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,160 @@
+"""
+Tests for bounded tool parallelism in the response processor.
+
+Checks the global max_parallel_tools limit, per-tool limits from ProcessorConfig
+and from the tool decorator, the queue depth and wait time reported in
+tool_status events, and that cancelled calls stop counting as queued.
+"""
+
+import sys
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
+from agentpress.tool_registry import ToolRegistry
+from agentpress.response_processor import ResponseProcessor, ProcessorConfig
+from agentpress.tool_scheduler import ToolCallScheduler
+
+STEP = 0.05
+
+
+class CountingTool(Tool):
+    """Test tool tracking how many of its calls run at once."""
+
+    running = 0
+    peak = {}
+
+    async def _run(self, name):
+        CountingTool.running += 1
+        CountingTool.peak[name] = max(CountingTool.peak.get(name, 0), CountingTool.running)
+        await asyncio.sleep(STEP)
+        CountingTool.running -= 1
+        return self.success_response(name)
+
+    @openapi_schema({"type": "function", "function": {"name": "fetch_page", "parameters": {}}})
+    @xml_schema(tag_name="fetch-page", mappings=[{"param_name": "url", "node_type": "content", "path": "."}])
+    async def fetch_page(self, url: str) -> ToolResult:
+        return await self._run("fetch_page")
+
+    @openapi_schema({"type": "function", "function": {"name": "drive_browser", "parameters": {}}}, max_concurrency=1)
+    async def drive_browser(self, action: str) -> ToolResult:
+        return await self._run("drive_browser")
+
+
+def _processor():
+    registry = ToolRegistry()
+    registry.register_tool(CountingTool)
+    CountingTool.running = 0
+    CountingTool.peak = {}
+    return ResponseProcessor(registry, AsyncMock())
+
+
+def _calls(name, count, **arguments):
+    return [{"function_name": name, "arguments": dict(arguments), "id": f"call_{i}"} for i in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_global_limit_bounds_parallel_execution():
+    """No more than max_parallel_tools calls run at once."""
+    processor = _processor()
+    config = ProcessorConfig(max_parallel_tools=2)
+    results = await processor._execute_tools(
+        _calls("fetch_page", 6, url="x"), "parallel", processor._create_concurrency_limiter(config)
+    )
+    assert len(results) == 6 and all(r.success for _, r in results)
+    assert CountingTool.peak["fetch_page"] == 2
+
+
+@pytest.mark.asyncio
+async def test_per_tool_limits_from_decorator_and_config():
+    """A tool's decorator limit applies by default; config limits apply by function or tag name."""
+    processor = _processor()
+    await processor._execute_tools(
+        _calls("drive_browser", 4, action="click"), "parallel", processor._create_concurrency_limiter(ProcessorConfig())
+    )
+    assert CountingTool.peak["drive_browser"] == 1
+
+    processor = _processor()
+    config = ProcessorConfig(tool_concurrency_limits={"fetch-page": 3})
+    calls = [dict(call, xml_tag_name="fetch-page") for call in _calls("fetch_page", 9, url="x")]
+    await processor._execute_tools(calls, "parallel", processor._create_concurrency_limiter(config))
+    assert CountingTool.peak["fetch_page"] == 3
+
+
+def _chunk(content):
+    delta = SimpleNamespace(content=content, tool_calls=None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)])
+
+
+async def _stream(content):
+    yield _chunk(content)
+
+
+@pytest.mark.asyncio
+async def test_status_events_report_queue_depth_and_wait_time():
+    """Calls started while others hold the slots report how many were ahead and how long they waited."""
+    processor = _processor()
+    config = ProcessorConfig(
+        xml_tool_calling=True,
+        execute_on_stream=True,
+        tool_execution_strategy="parallel",
+        max_parallel_tools=1
+    )
+    content = "".join(f"<fetch-page>https://example.com/{i}</fetch-page>" for i in range(3))
+
+    events = [e async for e in processor.process_streaming_response(_stream(content), "thread-1", config)]
+    started = [e for e in events if e["type"] == "tool_status" and e["status"] == "started"]
+    completed = sorted(
+        (e for e in events if e["type"] == "tool_status" and e["status"] == "completed"),
+        key=lambda e: e["tool_index"]
+    )
+
+    assert [e["queue_depth"] for e in started] == [0, 1, 2]
+    assert [e["queue_depth"] for e in completed] == [0, 1, 2]
+    waits = [e["wait_time"] for e in completed]
+    print(f"\nwait times: {waits}")
+    assert waits[0] < STEP / 2
+    assert waits[1] >= STEP * 0.8 and waits[2] >= STEP * 1.8
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("scheduled", [False, True])
+async def test_cancelled_calls_leave_queue(scheduled):
+    """Calls cancelled before or while waiting for a slot don't stay in the queue depth."""
+    processor = _processor()
+    config = ProcessorConfig(max_parallel_tools=1)
+    limiter = processor._create_concurrency_limiter(config)
+    scheduler = ToolCallScheduler(processor.tool_registry, processor._execute_tool) if scheduled else None
+    calls = _calls("fetch_page", 3, url="x")
+    tasks = [
+        processor._start_tool_execution(call, processor._create_tool_context(call, i), scheduler, limiter, config)
+        for i, call in enumerate(calls)
+    ]
+    assert limiter.queue_depth == 3
+
+    # The last call is cancelled before it runs, the second while it waits
+    # (for its slot, or for the first call when scheduled)
+    tasks[2].cancel()
+    await asyncio.sleep(STEP / 5)
+    tasks[1].cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert tasks[0].result().success
+    assert limiter.queue_depth == 0
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(test_global_limit_bounds_parallel_execution())
+        asyncio.run(test_per_tool_limits_from_decorator_and_config())
+        asyncio.run(test_status_events_report_queue_depth_and_wait_time())
+        asyncio.run(test_cancelled_calls_leave_queue(False))
+        asyncio.run(test_cancelled_calls_leave_queue(True))
+        print("\n✅ Tool concurrency tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
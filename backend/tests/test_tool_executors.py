@@ -0,0 +1,111 @@
+"""
+Tests for running blocking tool implementations in the tool thread pool.
+
+Checks that the event loop stays responsive while a blocking tool call (standing
+in for a 60 s sandbox shell command) runs, that @blocking_io overrides the tool
+class's setting, and that pool saturation is reported.
+"""
+
+import sys
+import time
+import asyncio
+import threading
+from unittest.mock import AsyncMock
+
+import pytest
+
+from agentpress.tool import Tool, ToolResult, openapi_schema, blocking_io
+from agentpress.tool_registry import ToolRegistry
+from agentpress.tool_executors import ToolThreadPool
+from agentpress.response_processor import ResponseProcessor
+
+
+class ShellTool(Tool):
+    """Test tool whose command blocks its thread, like a synchronous SDK call."""
+
+    blocking = True
+    release = threading.Event()
+
+    @openapi_schema({"type": "function", "function": {"name": "execute_command", "parameters": {}}})
+    async def execute_command(self, command: str) -> ToolResult:
+        # Returns after 60 s at the latest, or as soon as the test releases it
+        ShellTool.release.wait(60)
+        return self.success_response(f"ran {command} on {threading.current_thread().name}")
+
+    @openapi_schema({"type": "function", "function": {"name": "current_thread", "parameters": {}}})
+    @blocking_io(False)
+    async def current_thread(self) -> ToolResult:
+        return self.success_response(threading.current_thread().name)
+
+
+def _processor():
+    registry = ToolRegistry()
+    registry.register_tool(ShellTool)
+    processor = ResponseProcessor(registry, AsyncMock())
+    processor.tool_thread_pool = ToolThreadPool(max_workers=1)
+    return processor
+
+
+@pytest.mark.asyncio
+async def test_loop_stays_responsive_during_blocking_tool():
+    """A long blocking command doesn't delay other coroutines on the loop."""
+    processor = _processor()
+    ShellTool.release.clear()
+    execution = asyncio.create_task(
+        processor._execute_tool({"function_name": "execute_command", "arguments": {"command": "sleep 60"}})
+    )
+
+    # While the command runs, 10ms timers on the loop still fire on time
+    start = time.monotonic()
+    worst_lag = 0.0
+    for _ in range(20):
+        tick = time.monotonic()
+        await asyncio.sleep(0.01)
+        worst_lag = max(worst_lag, time.monotonic() - tick - 0.01)
+    print(f"\nworst loop lag while the command ran: {worst_lag * 1000:.1f}ms")
+    assert worst_lag < 0.05
+    assert not execution.done()
+    assert processor.tool_thread_pool.stats()["active"] == 1
+
+    ShellTool.release.set()
+    result = await execution
+    assert result.success and "tool-worker" in result.output
+    assert time.monotonic() - start < 5
+
+    # Methods opting out with @blocking_io(False) stay on the loop's thread
+    result = await processor._execute_tool({"function_name": "current_thread", "arguments": {}})
+    assert result.output == threading.current_thread().name
+
+
+@pytest.mark.asyncio
+async def test_saturation_is_reported():
+    """Calls submitted while every worker is busy are counted and wait for a worker."""
+    processor = _processor()
+    # Create the tool up front so its construction doesn't take a worker
+    processor.tool_registry.get_function("execute_command")
+    ShellTool.release.clear()
+    calls = [
+        asyncio.create_task(processor._execute_tool({"function_name": "execute_command", "arguments": {"command": str(i)}}))
+        for i in range(3)
+    ]
+    await asyncio.sleep(0.05)
+    stats = processor.tool_thread_pool.stats()
+    assert stats["active"] == 1 and stats["queued"] == 2
+    assert stats["saturated_submissions"] == 2
+
+    ShellTool.release.set()
+    results = await asyncio.gather(*calls)
+    assert all(result.success for result in results)
+    stats = processor.tool_thread_pool.stats()
+    assert stats["completed"] == 3 and stats["peak_active"] == 1 and stats["queued"] == 0
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(test_loop_stays_responsive_during_blocking_tool())
+        asyncio.run(test_saturation_is_reported())
+        print("\n✅ Tool executor tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,150 @@
+"""
+Tests for out-of-band storage of oversized tool outputs.
+
+Checks that outputs above ProcessorConfig.tool_output_max_chars are stored in
+the tool output store while the thread gets a head/tail preview with a handle,
+that smaller outputs are untouched, and that read_tool_output pages through the
+stored output.
+"""
+
+import sys
+import json
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from agentpress.tool import Tool, ToolResult, openapi_schema
+from agentpress.tool_registry import ToolRegistry
+from agentpress.tool_output_store import ToolOutputStore
+from agentpress.response_processor import ResponseProcessor, ProcessorConfig
+from agent.tools.tool_output_tool import ToolOutputTool
+
+
+class _FakeQuery:
+    def __init__(self, run):
+        self.run = run
+
+    async def execute(self):
+        return SimpleNamespace(data=self.run())
+
+
+class _FakeDB:
+    """Just enough of Supabase for the tool_outputs table and its read_tool_output RPC."""
+
+    def __init__(self):
+        self.rows = []
+        self.chars_read = 0
+
+    def _insert(self, row):
+        self.rows.append(row)
+        return [row]
+
+    def _read_tool_output(self, p_thread_id, p_output_id, p_offset, p_length):
+        data = []
+        for row in self.rows:
+            if row["output_id"] == p_output_id and row["thread_id"] == p_thread_id:
+                content = row["content"][p_offset:p_offset + p_length]
+                self.chars_read += len(content)
+                data.append({"content": content, "size": row["size"]})
+        return data
+
+    @property
+    async def client(self):
+        return SimpleNamespace(
+            table=lambda name: SimpleNamespace(insert=lambda row: _FakeQuery(lambda: self._insert(row))),
+            rpc=lambda name, params: _FakeQuery(lambda: getattr(self, f"_{name}")(**params))
+        )
+
+
+class ListingTool(Tool):
+    """Test tool returning an output of a requested size."""
+
+    @openapi_schema({"type": "function", "function": {"name": "list_files", "parameters": {}}})
+    async def list_files(self, count: int) -> ToolResult:
+        return self.success_response("".join(f"{i:05d}\n" for i in range(count)))
+
+
+def _processor(db):
+    registry = ToolRegistry()
+    registry.register_tool(ListingTool)
+    return ResponseProcessor(registry, AsyncMock(), tool_output_store=ToolOutputStore(db))
+
+
+@pytest.mark.asyncio
+async def test_oversized_output_replaced_by_preview():
+    """Only outputs above the limit are stored; the thread keeps head, tail and handle."""
+    db = _FakeDB()
+    processor = _processor(db)
+    config = ProcessorConfig(native_tool_calling=True, tool_output_max_chars=1000, tool_output_preview_chars=120)
+
+    for count in (10, 5000):
+        call = {"function_name": "list_files", "arguments": {"count": count}, "id": f"call_{count}"}
+        result = await processor._execute_tool(call)
+        await processor._add_tool_result("thread-1", call, result, config=config)
+
+    small, large = [c.kwargs["content"]["content"] for c in processor.add_message.await_args_list]
+    assert small == "".join(f"{i:05d}\n" for i in range(10))
+
+    [row] = db.rows
+    assert row["thread_id"] == "thread-1" and row["size"] == 30000
+    assert len(large) < 400
+    assert large.startswith("00000\n") and large.endswith("04999\n")
+    assert row["output_id"] in large and "read_tool_output" in large
+
+
+@pytest.mark.asyncio
+async def test_read_tool_output_pages():
+    """The stored output can be read back in pages, only from its own thread."""
+    db = _FakeDB()
+    store = ToolOutputStore(db)
+    await store.offload("thread-1", "list_files", "x" * 25000, 100)
+    output_id = db.rows[0]["output_id"]
+
+    tool = ToolOutputTool(thread_id="thread-1", store=store)
+    first = json.loads((await tool.read_tool_output(output_id)).output)
+    assert len(first["content"]) == 10000 and first["next_offset"] == 10000
+
+    last = json.loads((await tool.read_tool_output(output_id, offset=20000)).output)
+    assert len(last["content"]) == 5000 and last["next_offset"] is None and last["size"] == 25000
+
+    # Pages are read as ranges, not by fetching the whole output each time
+    assert db.chars_read == 15000
+
+    other_thread = ToolOutputTool(thread_id="thread-2", store=store)
+    assert not (await other_thread.read_tool_output(output_id)).success
+
+
+@pytest.mark.asyncio
+async def test_pages_larger_than_threshold_not_offloaded_again():
+    """A page above tool_output_max_chars reaches the thread in full."""
+    db = _FakeDB()
+    store = ToolOutputStore(db)
+    await store.offload("thread-1", "list_files", "x" * 100000, 100)
+    output_id = db.rows[0]["output_id"]
+
+    registry = ToolRegistry()
+    registry.register_tool(ToolOutputTool, thread_id="thread-1", store=store)
+    processor = ResponseProcessor(registry, AsyncMock(), tool_output_store=store)
+    config = ProcessorConfig(native_tool_calling=True, tool_output_max_chars=20000, tool_output_preview_chars=2000)
+
+    call = {"function_name": "read_tool_output", "arguments": {"output_id": output_id, "length": 40000}, "id": "call_read"}
+    result = await processor._execute_tool(call)
+    await processor._add_tool_result("thread-1", call, result, config=config)
+
+    [message] = [c.kwargs["content"]["content"] for c in processor.add_message.await_args_list]
+    assert len(json.loads(message)["content"]) == 40000
+    assert len(db.rows) == 1
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(test_oversized_output_replaced_by_preview())
+        asyncio.run(test_read_tool_output_pages())
+        asyncio.run(test_pages_larger_than_threshold_not_offloaded_again())
+        print("\n✅ Tool output store tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
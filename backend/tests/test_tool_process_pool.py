@@ -0,0 +1,128 @@
+"""
+Tests for running CPU-bound tools in the tool process pool.
+
+Checks that a tool declared with executor="process" runs in a worker process
+without stalling the event loop, that calls which can't be pickled fail without
+being sent, and that a dying worker fails its call and the pool recovers.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+from unittest.mock import AsyncMock
+
+import pytest
+
+from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
+from agentpress.tool_registry import ToolRegistry
+from agentpress.tool_executors import ToolProcessPool
+from agentpress.response_processor import ResponseProcessor
+
+
+class DiffTool(Tool):
+    """Test tool doing CPU-bound work, standing in for diffing or compression."""
+
+    @openapi_schema({"type": "function", "function": {"name": "checksum", "parameters": {}}}, executor="process")
+    async def checksum(self, rounds: int) -> ToolResult:
+        total = 0
+        for i in range(rounds):
+            total = (total * 31 + i) % 1000003
+        return self.success_response({"checksum": total, "pid": os.getpid()})
+
+    @xml_schema(tag_name="crash", executor="process")
+    def crash(self) -> ToolResult:
+        os._exit(1)
+
+
+class LockedTool(Tool):
+    """Test tool holding state that can't be pickled."""
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+
+    @openapi_schema({"type": "function", "function": {"name": "locked", "parameters": {}}}, executor="process")
+    async def locked(self) -> ToolResult:
+        return self.success_response("unreachable")
+
+
+def _processor():
+    registry = ToolRegistry()
+    registry.register_tool(DiffTool)
+    registry.register_tool(LockedTool)
+    processor = ResponseProcessor(registry, AsyncMock())
+    processor.tool_process_pool = ToolProcessPool(max_workers=1)
+    return processor
+
+
+@pytest.mark.asyncio
+async def test_cpu_bound_tool_runs_in_worker_process():
+    """The work runs in another process while timers on the loop keep firing."""
+    processor = _processor()
+    try:
+        # Warm up the worker so process start-up isn't measured
+        await processor._execute_tool({"function_name": "checksum", "arguments": {"rounds": 1}})
+
+        execution = asyncio.create_task(
+            processor._execute_tool({"function_name": "checksum", "arguments": {"rounds": 3_000_000}})
+        )
+        worst_lag = 0.0
+        while not execution.done():
+            start = time.monotonic()
+            await asyncio.sleep(0.01)
+            worst_lag = max(worst_lag, time.monotonic() - start - 0.01)
+
+        result = execution.result()
+        assert result.success, result.output
+        assert result.data["pid"] != os.getpid()
+        assert worst_lag < 0.1
+        assert processor.tool_process_pool.stats()["completed"] == 2
+    finally:
+        processor.tool_process_pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_unpicklable_call_fails_without_worker():
+    """A tool instance that can't be pickled gets an error result."""
+    processor = _processor()
+    try:
+        result = await processor._execute_tool({"function_name": "locked", "arguments": {}})
+        assert not result.success and "can't run in a worker process" in result.output
+    finally:
+        processor.tool_process_pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_worker_crash_fails_call_and_pool_recovers():
+    """A dying worker fails its call; later calls run on a fresh pool."""
+    processor = _processor()
+    try:
+        crashed = await processor._execute_tool({"function_name": "crash", "xml_tag_name": "crash", "arguments": {}})
+        assert not crashed.success and "worker process died" in crashed.output
+
+        result = await processor._execute_tool({"function_name": "checksum", "arguments": {"rounds": 10}})
+        assert result.success, result.output
+        assert processor.tool_process_pool.stats()["crashes"] == 1
+    finally:
+        processor.tool_process_pool.shutdown()
+
+
+def test_unknown_executor_rejected():
+    """Only the thread and process executors can be declared."""
+    with pytest.raises(ValueError):
+        openapi_schema({"type": "function", "function": {"name": "f", "parameters": {}}}, executor="gpu")(lambda: None)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(test_cpu_bound_tool_runs_in_worker_process())
+        asyncio.run(test_unpicklable_call_fails_without_worker())
+        asyncio.run(test_worker_crash_fails_call_and_pool_recovers())
+        test_unknown_executor_rejected()
+        print("\n✅ Tool process pool tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,100 @@
+"""
+Tests for streaming tools that yield progress before their result.
+
+Checks that progress chunks of async-generator tools, on the event loop or in
+the tool thread pool, are streamed as tool_progress events while the tool runs
+and before its result, and that only the final ToolResult is persisted.
+"""
+
+import sys
+import time
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from agentpress.tool import Tool, ToolResult, xml_schema, blocking_io
+from agentpress.tool_registry import ToolRegistry
+from agentpress.response_processor import ResponseProcessor, ProcessorConfig
+
+STEP = 0.05
+
+
+class CountdownTool(Tool):
+    """Test tool reporting each step of a countdown as progress."""
+
+    @xml_schema(tag_name="countdown", mappings=[{"param_name": "steps", "node_type": "attribute", "path": "steps"}])
+    async def countdown(self, steps: str):
+        for step in range(int(steps), 0, -1):
+            yield f"{step}..."
+            await asyncio.sleep(STEP)
+        yield self.success_response("liftoff")
+
+    @xml_schema(tag_name="blocking-countdown", mappings=[{"param_name": "steps", "node_type": "attribute", "path": "steps"}])
+    @blocking_io()
+    async def blocking_countdown(self, steps: str):
+        for step in range(int(steps), 0, -1):
+            yield {"remaining": step}
+            time.sleep(STEP)
+        yield self.success_response("liftoff")
+
+
+def _chunk(content):
+    delta = SimpleNamespace(content=content, tool_calls=None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)])
+
+
+async def _stream(content):
+    yield _chunk(content)
+
+
+def _processor():
+    registry = ToolRegistry()
+    registry.register_tool(CountdownTool)
+    return ResponseProcessor(registry, AsyncMock())
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tag, first_chunk", [("countdown", "3..."), ("blocking-countdown", {"remaining": 3})])
+async def test_progress_streamed_before_result(tag, first_chunk):
+    """Progress arrives while the tool runs; the result follows the last chunk."""
+    processor = _processor()
+    config = ProcessorConfig(xml_tool_calling=True, execute_on_stream=True, tool_execution_strategy="parallel")
+
+    start = time.monotonic()
+    events = []
+    async for event in processor.process_streaming_response(_stream(f'<{tag} steps="3"></{tag}>'), "thread-1", config):
+        events.append((time.monotonic() - start, event))
+
+    progress = [(t, e) for t, e in events if e["type"] == "tool_progress"]
+    result_at, result = next((t, e) for t, e in events if e["type"] == "tool_result")
+    assert len(progress) == 3
+    assert progress[0][1]["content"] == first_chunk and progress[0][1]["xml_tag_name"] == tag
+    assert progress[0][0] < STEP < result_at
+    assert all(t <= result_at for t, _ in progress)
+    assert "liftoff" in result["result"]
+
+    # Only the final result is persisted
+    persisted = [call.kwargs["content"] for call in processor.add_message.await_args_list]
+    assert not any("remaining" in str(content) or "3..." in str(content) for content in persisted)
+
+
+@pytest.mark.asyncio
+async def test_streaming_tool_without_consumer():
+    """Outside a streamed response, a streaming tool just produces its result."""
+    processor = _processor()
+    result = await processor._execute_tool({"function_name": "countdown", "xml_tag_name": "countdown", "arguments": {"steps": "2"}})
+    assert result.success and result.output == "liftoff"
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(test_progress_streamed_before_result("countdown", "3..."))
+        asyncio.run(test_progress_streamed_before_result("blocking-countdown", {"remaining": 3}))
+        asyncio.run(test_streaming_tool_without_consumer())
+        print("\n✅ Tool progress tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
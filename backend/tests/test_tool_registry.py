@@ -0,0 +1,187 @@
+"""
+Tests for the ToolRegistry dispatch map, cached schema views and per-run views.
+
+Checks that function lookups, OpenAPI schemas (including their JSON form) and
+XML examples are precomputed on registration, that the registry version bumps
+so dependent caches rebuild, that a single lookup is cheap, and that registry
+views bind their own tool instances while sharing tool definitions, created
+only when one of their functions is first called.
+"""
+
+import sys
+import json
+import time
+import asyncio
+from unittest.mock import AsyncMock
+
+from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
+from agentpress.tool_registry import ToolRegistry, ToolDefinition
+from agentpress.response_processor import ResponseProcessor
+
+
+class EchoTool(Tool):
+    """Test tool registered under both OpenAPI and XML schemas."""
+
+    @openapi_schema({"type": "function", "function": {"name": "echo", "parameters": {}}})
+    @xml_schema(
+        tag_name="echo",
+        mappings=[{"param_name": "text", "node_type": "content", "path": "."}],
+        example="<echo>hello</echo>"
+    )
+    async def echo(self, text: str) -> ToolResult:
+        return self.success_response(text)
+
+
+class ShoutTool(Tool):
+    """Second test tool, registered later to bump the registry version."""
+
+    @xml_schema(tag_name="shout", mappings=[{"param_name": "text", "node_type": "content", "path": "."}])
+    async def shout(self, text: str) -> ToolResult:
+        return self.success_response(text.upper())
+
+
+def test_dispatch_map_and_cached_schemas():
+    """Lookups and schema views come from caches rebuilt only on registration."""
+    registry = ToolRegistry()
+    registry.register_tool(EchoTool)
+    version = registry.version
+
+    echo = registry.get_function("echo")
+    assert echo.__self__ is registry.get_tool("echo")["instance"]
+    assert registry.get_function("missing") is None
+    assert registry.get_available_functions()["echo"] == echo
+
+    schemas = registry.get_openapi_schemas()
+    assert json.loads(registry.get_openapi_schemas_json()) == schemas
+    assert registry.get_xml_examples()["echo"] == "<echo>hello</echo>"
+
+    # Callers get their own lists, so they can't change the shared cached views
+    schemas.append({"type": "function", "function": {"name": "injected"}})
+    registry.get_xml_examples().clear()
+    assert len(registry.get_openapi_schemas()) == len(schemas) - 1
+    assert registry.view().get_openapi_schemas() == schemas[:-1]
+    assert registry.get_xml_examples()["echo"] == "<echo>hello</echo>"
+
+    processor = ResponseProcessor(registry, AsyncMock())
+    automaton = processor._create_xml_scanner().automaton
+    assert processor._create_xml_scanner().automaton is automaton
+
+    registry.register_tool(ShoutTool)
+    assert registry.version > version
+    assert registry.get_function("shout") is not None
+    assert "shout" in processor._create_xml_scanner().automaton.tag_names
+
+
+class SandboxTool(Tool):
+    """Test tool bound to a sandbox id at registration."""
+
+    def __init__(self, sandbox_id: str):
+        super().__init__()
+        self.sandbox_id = sandbox_id
+
+    @xml_schema(tag_name="where", mappings=[])
+    async def where(self) -> ToolResult:
+        return self.success_response(self.sandbox_id)
+
+
+def test_views_isolate_runs():
+    """Views start from the base tools, bind their own instances and share definitions."""
+    base = ToolRegistry()
+    base.register_tool(EchoTool)
+
+    run_a, run_b = base.view(), base.view()
+    run_a.register_tool(SandboxTool, sandbox_id="a")
+    run_b.register_tool(SandboxTool, sandbox_id="b")
+
+    assert run_a.get_function("where").__self__.sandbox_id == "a"
+    assert run_b.get_function("where").__self__.sandbox_id == "b"
+    assert base.get_function("where") is None
+    assert run_a.get_function("echo") == base.get_function("echo")
+
+    assert run_a.get_xml_tool("where")["plan"] is run_b.get_xml_tool("where")["plan"]
+    assert ToolDefinition.for_class(SandboxTool) is ToolDefinition.for_class(SandboxTool)
+    assert run_a.get_openapi_schemas_json() is run_b.get_openapi_schemas_json()
+
+
+def test_lookup_cost():
+    """Single lookups don't scale with the number of registered tools."""
+    registry = ToolRegistry()
+    registry.register_tool(EchoTool)
+    registry.register_tool(ShoutTool)
+
+    iterations = 20000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        registry.get_function("echo")
+    lookup = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        registry.get_available_functions().get("echo")
+    copy = (time.perf_counter() - start) / iterations
+
+    print(f"\nget_function: {lookup * 1e9:.0f}ns, get_available_functions: {copy * 1e9:.0f}ns")
+    assert lookup < copy
+
+
+class RemoteTool(Tool):
+    """Test tool whose constructor does a (counted) remote lookup, like the sandbox tools."""
+
+    blocking = True
+    lookups = 0
+
+    def __init__(self, sandbox_id: str):
+        super().__init__()
+        RemoteTool.lookups += 1
+        self.sandbox_id = sandbox_id
+
+    @classmethod
+    def normalize_resource_value(cls, value: str) -> str:
+        return value.removeprefix("./")
+
+    @openapi_schema({"type": "function", "function": {"name": "where", "parameters": {}}})
+    async def where(self) -> ToolResult:
+        return self.success_response(self.sandbox_id)
+
+    @openapi_schema({"type": "function", "function": {"name": "touch", "parameters": {}}}, writes=["file:{path}"])
+    async def touch(self, path: str) -> ToolResult:
+        return self.success_response(path)
+
+
+def test_tools_created_on_first_call():
+    """Registration records the class; the instance is created once, on first call."""
+    RemoteTool.lookups = 0
+    registry = ToolRegistry()
+    registry.register_tool(RemoteTool, sandbox_id="sandbox-1")
+    registry.register_tool(EchoTool)
+    assert RemoteTool.lookups == 0
+    assert [schema["function"]["name"] for schema in registry.get_openapi_schemas()] == ["touch", "where", "echo"]
+    assert registry.get_unbound_tool_class("where") is RemoteTool
+
+    # Scheduling resolves resource keys without creating the tool
+    assert registry.get_resource_keys("touch", {"path": "./a.txt"}) == (frozenset(), frozenset({"file:a.txt"}))
+    assert RemoteTool.lookups == 0
+
+    processor = ResponseProcessor(registry, AsyncMock())
+    for _ in range(3):
+        result = asyncio.run(processor._execute_tool({"function_name": "where", "arguments": {}}))
+        assert result.output == "sandbox-1"
+    assert RemoteTool.lookups == 1
+    assert registry.get_unbound_tool_class("where") is None
+
+    # Views share the instance created so far
+    assert registry.view().get_function("where").__self__ is registry.get_function("where").__self__
+    assert RemoteTool.lookups == 1
+
+
+if __name__ == "__main__":
+    try:
+        test_dispatch_map_and_cached_schemas()
+        test_views_isolate_runs()
+        test_lookup_cost()
+        test_tools_created_on_first_call()
+        print("\n✅ Tool registry tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,152 @@
+"""
+Tests and size benchmark for the compact tool result encoding.
+
+Checks that compact encoding keeps the result content while dropping the
+ToolResult repr and JSON whitespace, that keys can be abbreviated, and compares
+the size of representative sandbox tool outputs in both encodings, in
+characters and, when a tokenizer is available, in tokens.
+"""
+
+import sys
+import json
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from agentpress.tool import Tool, ToolResult, openapi_schema
+from agentpress.tool_registry import ToolRegistry
+from agentpress.tool_result_encoding import encode_compact, abbreviate_keys
+from agentpress.response_processor import ResponseProcessor, ProcessorConfig
+
+# Representative outputs of the sandbox tools
+SANDBOX_OUTPUTS = {
+    "execute_command": {
+        "output": "total 24\ndrwxr-xr-x 3 root root 4096 .\n-rw-r--r-- 1 root root  220 index.html\n-rw-r--r-- 1 root root 1432 app.py\n",
+        "exit_code": 0,
+        "cwd": "/workspace",
+        "session_name": "default",
+        "completed": True,
+    },
+    "search_files": {
+        "matches": [
+            {"file": f"/workspace/src/module_{i}.py", "line": 10 * i, "content": f"def handler_{i}(request):"}
+            for i in range(20)
+        ],
+        "total": 20,
+    },
+    "workspace_state": {
+        f"src/module_{i}.py": {"content": f"print({i})\n", "is_binary": False, "size": 9, "modified": 1713180000.0 + i}
+        for i in range(15)
+    },
+    "update_website": {
+        "message": "Website updated successfully",
+        "site_name": "portfolio",
+        "deploy_url": "https://portfolio.example.com",
+        "files_uploaded": 12,
+    },
+    "browser_history": [
+        {"url": f"https://example.com/page/{i}", "title": f"Page {i}", "timestamp": f"2025-04-15T10:{i:02d}:00Z"}
+        for i in range(10)
+    ],
+    "create_file": "File 'src/app.py' created successfully.",
+}
+
+ABBREVIATIONS = {"content": "c", "modified": "m", "is_binary": "b", "size": "s"}
+
+
+def _tokenizer():
+    """Token counter if a tokenizer is available here, else None."""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+    return lambda text: len(encoding.encode(text))
+
+
+class SandboxOutputTool(Tool):
+    """Test tool returning one of the representative sandbox outputs."""
+
+    @openapi_schema({"type": "function", "function": {"name": "sandbox_output", "parameters": {}}})
+    async def sandbox_output(self, name: str) -> ToolResult:
+        return self.success_response(SANDBOX_OUTPUTS[name])
+
+
+async def _thread_content(name, config):
+    registry = ToolRegistry()
+    registry.register_tool(SandboxOutputTool)
+    processor = ResponseProcessor(registry, AsyncMock())
+    call = {"function_name": "sandbox_output", "xml_tag_name": "sandbox-output", "arguments": {"name": name}}
+    result = await processor._execute_tool(call)
+    await processor._add_tool_result("thread-1", call, result, config=config)
+    return processor.add_message.await_args.kwargs["content"]["content"]
+
+
+def test_compact_encoding_keeps_content():
+    """Compact output is minified JSON of the data; plain text outputs are unchanged."""
+    tool = SandboxOutputTool()
+    structured = tool.success_response(SANDBOX_OUTPUTS["search_files"])
+    compact = encode_compact(structured)
+    assert json.loads(compact.output) == SANDBOX_OUTPUTS["search_files"]
+    assert "\n" not in compact.output and ", " not in compact.output
+
+    text = tool.success_response("File created.")
+    assert encode_compact(text).output == "File created."
+    assert "data=" not in repr(structured)
+
+
+def test_abbreviate_keys():
+    """Keys are renamed at any depth; values are left alone."""
+    value = {"content": [{"content": "content", "size": 1}], "other": {"size": 2}}
+    assert abbreviate_keys(value, {"content": "c", "size": "s"}) == {"c": [{"c": "content", "s": 1}], "other": {"s": 2}}
+
+
+@pytest.mark.asyncio
+async def test_compact_failure_marked():
+    """Failed results are marked as errors without the ToolResult repr."""
+    registry = ToolRegistry()
+    processor = ResponseProcessor(registry, AsyncMock())
+    call = {"function_name": "sandbox_output", "xml_tag_name": "sandbox-output", "arguments": {}}
+    config = ProcessorConfig(tool_result_encoding="compact")
+    await processor._add_tool_result("thread-1", call, ToolResult(success=False, output="No such file"), config=config)
+    content = processor.add_message.await_args.kwargs["content"]["content"]
+    assert content == "<sandbox-output> Error: No such file </sandbox-output>"
+
+
+@pytest.mark.asyncio
+async def test_benchmark_sandbox_outputs():
+    """Compact encoding is smaller than verbose for every representative output."""
+    count_tokens = _tokenizer()
+    verbose_config = ProcessorConfig()
+    compact_config = ProcessorConfig(tool_result_encoding="compact")
+    abbreviated_config = ProcessorConfig(tool_result_encoding="compact", tool_result_key_abbreviations=ABBREVIATIONS)
+
+    totals = {"verbose": 0, "compact": 0, "abbreviated": 0}
+    print(f"\n{'output':<18}{'verbose':>10}{'compact':>10}{'abbrev':>10}  ({'tokens' if count_tokens else 'characters'})")
+    for name in SANDBOX_OUTPUTS:
+        sizes = {}
+        for label, config in (("verbose", verbose_config), ("compact", compact_config), ("abbreviated", abbreviated_config)):
+            content = await _thread_content(name, config)
+            sizes[label] = count_tokens(content) if count_tokens else len(content)
+            totals[label] += sizes[label]
+        print(f"{name:<18}{sizes['verbose']:>10}{sizes['compact']:>10}{sizes['abbreviated']:>10}")
+
+        assert sizes["compact"] < sizes["verbose"]
+        assert sizes["abbreviated"] <= sizes["compact"]
+
+    print(f"{'total':<18}{totals['verbose']:>10}{totals['compact']:>10}{totals['abbreviated']:>10}")
+    assert totals["compact"] < 0.8 * totals["verbose"]
+
+
+if __name__ == "__main__":
+    try:
+        test_compact_encoding_keeps_content()
+        test_abbreviate_keys()
+        asyncio.run(test_compact_failure_marked())
+        asyncio.run(test_benchmark_sandbox_outputs())
+        print("\n✅ Tool result encoding tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,141 @@
+"""
+Tests for the resource-aware "auto" tool execution strategy.
+
+Tools declare the resources they read and write in their schema decorators. These
+tests check that conflicting calls are serialized in submission order, independent
+calls overlap, undeclared tools run exclusively, and results keep the original order.
+"""
+
+import sys
+import time
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from agentpress.tool import Tool, ToolResult, ToolResources, openapi_schema, xml_schema
+from agentpress.tool_registry import ToolRegistry
+from agentpress.tool_scheduler import ResourceFootprint
+from agentpress.response_processor import ResponseProcessor
+
+STEP = 0.1
+
+
+class FakeFileTool(Tool):
+    """Test tool recording when each call runs."""
+
+    def __init__(self):
+        super().__init__()
+        self.intervals = []
+
+    async def _record(self, label):
+        start = time.monotonic()
+        await asyncio.sleep(STEP)
+        self.intervals.append((label, start, time.monotonic()))
+        return self.success_response(label)
+
+    @openapi_schema({"type": "function", "function": {"name": "edit_file", "parameters": {}}}, writes=["file:{file_path}"])
+    async def edit_file(self, file_path: str, text: str) -> ToolResult:
+        return await self._record(f"edit {file_path} {text}")
+
+    @openapi_schema({"type": "function", "function": {"name": "read_dir", "parameters": {}}}, reads=["file:{path}*"])
+    async def read_dir(self, path: str) -> ToolResult:
+        return await self._record(f"read {path}")
+
+    @openapi_schema({"type": "function", "function": {"name": "run_anything", "parameters": {}}})
+    async def run_anything(self) -> ToolResult:
+        return await self._record("run")
+
+
+def _processor():
+    registry = ToolRegistry()
+    registry.register_tool(FakeFileTool)
+    tool = registry.get_tool("edit_file")["instance"]
+    return ResponseProcessor(registry, AsyncMock()), tool
+
+
+def _call(name, **arguments):
+    return {"function_name": name, "arguments": arguments, "id": f"call_{name}_{len(arguments)}"}
+
+
+def _overlaps(a, b):
+    return a[1] < b[2] and b[1] < a[2]
+
+
+def test_resource_keys_resolution():
+    """Templates expand list arguments; missing arguments make the call unresolvable."""
+    resources = ToolResources(reads=("file:{path}*",), writes=("file:{files}", "index"))
+    reads, writes = resources.resolve({"path": "src", "files": ["a.py", "b.py"]})
+    assert reads == {"file:src*"}
+    assert writes == {"file:a.py", "file:b.py", "index"}
+    assert resources.resolve({"files": ["a.py"]}) is None
+
+
+def test_footprint_conflicts():
+    """Writes conflict with any use of the same key; wildcards match by prefix."""
+    write_a = ResourceFootprint(writes=frozenset({"file:src/a.py"}))
+    write_b = ResourceFootprint(writes=frozenset({"file:src/b.py"}))
+    read_src = ResourceFootprint(reads=frozenset({"file:src*"}))
+    read_docs = ResourceFootprint(reads=frozenset({"file:docs*"}))
+
+    assert write_a.conflicts_with(write_a)
+    assert not write_a.conflicts_with(write_b)
+    assert write_a.conflicts_with(read_src) and read_src.conflicts_with(write_a)
+    assert not write_a.conflicts_with(read_docs)
+    assert not read_src.conflicts_with(read_src)
+    assert ResourceFootprint(exclusive=True).conflicts_with(ResourceFootprint())
+
+
+@pytest.mark.asyncio
+async def test_auto_serializes_conflicts_and_keeps_order():
+    """Edits of one file run in order, other calls overlap them, results keep call order."""
+    processor, tool = _processor()
+    tool.intervals.clear()
+    calls = [
+        _call("edit_file", file_path="a.txt", text="1"),
+        _call("edit_file", file_path="b.txt", text="1"),
+        _call("edit_file", file_path="a.txt", text="2"),
+        _call("read_dir", path="docs"),
+    ]
+
+    start = time.monotonic()
+    results = await processor._execute_tools(calls, "auto")
+    elapsed = time.monotonic() - start
+
+    assert [r.output for _, r in results] == ["edit a.txt 1", "edit b.txt 1", "edit a.txt 2", "read docs"]
+    runs = {label: (label, s, e) for label, s, e in tool.intervals}
+    assert runs["edit a.txt 1"][2] <= runs["edit a.txt 2"][1], "Edits of the same file must not overlap"
+    assert _overlaps(runs["edit a.txt 1"], runs["edit b.txt 1"])
+    assert _overlaps(runs["edit a.txt 1"], runs["read docs"])
+    print(f"\nauto: {elapsed * 1000:.0f}ms for {len(calls)} calls of {STEP * 1000:.0f}ms")
+    assert elapsed < 3 * STEP
+
+
+@pytest.mark.asyncio
+async def test_undeclared_tool_runs_exclusively():
+    """A tool without resource declarations never overlaps another call."""
+    processor, tool = _processor()
+    tool.intervals.clear()
+    calls = [
+        _call("edit_file", file_path="a.txt", text="1"),
+        _call("run_anything"),
+        _call("edit_file", file_path="b.txt", text="1"),
+    ]
+    await processor._execute_tools(calls, "auto")
+
+    runs = {label: (label, s, e) for label, s, e in tool.intervals}
+    assert runs["edit a.txt 1"][2] <= runs["run"][1]
+    assert runs["run"][2] <= runs["edit b.txt 1"][1]
+
+
+if __name__ == "__main__":
+    try:
+        test_resource_keys_resolution()
+        test_footprint_conflicts()
+        asyncio.run(test_auto_serializes_conflicts_and_keeps_order())
+        asyncio.run(test_undeclared_tool_runs_exclusively())
+        print("\n✅ Tool scheduler tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
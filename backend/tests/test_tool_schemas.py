@@ -0,0 +1,93 @@
+"""
+Tests for class-level schema discovery of Tool subclasses.
+
+Checks that schemas are discovered once per class (including inherited and
+overridden methods), that instances share them, and benchmarks the schema
+part of constructing the sandbox tools against per-instance discovery.
+"""
+
+import sys
+import time
+import inspect
+
+import pytest
+
+from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
+from utils.logger import logger
+
+
+class BaseTool(Tool):
+    """Test tool with one decorated method."""
+
+    @openapi_schema({"type": "function", "function": {"name": "read", "parameters": {}}})
+    async def read(self) -> ToolResult:
+        return self.success_response("read")
+
+    async def helper(self) -> str:
+        return "not a tool"
+
+
+class DerivedTool(BaseTool):
+    """Test tool inheriting one tool method and adding another."""
+
+    @xml_schema(tag_name="write", mappings=[])
+    async def write(self) -> ToolResult:
+        return self.success_response("write")
+
+
+def test_schemas_discovered_per_class():
+    """Each class has its own schemas, including inherited ones; instances share them."""
+    assert set(BaseTool.get_class_schemas()) == {"read"}
+    assert set(DerivedTool.get_class_schemas()) == {"read", "write"}
+    assert DerivedTool().get_schemas() is DerivedTool().get_schemas() is DerivedTool.get_class_schemas()
+
+
+def _discover_per_instance(tool):
+    """Tool.__init__ as it was before class-level discovery, for comparison."""
+    schemas = {}
+    logger.debug(f"Initializing tool class: {tool.__class__.__name__}")
+    for name, method in inspect.getmembers(tool, predicate=inspect.ismethod):
+        if hasattr(method, 'tool_schemas'):
+            schemas[name] = method.tool_schemas
+            logger.debug(f"Registered schemas for method '{name}' in {tool.__class__.__name__}")
+    return schemas
+
+
+def test_sandbox_tool_construction_benchmark():
+    """Constructing the sandbox tools no longer walks their members."""
+    sandbox_tools = [
+        pytest.importorskip("agent.tools.sb_browse_tool", exc_type=ImportError).SandboxBrowseTool,
+        pytest.importorskip("agent.tools.sb_website_tool", exc_type=ImportError).SandboxWebsiteTool,
+        pytest.importorskip("agent.tools.sb_shell_tool", exc_type=ImportError).SandboxShellTool,
+        pytest.importorskip("agent.tools.sb_files_tool", exc_type=ImportError).SandboxFilesTool,
+    ]
+
+    # Only Tool.__init__ is timed; SandboxToolsBase.__init__ connects to the sandbox
+    iterations = 200
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for tool_class in sandbox_tools:
+            Tool.__init__(tool_class.__new__(tool_class))
+    cached = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for tool_class in sandbox_tools:
+            _discover_per_instance(tool_class.__new__(tool_class))
+    per_instance = (time.perf_counter() - start) / iterations
+
+    print(f"\nschema setup for 4 sandbox tools: cached {cached * 1e6:.1f}us, per instance {per_instance * 1e6:.1f}us")
+    for tool_class in sandbox_tools:
+        assert tool_class.get_class_schemas() == _discover_per_instance(tool_class.__new__(tool_class))
+    assert cached < per_instance
+
+
+if __name__ == "__main__":
+    try:
+        test_schemas_discovered_per_class()
+        test_sandbox_tool_construction_benchmark()
+        print("\n✅ Tool schema tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
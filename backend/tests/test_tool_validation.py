@@ -0,0 +1,131 @@
+"""
+Tests for argument validation of tool calls before dispatch.
+
+Checks that the compiled validators report missing, mistyped, unexpected and
+out-of-enum arguments with their paths, that XML string values are converted to
+the declared types, and that invalid calls never reach the tool, nor create it.
+"""
+
+import sys
+import json
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
+from agentpress.tool_registry import ToolRegistry
+from agentpress.tool_validation import ArgumentValidator
+from agentpress.response_processor import ResponseProcessor
+
+PARAMETERS = {
+    "type": "object",
+    "properties": {
+        "file_path": {"type": "string"},
+        "create_dirs": {"type": "boolean"},
+        "mode": {"type": "string", "enum": ["w", "a"]},
+        "lines": {"type": "array", "items": {"type": "integer"}},
+        "attachments": {"anyOf": [{"type": "string"}, {"type": "array", "items": {"type": "string"}}]}
+    },
+    "required": ["file_path"],
+    "additionalProperties": False
+}
+
+
+class FileTool(Tool):
+    """Test tool counting how often it actually runs."""
+
+    calls = 0
+    created = 0
+
+    def __init__(self):
+        super().__init__()
+        FileTool.created += 1
+
+    @openapi_schema({"type": "function", "function": {"name": "write_file", "parameters": PARAMETERS}})
+    @xml_schema(
+        tag_name="write-file",
+        mappings=[
+            {"param_name": "file_path", "node_type": "attribute", "path": "@path"},
+            {"param_name": "create_dirs", "node_type": "attribute", "path": "@create_dirs", "required": False}
+        ]
+    )
+    async def write_file(self, file_path: str, create_dirs: bool = False, **kwargs) -> ToolResult:
+        FileTool.calls += 1
+        return self.success_response({"file_path": file_path, "create_dirs": create_dirs})
+
+
+def test_validator_reports_errors_with_paths():
+    """Every problem in a call is reported with the path of the offending value."""
+    validator = ArgumentValidator(PARAMETERS)
+
+    assert validator.validate({"file_path": "a.txt", "lines": [1, 2], "attachments": ["x"]}) == (
+        {"file_path": "a.txt", "lines": [1, 2], "attachments": ["x"]}, []
+    )
+
+    _, errors = validator.validate({"create_dirs": "yes", "mode": "x", "lines": [1, "2"], "extra": 1, "attachments": 3})
+    assert {e["path"] for e in errors} == {"file_path", "create_dirs", "mode", "lines[1]", "extra", "attachments"}
+
+    _, errors = validator.validate(["a.txt"])
+    assert errors == [{"path": "$", "message": "expected object, got array"}]
+
+
+def test_validator_coerces_strings():
+    """With coercion, string values are converted to the declared types where possible."""
+    validator = ArgumentValidator(PARAMETERS)
+    arguments, errors = validator.validate({"file_path": "a.txt", "create_dirs": "False", "lines": "7"}, coerce_strings=True)
+    assert errors == []
+    assert arguments == {"file_path": "a.txt", "create_dirs": False, "lines": [7]}
+
+    _, errors = validator.validate({"file_path": "a.txt", "create_dirs": "maybe"}, coerce_strings=True)
+    assert errors == [{"path": "create_dirs", "message": "expected boolean, got string"}]
+
+
+@pytest.mark.asyncio
+async def test_invalid_calls_do_not_reach_tool():
+    """Invalid native calls get a structured error; XML calls run with converted values."""
+    registry = ToolRegistry()
+    registry.register_tool(FileTool)
+    processor = ResponseProcessor(registry, AsyncMock())
+    FileTool.calls = 0
+
+    result = await processor._execute_tool({"function_name": "write_file", "arguments": json.dumps({"create_dirs": True})})
+    assert not result.success
+    assert json.loads(result.output)["errors"] == [{"path": "file_path", "message": "required argument is missing"}]
+    assert FileTool.calls == 0
+
+    result = await processor._execute_tool({
+        "function_name": "write_file",
+        "xml_tag_name": "write-file",
+        "arguments": {"file_path": "a.txt", "create_dirs": "false"}
+    })
+    assert result.success and FileTool.calls == 1
+    assert json.loads(result.output)["create_dirs"] is False
+
+
+@pytest.mark.asyncio
+async def test_invalid_calls_do_not_create_tool():
+    """Tools are created on their first valid call, not by an invalid one."""
+    registry = ToolRegistry()
+    registry.register_tool(FileTool)
+    processor = ResponseProcessor(registry, AsyncMock())
+    FileTool.created = 0
+
+    result = await processor._execute_tool({"function_name": "write_file", "arguments": {"mode": "x"}})
+    assert not result.success and FileTool.created == 0
+
+    result = await processor._execute_tool({"function_name": "write_file", "arguments": {"file_path": "a.txt"}})
+    assert result.success and FileTool.created == 1
+
+
+if __name__ == "__main__":
+    try:
+        test_validator_reports_errors_with_paths()
+        test_validator_coerces_strings()
+        asyncio.run(test_invalid_calls_do_not_reach_tool())
+        asyncio.run(test_invalid_calls_do_not_create_tool())
+        print("\n✅ Tool validation tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,274 @@
+"""
+Tests for incremental XML tool call detection in AgentPress.
+
+This module checks that the resumable XMLToolCallScanner finds the same tool calls
+regardless of how the content is split into streaming deltas, and that it keeps
+only a bounded amount of text between deltas. It also checks the precompiled
+XMLExtractionPlan and benchmarks it against the previous per-call parsing.
+"""
+
+import re
+import sys
+import random
+import timeit
+
+from agentpress.tool import XMLTagSchema
+from agentpress.xml_parsing import XMLTagAutomaton, XMLToolCallScanner, XMLExtractionPlan
+
+TAG_NAMES = ["create-file", "str-replace", "wait", "wait-sequence", "execute-command"]
+
+CONTENT = """
+Let me create the file first.
+
+<create-file file_path="index.html">
+<html><body><h1>Hello</h1></body></html>
+</create-file>
+
+Now a replacement:
+<str-replace file_path="index.html">
+    <old_str>Hello</old_str>
+    <new_str>Hi</new_str>
+</str-replace>
+
+<wait-sequence count="2" seconds="1"></wait-sequence>
+<wait seconds="1">outer <wait seconds="1">inner</wait> done</wait>
+<execute-command>
+ls -la
+</execute-command>
+Trailing text that mentions <create-file but never closes it
+"""
+
+EXPECTED_CHUNKS = [
+    '<create-file file_path="index.html">\n<html><body><h1>Hello</h1></body></html>\n</create-file>',
+    '<str-replace file_path="index.html">\n    <old_str>Hello</old_str>\n    <new_str>Hi</new_str>\n</str-replace>',
+    '<wait-sequence count="2" seconds="1"></wait-sequence>',
+    '<wait seconds="1">outer <wait seconds="1">inner</wait> done</wait>',
+    '<execute-command>\nls -la\n</execute-command>',
+]
+
+
+def _scan_in_pieces(content, sizes):
+    scanner = XMLToolCallScanner(XMLTagAutomaton(TAG_NAMES))
+    chunks = []
+    pos = 0
+    for size in sizes:
+        chunks.extend(scanner.feed(content[pos:pos + size]))
+        pos += size
+    chunks.extend(scanner.feed(content[pos:]))
+    return chunks, scanner
+
+
+def test_scanner_whole_content():
+    """All complete tool calls are found in order when fed in one piece."""
+    scanner = XMLToolCallScanner(XMLTagAutomaton(TAG_NAMES))
+    assert scanner.feed(CONTENT) == EXPECTED_CHUNKS
+    assert scanner.in_tool_call, "Unterminated trailing tag should leave the scanner open"
+
+
+def test_scanner_character_by_character():
+    """Tags split across every possible delta boundary are still detected."""
+    chunks, _ = _scan_in_pieces(CONTENT, [1] * len(CONTENT))
+    assert chunks == EXPECTED_CHUNKS
+
+
+def test_scanner_random_splits():
+    """Random delta sizes produce the same chunks as a single feed."""
+    rng = random.Random(42)
+    for _ in range(50):
+        sizes = [rng.randint(1, 12) for _ in range(len(CONTENT) // 4)]
+        chunks, _ = _scan_in_pieces(CONTENT, sizes)
+        assert chunks == EXPECTED_CHUNKS
+
+
+def test_scanner_requires_tag_name_boundary():
+    """A registered tag that is a prefix of another word is not treated as a tool call."""
+    scanner = XMLToolCallScanner(XMLTagAutomaton(["wait"]))
+    assert scanner.feed("<waiting>no</waiting> <wait>yes</wait>") == ["<wait>yes</wait>"]
+
+
+def test_scanner_buffer_stays_bounded():
+    """Plain text outside tool calls is not retained between deltas."""
+    scanner = XMLToolCallScanner(XMLTagAutomaton(TAG_NAMES))
+    for _ in range(10_000):
+        scanner.feed("plain streamed text with < and > characters ")
+    assert len(scanner._buffer) <= scanner.automaton.max_pattern_length
+    assert scanner.feed('<wait seconds="1">x</wait>') == ['<wait seconds="1">x</wait>']
+
+
+def _schema(tag_name, mappings):
+    schema = XMLTagSchema(tag_name=tag_name)
+    for mapping in mappings:
+        schema.add_mapping(**mapping)
+    return schema
+
+
+CREATE_FILE_SCHEMA = _schema("create-file", [
+    {"param_name": "file_path", "node_type": "attribute", "path": "file_path"},
+    {"param_name": "file_contents", "node_type": "content", "path": "."},
+    {"param_name": "permissions", "node_type": "attribute", "path": "permissions"},
+])
+
+
+def _create_file_chunk(size):
+    line = '<div class="row">&lt;escaped&gt; content with "quotes" and <span>markup</span></div>\n'
+    body = line * (size // len(line) + 1)
+    return f'<create-file file_path="src/app &amp; more.html" permissions=\'644\'>\n{body}</create-file>'
+
+
+def test_plan_attributes_and_content():
+    """Attributes are entity-decoded, root content is stripped but not decoded."""
+    chunk = _create_file_chunk(2048)
+    params, missing = XMLExtractionPlan(CREATE_FILE_SCHEMA).extract(chunk)
+    assert missing == []
+    assert params["file_path"] == "src/app & more.html"
+    assert params["permissions"] == "644"
+    assert params["file_contents"].startswith('<div class="row">&lt;escaped&gt;')
+    assert params["file_contents"].endswith("</div>")
+
+
+def test_plan_attribute_path_forms():
+    """'@name' and '.' attribute paths resolve to the intended attribute."""
+    schema = _schema("search-files", [
+        {"param_name": "path", "node_type": "attribute", "path": "@path"},
+        {"param_name": "pattern", "node_type": "attribute", "path": "."},
+    ])
+    params, missing = XMLExtractionPlan(schema).extract('<search-files path="src" pattern="TODO"></search-files>')
+    assert missing == []
+    assert params == {"path": "src", "pattern": "TODO"}
+
+
+def test_plan_elements():
+    """Elements are collected in one walk; nested paths yield lists."""
+    str_replace = _schema("str-replace", [
+        {"param_name": "file_path", "node_type": "attribute", "path": "file_path"},
+        {"param_name": "old_str", "node_type": "element", "path": "old_str"},
+        {"param_name": "new_str", "node_type": "element", "path": "new_str"},
+    ])
+    params, missing = XMLExtractionPlan(str_replace).extract(EXPECTED_CHUNKS[1])
+    assert missing == []
+    assert params == {"file_path": "index.html", "old_str": "Hello", "new_str": "Hi"}
+
+    replace_in_files = _schema("replace-in-files", [
+        {"param_name": "files", "node_type": "element", "path": "files/file"},
+        {"param_name": "pattern", "node_type": "element", "path": "pattern"},
+        {"param_name": "new_value", "node_type": "element", "path": "new_value"},
+    ])
+    chunk = """<replace-in-files>
+        <files>
+            <file>a.txt</file>
+            <file>b.txt</file>
+        </files>
+        <pattern>old</pattern>
+        <new_value>new</new_value>
+    </replace-in-files>"""
+    params, missing = XMLExtractionPlan(replace_in_files).extract(chunk)
+    assert missing == []
+    assert params == {"files": ["a.txt", "b.txt"], "pattern": "old", "new_value": "new"}
+
+
+def test_plan_reports_missing_required():
+    """Missing required parameters are reported instead of raising."""
+    params, missing = XMLExtractionPlan(CREATE_FILE_SCHEMA).extract('<create-file file_path="a">x</create-file>')
+    assert missing == ["permissions"]
+
+
+# Previous implementation, kept here as the benchmark baseline
+def _legacy_extract_tag_content(xml_chunk, tag_name):
+    start_tag = f'<{tag_name}'
+    end_tag = f'</{tag_name}>'
+    start_pos = xml_chunk.find(start_tag)
+    if start_pos == -1:
+        return None, xml_chunk
+    tag_end = xml_chunk.find('>', start_pos)
+    if tag_end == -1:
+        return None, xml_chunk
+    content_start = tag_end + 1
+    nesting_level = 1
+    pos = content_start
+    while nesting_level > 0 and pos < len(xml_chunk):
+        next_start = xml_chunk.find(start_tag, pos)
+        next_end = xml_chunk.find(end_tag, pos)
+        if next_end == -1:
+            return None, xml_chunk
+        if next_start != -1 and next_start < next_end:
+            nesting_level += 1
+            pos = next_start + len(start_tag)
+        else:
+            nesting_level -= 1
+            if nesting_level == 0:
+                return xml_chunk[content_start:next_end], xml_chunk[next_end + len(end_tag):]
+            pos = next_end + len(end_tag)
+    return None, xml_chunk
+
+
+def _legacy_extract_attribute(opening_tag, attr_name):
+    patterns = [
+        fr'{attr_name}="([^"]*)"',
+        fr"{attr_name}='([^']*)'",
+        fr'{attr_name}=([^\s/>;]+)'
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, opening_tag)
+        if match:
+            value = match.group(1)
+            value = value.replace('&quot;', '"').replace('&apos;', "'")
+            value = value.replace('&lt;', '<').replace('&gt;', '>')
+            value = value.replace('&amp;', '&')
+            return value
+    return None
+
+
+def _legacy_parse(xml_chunk, schema):
+    xml_tag_name = re.match(r'<([^\s>]+)', xml_chunk).group(1)
+    params = {}
+    remaining_chunk = xml_chunk
+    for mapping in schema.mappings:
+        if mapping.node_type == "attribute":
+            opening_tag = remaining_chunk.split('>', 1)[0]
+            value = _legacy_extract_attribute(opening_tag, mapping.path)
+            if value is not None:
+                params[mapping.param_name] = value
+        elif mapping.node_type == "element":
+            content, remaining_chunk = _legacy_extract_tag_content(remaining_chunk, mapping.path)
+            if content is not None:
+                params[mapping.param_name] = content.strip()
+        elif mapping.node_type == "content" and mapping.path == ".":
+            content, _ = _legacy_extract_tag_content(remaining_chunk, xml_tag_name)
+            if content is not None:
+                params[mapping.param_name] = content.strip()
+    return params
+
+
+def test_extraction_plan_benchmark():
+    """Benchmark per-call parsing cost before and after precompiling the schema."""
+    plan = XMLExtractionPlan(CREATE_FILE_SCHEMA)
+    print()
+    for size in (2_048, 16_384, 65_536):
+        chunk = _create_file_chunk(size)
+        assert plan.extract(chunk)[0] == _legacy_parse(chunk, CREATE_FILE_SCHEMA)
+
+        number = 500
+        legacy = min(timeit.repeat(lambda: _legacy_parse(chunk, CREATE_FILE_SCHEMA), number=number, repeat=3)) / number
+        planned = min(timeit.repeat(lambda: plan.extract(chunk), number=number, repeat=3)) / number
+        print(f"create-file {len(chunk):>6} bytes: legacy {legacy * 1e6:8.1f}µs  plan {planned * 1e6:8.1f}µs  speedup {legacy / planned:.1f}x")
+        if size >= 16_384:
+            assert planned < legacy, f"Expected the extraction plan to be faster for {len(chunk)} byte payloads"
+
+
+if __name__ == "__main__":
+    try:
+        test_scanner_whole_content()
+        test_scanner_character_by_character()
+        test_scanner_random_splits()
+        test_scanner_requires_tag_name_boundary()
+        test_scanner_buffer_stays_bounded()
+        test_plan_attributes_and_content()
+        test_plan_attribute_path_forms()
+        test_plan_elements()
+        test_plan_reports_missing_required()
+        test_extraction_plan_benchmark()
+        print("\n✅ XML parsing tests completed successfully")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n\n❌ Test failed: {str(e)}")
+        sys.exit(1)
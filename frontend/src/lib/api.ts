@@ -320,7 +320,7 @@ export const addUserMessage = async (threadId: string, content: string): Promise
       thread_id: threadId,
       type: 'user',
       is_llm_message: true,
-      content: JSON.stringify(message)
+      content: message
     });
   
   if (error) {